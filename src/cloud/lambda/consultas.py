@@ -0,0 +1,58 @@
+"""
+API de consulta dos dashboards sobre as visões materializadas.
+
+Cada consulta é uma leitura de uma visão (um Query por chave de partição),
+nunca uma varredura de eventos. Um cache de leitura (read-through) guarda
+o resultado junto com a versão da visão (repositorio.versao_visao, que
+toda gravação da visão incrementa na mesma transação). Cada leitura
+compara a versão: basta um GetItem para saber se a entrada ainda vale,
+mesmo que o lote tenha sido aplicado por outra Lambda (a ingestão e a
+consulta são funções diferentes, com contêineres e caches separados).
+ttl_s só limita quanto tempo uma entrada fica na memória.
+"""
+import time
+
+TTL_PADRAO_S = 30
+
+
+class CacheLeitura:
+    def __init__(self, carregar, versao, ttl_s=TTL_PADRAO_S):
+        self.carregar = carregar  # carregar(visao, inicio, fim)
+        self.versao = versao      # versao(visao)
+        self.ttl_s = ttl_s
+        self.itens = {}  # (visao, inicio, fim) -> (expira, versão, valor)
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, visao, inicio=None, fim=None):
+        chave = (visao, inicio, fim)
+        item = self.itens.get(chave)
+        agora = time.monotonic()
+        versao = self.versao(visao)
+        if item is not None and item[0] > agora and item[1] == versao:
+            self.acertos += 1
+            return item[2]
+        self.faltas += 1
+        # Versão lida antes da visão: uma gravação no meio só causa outra falta
+        valor = self.carregar(visao, inicio, fim)
+        self.itens[chave] = (agora + self.ttl_s, versao, valor)
+        return valor
+
+    def limpar(self):
+        self.itens.clear()
+
+
+class ConsultaEstoque:
+    def __init__(self, repositorio, ttl_s=TTL_PADRAO_S):
+        self.cache = CacheLeitura(repositorio.consultar_visao, repositorio.versao_visao, ttl_s)
+
+    def estoque(self, local):
+        """{sku: estoque} de um local."""
+        return {sku: campos.get("estoque", 0)
+                for sku, campos in self.cache.obter(f"estoque#{local}")}
+
+    def movimentos(self, sku, escala="hora", inicio=None, fim=None):
+        """[(período, {entradas, saidas, ajustes, saldo})] de um SKU; escala "hora" ou "dia"."""
+        if escala not in ("hora", "dia"):
+            raise ValueError(f"escala inválida: {escala}")
+        return self.cache.obter(f"{escala}#{sku}", inicio, fim)
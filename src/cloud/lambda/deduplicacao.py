@@ -0,0 +1,139 @@
+"""
+Deduplicação de eventos de estoque na nuvem: cada (dispositivo, época,
+seq) altera o estoque uma única vez, mesmo com reenvio do edge, entrega
+QoS 1 repetida pelo IoT Core ou retry do lote inteiro pela Lambda.
+
+Por dispositivo guardamos só a época atual, a maior seq aplicada e um
+bitmap das JANELA seqs anteriores (mesma ideia de raspberrypi/sequencia.py).
+A seq é a do quadro do ESP32, que avança a cada leitura: os eventos são
+esparsos nela, por isso a janela é larga (4096 seqs, ~50 s a 80 SPS) e
+ocupa 512 bytes no registro do dispositivo. Um evento mais velho que a
+janela não tem como ser conferido: não é aplicado, mas é contado à parte
+em "atrasados" (não em "duplicados") para a perda tardia aparecer.
+
+Uma época menor que a atual normalmente é reenvio de antes de um reboot
+e é descartada (contada em "epoca_antiga"). A exceção é o ESP32 que
+perdeu o contador de épocas na flash: o edge confirma a regressão no
+fluxo contínuo de leituras (raspberrypi/sequencia.py) e marca o próximo
+evento com "regressao": true; só esse evento reinicia a janela numa época
+menor (contado em "regressoes" e logado pela Lambda). A época abandonada e
+a maior seq dela ficam guardadas: um reenvio atrasado dela não conta como
+época nova.
+
+O estado da janela e o estoque ficam no mesmo registro e são gravados
+juntos com controle de versão otimista (ver repositorio.py), na mesma
+transação que as visões materializadas (visoes.py): um lote aplicado
+pela metade nunca é persistido.
+"""
+
+JANELA = 4096
+_MASCARA = (1 << JANELA) - 1
+
+# Classificação de aceitar()
+NOVO = "novo"
+DUPLICADO = "duplicado"
+EPOCA_ANTIGA = "epoca_antiga"   # Época anterior a um reboot já visto
+REGRESSAO = "regressao"         # Época menor aceita como reinício (marcada pelo edge)
+ATRASADO = "atrasado"           # Mais velho que a janela: não dá para saber se já foi aplicado
+
+
+class JanelaDeduplicacao:
+    __slots__ = ("epoca", "maior", "bits", "anterior_epoca", "anterior_maior")
+
+    def __init__(self, epoca=0, maior=0, bits=0, anterior_epoca=0, anterior_maior=0):
+        self.epoca = epoca
+        self.maior = maior
+        self.bits = bits  # bit i = seq (maior - i) já aplicada
+        self.anterior_epoca = anterior_epoca  # Época abandonada na última regressão
+        self.anterior_maior = anterior_maior
+
+    def aceitar(self, epoca, seq, regressao=False):
+        """Classifica (epoca, seq); NOVO e REGRESSAO ficam marcados como aplicados."""
+        if epoca == self.anterior_epoca and seq <= self.anterior_maior:
+            return EPOCA_ANTIGA  # De antes da regressão, mesmo que a época seja maior
+        if regressao and epoca < self.epoca:
+            self.anterior_epoca, self.anterior_maior = self.epoca, self.maior
+            self.epoca, self.maior, self.bits = epoca, seq, 1
+            return REGRESSAO
+        if epoca > self.epoca:
+            self.epoca, self.maior, self.bits = epoca, seq, 1
+            return NOVO
+        if epoca < self.epoca:
+            return EPOCA_ANTIGA
+        if seq > self.maior:
+            deslocamento = seq - self.maior
+            self.bits = ((self.bits << deslocamento) | 1) & _MASCARA if deslocamento < JANELA else 1
+            self.maior = seq
+            return NOVO
+        idade = self.maior - seq
+        if idade >= JANELA:
+            return ATRASADO
+        bit = 1 << idade
+        if self.bits & bit:
+            return DUPLICADO
+        self.bits |= bit
+        return NOVO
+
+    def bitmap_bytes(self):
+        return self.bits.to_bytes(JANELA // 8, "little")
+
+    @classmethod
+    def de_bytes(cls, epoca, maior, dados, anterior_epoca=0, anterior_maior=0):
+        return cls(epoca, maior, int.from_bytes(dados, "little"), anterior_epoca, anterior_maior)
+
+
+def validar(evento):
+    """(dispositivo, epoca, seq, delta) ou None se faltar algum campo."""
+    try:
+        return (str(evento["dispositivo"]), int(evento["epoca"]), int(evento["seq"]),
+                int(evento["delta_unidades"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def aplicar_lote(eventos, repositorio, visoes=None, tentativas=5):
+    """
+    Aplica um lote de eventos exatamente uma vez por (dispositivo, época, seq).
+    Agrupa por dispositivo; cada grupo vira uma única gravação condicional
+    (estoque + janela + incrementos de visoes(id, novos), se dado).
+    Em conflito (outra invocação gravou antes) relê e recalcula.
+    """
+    resultado = {"aplicados": 0, "duplicados": 0, "atrasados": 0, "epoca_antiga": 0,
+                 "regressoes": 0, "invalidos": 0, "conflitos": 0, "visoes": set()}
+    por_dispositivo = {}
+    for evento in eventos:
+        campos = validar(evento)
+        if campos is None:
+            resultado["invalidos"] += 1
+            continue
+        por_dispositivo.setdefault(campos[0], []).append((campos[1], campos[2], evento))
+
+    for id, lista in por_dispositivo.items():
+        # Ordena por seq dentro de cada época, mas as épocas ficam na ordem de
+        # chegada: depois de uma regressão a época nova é a menor
+        ordem = {}
+        for epoca, _, _ in lista:
+            ordem.setdefault(epoca, len(ordem))
+        lista.sort(key=lambda item: (ordem[item[0]], item[1]))
+        for _ in range(tentativas):
+            janela, versao = repositorio.ler(id)
+            classes = [janela.aceitar(epoca, seq, bool(evento.get("regressao")))
+                       for epoca, seq, evento in lista]
+            novos = [evento for classe, (_, _, evento) in zip(classes, lista)
+                     if classe in (NOVO, REGRESSAO)]
+            if not novos:
+                break  # Tudo repetido: nada a gravar
+            delta = sum(int(e["delta_unidades"]) for e in novos)
+            extras = visoes(id, novos) if visoes else {}
+            if repositorio.gravar(id, janela, versao, delta, extras):
+                resultado["visoes"].update(visao for visao, _ in extras)
+                break
+            resultado["conflitos"] += 1
+        else:
+            raise RuntimeError(f"{id}: conflito de versão em {tentativas} tentativas")
+        resultado["aplicados"] += len(novos)
+        resultado["duplicados"] += classes.count(DUPLICADO)
+        resultado["atrasados"] += classes.count(ATRASADO)
+        resultado["epoca_antiga"] += classes.count(EPOCA_ANTIGA)
+        resultado["regressoes"] += classes.count(REGRESSAO)
+    return resultado
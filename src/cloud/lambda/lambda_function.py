@@ -0,0 +1,84 @@
+"""
+Lambdas do estoque.
+
+lambda_handler: acionada pela regra do IoT Core em estoque/eventos.
+Aceita um evento do edge ({"dispositivo", "epoca", "seq", "delta_unidades",
+...}), uma lista deles ou {"eventos": [...]}, e aplica ao estoque no
+DynamoDB exatamente uma vez (deduplicacao.py), atualizando as visões
+materializadas na mesma gravação (visoes.py).
+
+consulta_handler: API HTTP dos dashboards (API Gateway, payload 2.0).
+    GET /estoque/<local>                               -> {sku: estoque}
+    GET /movimentos/<sku>?escala=hora&inicio=...&fim=... -> [[período, {...}]]
+
+Sem TABELA_ESTOQUE no ambiente usa o repositório em memória (execução local).
+"""
+import json
+import os
+from decimal import Decimal
+
+from consultas import ConsultaEstoque
+from deduplicacao import aplicar_lote
+from repositorio import RepositorioDynamo, RepositorioMemoria
+from visoes import incrementos
+
+_repositorio = None
+_consultas = None
+
+
+def repositorio():
+    """Criado uma vez por contêiner e reaproveitado entre invocações."""
+    global _repositorio
+    if _repositorio is None:
+        tabela = os.environ.get("TABELA_ESTOQUE")
+        _repositorio = (RepositorioDynamo(tabela, os.environ.get("TABELA_VISOES"))
+                        if tabela else RepositorioMemoria())
+    return _repositorio
+
+
+def consultas():
+    """Só na consulta_handler: o cache confere a versão de cada visão a cada leitura."""
+    global _consultas
+    if _consultas is None:
+        _consultas = ConsultaEstoque(repositorio())
+    return _consultas
+
+
+def lambda_handler(event, context):
+    if isinstance(event, dict):
+        eventos = event.get("eventos", [event])
+    else:
+        eventos = list(event)
+    resultado = aplicar_lote(eventos, repositorio(), incrementos)
+    resultado["visoes"] = len(resultado["visoes"])
+    print(f"Lote de {len(eventos)}: {resultado}")
+    return resultado
+
+
+def _json(valor):
+    if isinstance(valor, Decimal):
+        return int(valor) if valor == valor.to_integral_value() else float(valor)
+    raise TypeError(f"não serializável: {type(valor).__name__}")
+
+
+def _resposta(status, corpo):
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"},
+        "body": json.dumps(corpo, default=_json),
+    }
+
+
+def consulta_handler(event, context):
+    partes = event.get("rawPath", "").strip("/").split("/")
+    parametros = event.get("queryStringParameters") or {}
+    if len(partes) == 2 and partes[0] == "estoque":
+        return _resposta(200, consultas().estoque(partes[1]))
+    if len(partes) == 2 and partes[0] == "movimentos":
+        try:
+            return _resposta(200, consultas().movimentos(
+                partes[1], parametros.get("escala", "hora"),
+                parametros.get("inicio"), parametros.get("fim")))
+        except ValueError as e:
+            return _resposta(400, {"erro": str(e)})
+    return _resposta(404, {"erro": "não encontrado"})
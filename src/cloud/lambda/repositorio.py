@@ -0,0 +1,169 @@
+"""
+Persistência do estoque por dispositivo junto com a janela de deduplicação
+e as visões materializadas (visoes.py).
+
+Um item por dispositivo: {dispositivo, estoque, epoca, maior, janela,
+anterior_epoca, anterior_maior, versao}.
+gravar() só vale se a versão lida não mudou; assim o estoque, a janela e
+as visões avançam juntos ou nenhum deles avança. Cada visão alterada tem
+também a sua versão incrementada na mesma gravação (item {visao: "versao",
+chave: <visao>} na tabela de visões); o cache das consultas a compara.
+
+- RepositorioDynamo: tabelas DynamoDB (UpdateItem condicional; com visões,
+  TransactWriteItems com o item do dispositivo + um ADD por item de visão).
+- RepositorioMemoria: substituto local com a mesma semântica, para rodar
+  a Lambda e o benchmark sem AWS.
+"""
+from deduplicacao import JanelaDeduplicacao
+
+VERSOES = "versao"  # Partição das versões na tabela de visões (uma linha por visão)
+
+
+class RepositorioMemoria:
+    def __init__(self):
+        self.itens = {}
+        self.visoes = {}  # visao -> {chave: {campo: valor}}
+        self.versoes = {}  # visao -> versão
+        self.gravacoes = 0
+        self.consultas = 0
+
+    def ler(self, id):
+        item = self.itens.get(id)
+        if item is None:
+            return JanelaDeduplicacao(), 0
+        return JanelaDeduplicacao(item["epoca"], item["maior"], item["janela"],
+                                  item["anterior_epoca"], item["anterior_maior"]), item["versao"]
+
+    def gravar(self, id, janela, versao, delta, visoes=None):
+        item = self.itens.get(id)
+        if (item["versao"] if item else 0) != versao:
+            return False
+        self.itens[id] = {
+            "estoque": (item["estoque"] if item else 0) + delta,
+            "epoca": janela.epoca, "maior": janela.maior, "janela": janela.bits,
+            "anterior_epoca": janela.anterior_epoca, "anterior_maior": janela.anterior_maior,
+            "versao": versao + 1,
+        }
+        for (visao, chave), campos in (visoes or {}).items():
+            atual = self.visoes.setdefault(visao, {}).setdefault(chave, {})
+            for campo, valor in campos.items():
+                atual[campo] = atual.get(campo, 0) + valor
+        for visao in {visao for visao, _ in (visoes or {})}:
+            self.versoes[visao] = self.versoes.get(visao, 0) + 1
+        self.gravacoes += 1
+        return True
+
+    def estoque(self, id):
+        item = self.itens.get(id)
+        return item["estoque"] if item else 0
+
+    def consultar_visao(self, visao, inicio=None, fim=None):
+        """[(chave, campos)] da visão, com inicio <= chave <= fim."""
+        self.consultas += 1
+        return [(chave, dict(campos)) for chave, campos in sorted(self.visoes.get(visao, {}).items())
+                if (inicio is None or chave >= inicio) and (fim is None or chave <= fim)]
+
+    def versao_visao(self, visao):
+        return self.versoes.get(visao, 0)
+
+
+class RepositorioDynamo:
+    def __init__(self, tabela, tabela_visoes=None):
+        import boto3  # Só existe no ambiente da Lambda / com as credenciais AWS
+        from boto3.dynamodb.conditions import Key
+
+        dynamo = boto3.resource("dynamodb")
+        self.tabela = dynamo.Table(tabela)
+        self.visoes = dynamo.Table(tabela_visoes) if tabela_visoes else None
+        self.cliente = self.tabela.meta.client
+        self._key = Key
+
+    def ler(self, id):
+        item = self.tabela.get_item(Key={"dispositivo": id}, ConsistentRead=True).get("Item")
+        if item is None or "versao" not in item:
+            return JanelaDeduplicacao(), 0
+        janela = JanelaDeduplicacao.de_bytes(int(item["epoca"]), int(item["maior"]),
+                                             item["janela"].value,
+                                             int(item.get("anterior_epoca", 0)),
+                                             int(item.get("anterior_maior", 0)))
+        return janela, int(item["versao"])
+
+    def gravar(self, id, janela, versao, delta, visoes=None):
+        valores = {
+            ":e": janela.epoca, ":m": janela.maior, ":j": janela.bitmap_bytes(),
+            ":ae": janela.anterior_epoca, ":am": janela.anterior_maior,
+            ":v1": versao + 1, ":d": delta,
+        }
+        if versao:
+            condicao = "versao = :v0"
+            valores[":v0"] = versao
+        else:
+            condicao = "attribute_not_exists(versao)"
+        dispositivo = {
+            "TableName": self.tabela.name,
+            "Key": {"dispositivo": id},
+            "UpdateExpression": "SET epoca = :e, maior = :m, janela = :j, anterior_epoca = :ae, "
+                                "anterior_maior = :am, versao = :v1 ADD estoque :d",
+            "ConditionExpression": condicao,
+            "ExpressionAttributeValues": valores,
+        }
+        if not visoes or self.visoes is None:
+            try:
+                self.cliente.update_item(**dispositivo)
+            except self.cliente.exceptions.ConditionalCheckFailedException:
+                return False
+            return True
+
+        operacoes = [{"Update": dispositivo}]
+        for (visao, chave), campos in visoes.items():
+            nomes = {f"#c{i}": campo for i, campo in enumerate(campos)}
+            operacoes.append({"Update": {
+                "TableName": self.visoes.name,
+                "Key": {"visao": visao, "chave": chave},
+                "UpdateExpression": "ADD " + ", ".join(f"#c{i} :c{i}" for i in range(len(campos))),
+                "ExpressionAttributeNames": nomes,
+                "ExpressionAttributeValues": {f":c{i}": v for i, v in enumerate(campos.values())},
+            }})
+        for visao in {visao for visao, _ in visoes}:
+            operacoes.append({"Update": {
+                "TableName": self.visoes.name,
+                "Key": {"visao": VERSOES, "chave": visao},
+                "UpdateExpression": "ADD versao :um",
+                "ExpressionAttributeValues": {":um": 1},
+            }})
+        try:
+            self.cliente.transact_write_items(TransactItems=operacoes)
+        except self.cliente.exceptions.TransactionCanceledException as e:
+            motivos = [m.get("Code") for m in e.response.get("CancellationReasons", [])]
+            if motivos and motivos[0] == "ConditionalCheckFailed":
+                return False
+            raise
+        return True
+
+    def estoque(self, id):
+        item = self.tabela.get_item(Key={"dispositivo": id}).get("Item")
+        return int(item["estoque"]) if item else 0
+
+    def consultar_visao(self, visao, inicio=None, fim=None):
+        condicao = self._key("visao").eq(visao)
+        if inicio is not None and fim is not None:
+            condicao &= self._key("chave").between(inicio, fim)
+        elif inicio is not None:
+            condicao &= self._key("chave").gte(inicio)
+        elif fim is not None:
+            condicao &= self._key("chave").lte(fim)
+        argumentos = {"KeyConditionExpression": condicao}
+        itens = []
+        while True:
+            resposta = self.visoes.query(**argumentos)
+            itens += resposta["Items"]
+            if "LastEvaluatedKey" not in resposta:
+                break
+            argumentos["ExclusiveStartKey"] = resposta["LastEvaluatedKey"]
+        return [(item.pop("chave"), {k: v for k, v in item.items() if k != "visao"})
+                for item in itens]
+
+    def versao_visao(self, visao):
+        item = self.visoes.get_item(Key={"visao": VERSOES, "chave": visao},
+                                    ConsistentRead=True).get("Item")
+        return int(item["versao"]) if item else 0
@@ -0,0 +1,56 @@
+"""
+Visões materializadas atualizadas a cada lote (junto com o estoque do
+dispositivo, na mesma gravação condicional):
+
+    visao "estoque#<local>"  chave <sku>          -> {estoque}
+    visao "hora#<sku>"       chave "AAAA-MM-DDTHH" -> {entradas, saidas, ajustes, saldo}
+    visao "dia#<sku>"        chave "AAAA-MM-DD"    -> {entradas, saidas, ajustes, saldo}
+
+Correções de reconciliação do edge ("motivo": "reconciliacao") mexem no
+estoque e no saldo, mas entram como ajustes, não como movimento.
+
+Dashboards leem um item (ou um intervalo de chaves de uma visão) em vez
+de reagregar os eventos. O SKU e o local de cada balança vêm do próprio
+evento ("sku", "local"), do catálogo em CATALOGO (JSON no ambiente:
+{"<dispositivo>": {"sku": ..., "local": ...}}) ou, na falta, do id.
+"""
+import json
+import os
+import time
+
+LOCAL_PADRAO = "padrao"
+
+_catalogo = None
+
+
+def classificar(id, evento):
+    """(sku, local) do dispositivo."""
+    global _catalogo
+    if _catalogo is None:
+        _catalogo = json.loads(os.environ.get("CATALOGO", "{}"))
+    item = _catalogo.get(id, {})
+    return (evento.get("sku") or item.get("sku") or id,
+            evento.get("local") or item.get("local") or LOCAL_PADRAO)
+
+
+def incrementos(id, eventos):
+    """{(visao, chave): {campo: incremento}} de eventos novos de um dispositivo."""
+    sku, local = classificar(id, eventos[0])
+    resultado = {}
+
+    def somar(visao, chave, campos):
+        item = resultado.setdefault((visao, chave), {})
+        for campo, valor in campos.items():
+            item[campo] = item.get(campo, 0) + valor
+
+    for evento in eventos:
+        delta = int(evento["delta_unidades"])
+        hora = time.strftime("%Y-%m-%dT%H", time.gmtime(evento.get("ts", time.time())))
+        if evento.get("motivo") == "reconciliacao":
+            movimento = {"ajustes": delta, "saldo": delta}
+        else:
+            movimento = {"entradas": max(delta, 0), "saidas": max(-delta, 0), "saldo": delta}
+        somar(f"estoque#{local}", sku, {"estoque": delta})
+        somar(f"hora#{sku}", hora, movimento)
+        somar(f"dia#{sku}", hora[:10], movimento)
+    return resultado
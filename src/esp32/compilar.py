@@ -0,0 +1,105 @@
+"""
+Build do firmware: pré-compila src/esp32 para bytecode .mpy (roda no PC).
+
+    pip install mpy-cross==<versão do MicroPython do ESP32>
+    python src/esp32/compilar.py                 # gera src/esp32/build/
+    python src/esp32/compilar.py --enviar        # e copia para o ESP32 via mpremote
+
+Sem o .py no device o MicroPython não compila nada no boot: os imports
+ficam mais rápidos e o heap não é fragmentado pelo compilador. Compare
+"import_ms"/"mem_livre" em balanca/esp32/boot antes e depois.
+
+O build é reproduzível (arquivos em ordem, nome de origem relativo,
+mesma versão do mpy-cross) e registra o SHA-256 de cada saída em
+build/MANIFESTO.txt. Também gera build/manifest.py para congelar os
+mesmos módulos numa imagem própria do firmware (frozen modules):
+    make -C ports/esp32 BOARD=ESP32_GENERIC FROZEN_MANIFEST=<caminho>/build/manifest.py
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+SAIDA = os.path.join(RAIZ, "build")
+ENTRADA = "main_test.py"  # Vira main_test.mpy; o main.py do build só o importa
+IGNORAR = {"compilar.py", "main.py"}  # Este script e o legado standalone
+
+
+def fontes():
+    """Caminhos relativos de todos os .py do firmware, em ordem estável."""
+    lista = []
+    for pasta, subpastas, arquivos in os.walk(RAIZ):
+        subpastas[:] = sorted(d for d in subpastas if d not in ("build", "__pycache__"))
+        for nome in sorted(arquivos):
+            relativo = os.path.relpath(os.path.join(pasta, nome), RAIZ).replace(os.sep, "/")
+            if nome.endswith(".py") and relativo not in IGNORAR:
+                lista.append(relativo)
+    return lista
+
+
+def compilar(relativo, otimizacao, arquitetura):
+    destino = os.path.join(SAIDA, relativo[:-3] + ".mpy")
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    comando = ["mpy-cross", f"-O{otimizacao}", "-s", relativo, "-o", destino]
+    if arquitetura:
+        comando.append(f"-march={arquitetura}")
+    subprocess.run(comando + [os.path.join(RAIZ, relativo)], check=True)
+    with open(destino, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def enviar(arquivos):
+    """Copia o build e apaga os .py antigos (o MicroPython prefere .py a .mpy)."""
+    pastas = sorted({os.path.dirname(a) for a in arquivos if os.path.dirname(a)})
+    for pasta in pastas:
+        subprocess.run(["mpremote", "fs", "mkdir", f":{pasta}"], capture_output=True)
+    for relativo in arquivos:
+        if relativo.endswith(".mpy"):
+            subprocess.run(["mpremote", "fs", "rm", f":{relativo[:-4]}.py"], capture_output=True)
+        subprocess.run(["mpremote", "fs", "cp", os.path.join(SAIDA, relativo), f":{relativo}"],
+                       check=True)
+    subprocess.run(["mpremote", "reset"], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-compila o firmware do ESP32 para .mpy")
+    parser.add_argument("-O", dest="otimizacao", type=int, default=1,
+                        help="Nível de otimização do mpy-cross (1 remove asserts)")
+    parser.add_argument("--arch", default="",
+                        help="Ex.: xtensawin, só necessário para @micropython.native")
+    parser.add_argument("--enviar", action="store_true", help="Copia para o ESP32 via mpremote")
+    args = parser.parse_args()
+
+    if shutil.which("mpy-cross") is None:
+        sys.exit("mpy-cross não encontrado (pip install mpy-cross==<versão do firmware>)")
+    versao = subprocess.run(["mpy-cross", "--version"], capture_output=True,
+                            text=True).stdout.strip()
+
+    shutil.rmtree(SAIDA, ignore_errors=True)
+    os.makedirs(SAIDA)
+    linhas = [f"# {versao} -O{args.otimizacao} {args.arch}".rstrip()]
+    modulos = []
+    for relativo in fontes():
+        linhas.append(f"{compilar(relativo, args.otimizacao, args.arch)}  {relativo[:-3]}.mpy")
+        modulos.append(relativo)
+
+    # main.py mínimo: o único arquivo que o device ainda compila no boot
+    with open(os.path.join(SAIDA, "main.py"), "w") as f:
+        f.write(f"import {ENTRADA[:-3]}\n")
+    with open(os.path.join(SAIDA, "MANIFESTO.txt"), "w") as f:
+        f.write("\n".join(linhas) + "\n")
+    with open(os.path.join(SAIDA, "manifest.py"), "w") as f:
+        f.write('include("$(PORT_DIR)/boards/manifest.py")\n')
+        for relativo in modulos:
+            f.write(f'module("{relativo}", base_path="{RAIZ}", opt={args.otimizacao})\n')
+
+    print(f"{len(modulos)} módulos compilados em {SAIDA} ({versao})")
+    if args.enviar:
+        enviar(["main.py"] + [m[:-3] + ".mpy" for m in modulos])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import socket
+import select
 import struct
+import time
 from binascii import hexlify
 
 
@@ -18,6 +20,7 @@ class MQTTClient:
         keepalive=0,
         ssl=None,
         ssl_params={},
+        rxbuf_size=128,
     ):
         if port == 0:
             port = 8883 if ssl else 1883
@@ -36,20 +39,102 @@ class MQTTClient:
         self.lw_msg = None
         self.lw_qos = 0
         self.lw_retain = False
+        self.ping_sent = None  # ticks_ms of the oldest unanswered PINGREQ
+        self.last_pingresp = None
+        # Reusable receive buffer: each read takes whatever the socket
+        # already has (up to the free space) and every complete packet in
+        # it is framed in place and handed out as memoryviews, never copied.
+        # Pending bytes live in self._rbuf[self._ini:self._fim].
+        self._rbuf = bytearray(rxbuf_size)
+        self._rmv = memoryview(self._rbuf)
+        self._ini = 0
+        self._fim = 0
+        self._falta = 0  # Bytes the partial packet at _ini needs in total
+        self._body = None
+        self._timeout = None
+        self._poll = None
+        # TLS: the caller passes a preloaded SSLContext (CA/cert parsed
+        # once, not on every reconnect). MicroPython's wrap_socket has no
+        # session=, so each reconnect is still a full handshake.
+        self.connect_ms = None  # TCP + TLS + CONNACK of the last connect()
+        self.tls_ms = None  # TLS handshake alone
 
     def _send_str(self, s):
         self.sock.write(struct.pack("!H", len(s)))
         self.sock.write(s)
 
-    def _recv_len(self):
-        n = 0
+    # One read of whatever the socket already has, without blocking for
+    # more: the socket is only switched to non-blocking for this read.
+    # Returns False if nothing arrived within espera_ms.
+    def _fill(self, espera_ms):
+        ini, fim = self._ini, self._fim
+        precisa = max(self._falta, fim - ini + 1)
+        if ini + precisa > len(self._rbuf):
+            # Partial packet does not fit from here on: move it to the
+            # front, growing the buffer if the packet itself is bigger
+            buf = self._rbuf if precisa <= len(self._rbuf) else bytearray(precisa)
+            buf[: fim - ini] = self._rbuf[ini:fim]
+            if buf is not self._rbuf:
+                self._rbuf = buf
+                self._rmv = memoryview(buf)
+            self._ini, self._fim = 0, fim - ini
+        if not self._poll.poll(espera_ms):
+            return False
+        self.sock.setblocking(False)
+        try:
+            n = self.sock.readinto(self._rmv[self._fim :])
+        finally:
+            self.sock.settimeout(self._timeout)
+        if n is None:
+            return False  # TLS record without application data
+        if not n:
+            raise OSError(-1)
+        self._fim += n
+        return True
+
+    # Body position and size of the complete packet at _ini, or None if
+    # it is not all in the buffer yet (self._falta then says how many
+    # bytes it needs in total).
+    def _frame(self):
+        buf = self._rbuf
+        ini, fim = self._ini, self._fim
+        p = ini + 1
+        sz = 0
         sh = 0
         while 1:
-            b = self.sock.read(1)[0]
-            n |= (b & 0x7F) << sh
+            if p >= fim:
+                return None
+            b = buf[p]
+            p += 1
+            sz |= (b & 0x7F) << sh
             if not b & 0x80:
-                return n
+                break
             sh += 7
+            if sh > 21:
+                raise MQTTException("bad remaining length")
+        if p + sz > fim:
+            self._falta = p - ini + sz
+            return None
+        self._falta = 0
+        return p, sz
+
+    # Takes the next complete packet out of the buffer: its first byte
+    # and the body's position and size, or None.
+    def _next_pkt(self):
+        f = self._frame()
+        if f is None:
+            return None
+        op = self._rbuf[self._ini]
+        p, sz = f
+        self._ini = p + sz
+        if self._ini == self._fim:
+            self._ini = self._fim = 0  # Drained: next read starts at the front
+        return op, p, sz
+
+    # True if a complete packet is already buffered: poll() on the
+    # socket would not see it.
+    def pending(self):
+        return self._frame() is not None
 
     def set_callback(self, f):
         self.cb = f
@@ -62,18 +147,29 @@ class MQTTClient:
         self.lw_qos = qos
         self.lw_retain = retain
 
-    def connect(self, clean_session=True, timeout=None):
-        self.sock = socket.socket()
-        self.sock.settimeout(timeout)
-        addr = socket.getaddrinfo(self.server, self.port)[0][-1]
-        self.sock.connect(addr)
+    def _wrap_tls(self):
+        t0 = time.ticks_ms()
         if self.ssl is True:
             # Legacy support for ssl=True and ssl_params arguments.
             import ssl
 
             self.sock = ssl.wrap_socket(self.sock, **self.ssl_params)
-        elif self.ssl:
+        else:
             self.sock = self.ssl.wrap_socket(self.sock, server_hostname=self.server)
+        self.tls_ms = time.ticks_diff(time.ticks_ms(), t0)
+
+    def connect(self, clean_session=True, timeout=None):
+        t0 = time.ticks_ms()
+        self.sock = socket.socket()
+        self._timeout = timeout
+        self.sock.settimeout(timeout)
+        self._ini = self._fim = self._falta = 0
+        addr = socket.getaddrinfo(self.server, self.port)[0][-1]
+        self.sock.connect(addr)
+        if self.ssl:
+            self._wrap_tls()
+        self._poll = select.poll()
+        self._poll.register(self.sock, select.POLLIN)
         premsg = bytearray(b"\x10\0\0\0\0\0")
         msg = bytearray(b"\x04MQTT\x04\x02\0\0")
 
@@ -112,6 +208,8 @@ class MQTTClient:
         assert resp[0] == 0x20 and resp[1] == 0x02
         if resp[3] != 0:
             raise MQTTException(resp[3])
+        self.ping_sent = None
+        self.connect_ms = time.ticks_diff(time.ticks_ms(), t0)
         return resp[2] & 1
 
     def disconnect(self):
@@ -120,6 +218,17 @@ class MQTTClient:
 
     def ping(self):
         self.sock.write(b"\xc0\0")
+        if self.ping_sent is None:
+            self.ping_sent = time.ticks_ms()
+
+    # Returns True if a PINGREQ has gone unanswered for longer than
+    # timeout_ms, i.e. the broker (or the path to it) is gone even
+    # though the socket still looks open.
+    def ping_overdue(self, timeout_ms):
+        return (
+            self.ping_sent is not None
+            and time.ticks_diff(time.ticks_ms(), self.ping_sent) > timeout_ms
+        )
 
     def publish(self, topic, msg, retain=False, qos=0):
         pkt = bytearray(b"\x30\0\0\0")
@@ -147,63 +256,78 @@ class MQTTClient:
             while 1:
                 op = self.wait_msg()
                 if op == 0x40:
-                    sz = self.sock.read(1)
-                    assert sz == b"\x02"
-                    rcv_pid = self.sock.read(2)
-                    rcv_pid = rcv_pid[0] << 8 | rcv_pid[1]
+                    resp = self._body
+                    assert len(resp) == 2
+                    rcv_pid = resp[0] << 8 | resp[1]
                     if pid == rcv_pid:
                         return
         elif qos == 2:
             assert 0
 
+    # topic may be a single topic or a list/tuple of topics; all of
+    # them are sent in one SUBSCRIBE packet and acknowledged by a
+    # single SUBACK round trip.
     def subscribe(self, topic, qos=0):
         assert self.cb is not None, "Subscribe callback is not set"
-        pkt = bytearray(b"\x82\0\0\0")
+        topics = topic if isinstance(topic, (list, tuple)) else (topic,)
+        pkt = bytearray(b"\x82\0\0\0\0")
         self.pid += 1
-        struct.pack_into("!BH", pkt, 1, 2 + 2 + len(topic) + 1, self.pid)
+        sz = 2 + sum(2 + len(t) + 1 for t in topics)
+        assert sz < 16384
+        i = 1
+        while sz > 0x7F:
+            pkt[i] = (sz & 0x7F) | 0x80
+            sz >>= 7
+            i += 1
+        pkt[i] = sz
+        struct.pack_into("!H", pkt, i + 1, self.pid)
         # print(hex(len(pkt)), hexlify(pkt, ":"))
-        self.sock.write(pkt)
-        self._send_str(topic)
-        self.sock.write(qos.to_bytes(1, "little"))
+        self.sock.write(pkt, i + 3)
+        for t in topics:
+            self._send_str(t)
+            self.sock.write(qos.to_bytes(1, "little"))
         while 1:
             op = self.wait_msg()
             if op == 0x90:
-                resp = self.sock.read(4)
-                # print(resp)
-                assert resp[1] == pkt[2] and resp[2] == pkt[3]
-                if resp[3] == 0x80:
-                    raise MQTTException(resp[3])
+                resp = self._body
+                # print(bytes(resp))
+                assert resp[0] == pkt[i + 1] and resp[1] == pkt[i + 2]
+                for rc in resp[2:]:
+                    if rc == 0x80:
+                        raise MQTTException(rc)
                 return
 
     # Wait for a single incoming MQTT message and process it.
     # Subscribed messages are delivered to a callback previously
     # set by .set_callback() method. Other (internal) MQTT
     # messages processed internally.
+    # The callback gets topic and msg as memoryviews into the client's
+    # receive buffer: they are only valid until the callback returns,
+    # so copy them (bytes(msg)) if they must be kept.
     def wait_msg(self):
-        res = self.sock.read(1)
-        self.sock.setblocking(True)
-        if res is None:
-            return None
-        if res == b"":
-            raise OSError(-1)
-        if res == b"\xd0":  # PINGRESP
-            sz = self.sock.read(1)[0]
+        while 1:
+            pkt = self._next_pkt()
+            if pkt:
+                return self._handle(*pkt)
+            self._fill(-1)
+
+    def _handle(self, op, p0, sz):
+        buf = self._rbuf
+        if op == 0xD0:  # PINGRESP
             assert sz == 0
+            self.ping_sent = None
+            self.last_pingresp = time.ticks_ms()
             return None
-        op = res[0]
         if op & 0xF0 != 0x30:
+            # PUBACK/SUBACK/...: body left for publish()/subscribe()
+            self._body = self._rmv[p0 : p0 + sz]
             return op
-        sz = self._recv_len()
-        topic_len = self.sock.read(2)
-        topic_len = (topic_len[0] << 8) | topic_len[1]
-        topic = self.sock.read(topic_len)
-        sz -= topic_len + 2
+        topic_len = (buf[p0] << 8) | buf[p0 + 1]
+        p = p0 + 2 + topic_len
         if op & 6:
-            pid = self.sock.read(2)
-            pid = pid[0] << 8 | pid[1]
-            sz -= 2
-        msg = self.sock.read(sz)
-        self.cb(topic, msg)
+            pid = buf[p] << 8 | buf[p + 1]
+            p += 2
+        self.cb(self._rmv[p0 + 2 : p0 + 2 + topic_len], self._rmv[p : p0 + sz])
         if op & 6 == 2:
             pkt = bytearray(b"\x40\x02\0\0")
             struct.pack_into("!H", pkt, 2, pid)
@@ -212,9 +336,22 @@ class MQTTClient:
             assert 0
         return op
 
-    # Checks whether a pending message from server is available.
-    # If not, returns immediately with None. Otherwise, does
-    # the same processing as wait_msg.
-    def check_msg(self):
-        self.sock.setblocking(False)
-        return self.wait_msg()
\ No newline at end of file
+    # Checks whether pending messages from server are available.
+    # If not, returns immediately with None. Otherwise, processes
+    # up to max_msgs packets and returns the last opcode handled.
+    # Each read takes everything the socket already has, so a burst
+    # of small packets costs one poll() + one read, not one per packet.
+    def check_msg(self, max_msgs=8):
+        res = None
+        n = 0
+        while n < max_msgs:
+            pkt = self._next_pkt()
+            if pkt is None:
+                if not self._fill(0):
+                    break
+                continue
+            n += 1
+            op = self._handle(*pkt)
+            if op is not None:
+                res = op
+        return res
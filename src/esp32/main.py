@@ -2,6 +2,7 @@ import machine
 import time
 import math
 from collections import deque
+from utils.calibracao import RegistroCalibracao, FATOR_ESCALA_PADRAO
 
 # =============================================
 # CONFIGURAÇÕES DO SISTEMA
@@ -79,9 +80,10 @@ class Sistema206gInstantaneo:
         self.buzzer = BuzzerPreciso(PIN_BUZZER)
         self.led = LEDControl(2)  # LED onboard
         
-        # Valores da sua calibração
+        # Valores da sua calibração (a escala vem da calibração remota, se houver)
+        registro = RegistroCalibracao.carregar()
         self.offset_tara = 0
-        self.fator_escala = -56.97
+        self.fator_escala = registro.fator_escala if registro else FATOR_ESCALA_PADRAO
         
         # Controle de estado
         self.estado_atual = "VAZIO"
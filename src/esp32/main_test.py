@@ -1,25 +1,45 @@
-import network
 import time
+import gc
+
+# Marca o início do boot para medir o tempo até a primeira publicação
+T_BOOT_MS = time.ticks_ms()
+
+import network
 import machine
 import ujson
-import gc
+import select
 from libs.umqtt.simple import MQTTClient
-#from machine import Pin, SoftI2C
-from libs.machine_i2c_lcd import I2cLcd
-from time import sleep
-import math
-from collections import deque
 from utils.display import LCDControl
 from utils.buzzer import BuzzerPreciso
 from utils.led import LEDControl
-from utils.HX711_Estavel import HX711_Estavel
+from utils.HX711_Estavel import HX711_Estavel, CANAL_A_128, NOME_CANAL, TIMEOUT_POWER_ON_MS
 from utils.balance import Sistema206gInstantaneo
+from utils.calibracao import RegistroCalibracao
+from utils.configuracao import Configuracao
+from utils.auto_zero import RastreadorZero
+from utils.amostragem import AmostragemAdaptativa, OCIOSO
+from utils.assentamento import DetectorAssentamento
+from utils.reconexao import ReconexaoMQTT
+from utils import protocolo
+from utils.telemetria import Telemetria
+from utils.aquisicao import Aquisicao, Amostrador
+from utils.saida import CaixaSaida, EVENTO, TELEMETRIA, ESTATISTICAS
+
+# Custo dos imports (compilação no device se os módulos forem .py; ver compilar.py)
+IMPORT_MS = time.ticks_diff(time.ticks_ms(), T_BOOT_MS)
+gc.collect()
+MEM_LIVRE_BOOT = gc.mem_free()
+print(f"Imports: {IMPORT_MS} ms, heap livre {MEM_LIVRE_BOOT} B")
 
 # =============================================
 # CONFIGURAÇÕES DO SISTEMA
 # =============================================
 PIN_HX711_DT = 25
 PIN_HX711_SCK = 26
+# Canais lidos do HX711; o primeiro é a balança. (CANAL_A_128, CANAL_B_32)
+# intercala uma segunda célula de carga no canal B, a metade da taxa cada.
+CANAIS_HX711 = (CANAL_A_128,)
+TAXA_HX711_SPS = 10   # Pino RATE: GND = 10 SPS, VCC = 80 SPS (define o assentamento no power-on)
 PIN_BUZZER = 27
 
 PIN_LED_VERDE = 18    # LED de ENTRADA 
@@ -33,7 +53,7 @@ PIN_LCD_SCL = 32
 # ATENÇÃO: Valores da SUA calibração
 # Você DEVE refazer a calibração com a balança vazia.
 OFFSET_TARA = 0      # Valor inicial, será calibrado no boot
-FATOR_ESCALA = -56.97  # Use o seu valor
+FATOR_ESCALA = -56.97  # Use o seu valor (só vale até existir calibracao.json)
 
 # =============================================
 # CONFIGURAÇÕES DE REDE (PREENCHA AQUI)
@@ -46,21 +66,44 @@ PASSWORD = "psi3542#" #
 # ATENÇÃO: Coloque aqui o IP do seu Raspberry Pi (que deve rodar um broker MQTT)
 MQTT_BROKER = "192.168.1.10" # EXEMPLO: MUDE ISSO
 MQTT_PORT = 1883
+# TLS (opcional): MQTT_PORT = 8883 e os arquivos na flash. O contexto é
+# carregado uma vez no boot e reaproveitado a cada reconexão.
+MQTT_TLS = False
+MQTT_CA = "ca.pem"
+MQTT_CERT = None  # "device.pem.crt" + MQTT_KEY para autenticação mútua
+MQTT_KEY = None
 CLIENT_ID = "esp32-balanca-01"
+KEEPALIVE_S = 15     # O broker derruba a sessão (e publica o "offline") após 1.5x isso
+AQUISICAO_EM_THREAD = True  # HX711 numa thread própria (_thread); False = tudo no loop
 
 # Tópicos (ESP32 -> RPi)
-TOPIC_PESO_RAW = b"balanca/esp32/peso_raw"    # Envia o peso bruto (g)
+TOPIC_PESO_RAW = b"balanca/esp32/peso_raw"    # Envia "id,epoca,seq,t_ms,peso,raw" (g)
 TOPIC_STATUS = b"balanca/esp32/status"       # Envia "online" ou "offline"
+TOPIC_BOOT = b"balanca/esp32/boot"           # Tempo de boot até a 1a publicação
+TOPIC_DERIVA = b"balanca/esp32/deriva"       # Estatísticas do auto-zero
+TOPIC_CALIBRACAO = b"balanca/esp32/calibracao" # Relatório da calibração remota
+TOPIC_ENERGIA = b"balanca/esp32/energia"     # Ciclo de trabalho (RAJADA/OCIOSO)
+TOPIC_PESO_ESTAVEL = b"balanca/esp32/peso_estavel" # Novo nível assim que o peso assenta
+TOPIC_CONEXAO = b"balanca/esp32/conexao"     # Tempo de recuperação (MTTR) das quedas
+TOPIC_SENSOR = b"balanca/esp32/sensor"       # Leituras inválidas do HX711 (timeout/saturação/pico)
+TOPIC_AQUISICAO = b"balanca/esp32/aquisicao" # Jitter da amostragem e fila da thread
+TOPIC_CANAL = b"balanca/esp32/canal/"        # + nome do canal secundário: "id,epoca,t_ms,raw"
+TOPIC_SAIDA = b"balanca/esp32/saida"         # Latência e descartes por classe de saída
 
 # Tópicos (RPi -> ESP32)
 TOPIC_FEEDBACK = b"balanca/rpi/feedback"     # Recebe comandos (ENTRADA_OK, SAIDA_OK, etc)
+TOPIC_FEEDBACK_DISP = TOPIC_FEEDBACK + b"/" + CLIENT_ID.encode()  # Só para esta balança
+TOPIC_CALIBRAR = b"balanca/rpi/calibrar"     # Calibração de span com pesos de referência
+TOPIC_CONFIG = b"balanca/rpi/config/" + CLIENT_ID.encode()  # Config remota (retido)
+TOPIC_CONFIG_APLICADA = b"balanca/esp32/config/" + CLIENT_ID.encode()  # Versão aplicada (retido)
 
 
 # =============================================
 # FUNÇÕES DE REDE (de main_atividade7.py)
 # =============================================
 _sta = None
-def connect_wifi():
+def iniciar_wifi():
+    """Dispara a conexão Wi-Fi sem bloquear (o boot segue com o HX711)."""
     global _sta
     _sta = network.WLAN(network.STA_IF)
     if not _sta.isconnected():
@@ -70,14 +113,38 @@ def connect_wifi():
         except:
             pass
         print(f"Conectando a {SSID}...")
-        lcd = LCDControl(PIN_LCD_SDA, PIN_LCD_SCL)
-        lcd.mostrar("Conectando...", SSID)
         _sta.connect(SSID, PASSWORD)
-        while not _sta.isconnected():
-            time.sleep(1)
+
+def ajustar_wifi_ps(ocioso):
+    """Power-save do Wi-Fi só no modo OCIOSO; na RAJADA a latência manda."""
+    try:
+        _sta.config(pm=network.WLAN.PM_POWERSAVE if ocioso else network.WLAN.PM_NONE)
+    except:
+        pass
+
+def religar_wifi():
+    """Garante que o driver está tentando reconectar (ele pode ter desistido)."""
+    if _sta.status() != network.STAT_CONNECTING:
+        try:
+            _sta.connect(SSID, PASSWORD)
+        except OSError:
+            pass
+
+def aguardar_rede(espera_ms):
+    """Espera o backoff, mas sai assim que o Wi-Fi voltar."""
+    limite = time.ticks_add(time.ticks_ms(), espera_ms)
+    wifi_ok = _sta.isconnected()
+    while time.ticks_diff(limite, time.ticks_ms()) > 0:
+        if not wifi_ok and _sta.isconnected():
+            return
+        time.sleep_ms(50)
+
+def connect_wifi():
+    """Versão bloqueante: inicia e espera o Wi-Fi subir."""
+    iniciar_wifi()
+    while not _sta.isconnected():
+        time.sleep_ms(100)
     print("Wi-Fi conectado:", _sta.ifconfig())
-    lcd.mostrar("WiFi Conectado!", _sta.ifconfig()[0])
-    time.sleep(1)
 
 # =============================================
 # LÓGICA MQTT 
@@ -88,53 +155,316 @@ buzzer = None
 led_azul = None
 led_verde = None
 led_vermelho = None
+_hx = None
+_calibracao = None
+_auto_zero = None
+_aquisicao = None
+_span = None
+_config = Configuracao.carregar()
+_config_nova = False  # O loop principal relê intervalo/ping na próxima volta
+_saida = CaixaSaida()  # Eventos antes de telemetria; drenada no loop principal
+
+def tratar_calibracao(msg):
+    """
+    Comandos JSON de calibração remota, opcionalmente endereçados por "id":
+      {"cmd": "inicio"} -> {"cmd": "ponto", "g": 206} (um por peso) -> {"cmd": "fim"}
+    """
+    global _span
+    try:
+        cmd = ujson.loads(bytes(msg))
+        if cmd.get("id", CLIENT_ID) != CLIENT_ID:
+            return
+        acao = cmd.get("cmd")
+        gramas = float(cmd["g"]) if acao == "ponto" else None
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        # JSON malformado ou sem "g": responde em vez de derrubar a sessão MQTT
+        _saida.enfileirar(EVENTO, TOPIC_CALIBRACAO, ujson.dumps(
+            {"id": CLIENT_ID, "erro": f"comando malformado: {e}"}))
+        return
+    relatorio = {"id": CLIENT_ID, "cmd": acao}
+
+    if acao == "inicio":
+        from utils.calibracao_span import CalibracaoSpan  # Raro: só carrega quando usado
+        _span = CalibracaoSpan()
+        lcd.mostrar("Calibracao", "Aguardando pesos")
+
+    elif acao == "ponto" and _span:
+        lcd.mostrar("Calibrando", f"{gramas:.0f}g...")
+        relatorio["g"] = gramas
+        _aquisicao.pausar()  # A thread de aquisição solta o HX711
+        try:
+            _hx.power_on()  # Pode estar desligado pelo modo OCIOSO
+            relatorio["raw"] = _span.coletar_ponto(_hx, gramas)
+        except OSError as e:
+            relatorio["erro"] = str(e)  # Ponto não coletado; o operador pode repetir
+        finally:
+            _aquisicao.retomar()
+
+    elif acao == "fim" and _span:
+        try:
+            resultado = _span.ajustar()
+        except ValueError as e:
+            resultado = None
+            relatorio["erro"] = str(e)
+        _span = None
+        if resultado is None:
+            relatorio.setdefault("erro", "pontos insuficientes")
+        else:
+            relatorio.update(resultado)
+            if resultado["aprovada"]:
+                _calibracao.fator_escala = resultado["escala"]
+                _calibracao.offset_tara = resultado["offset"]
+                _calibracao.origem = "span"
+                relatorio["salva"] = _calibracao.salvar()
+                _auto_zero.rebasear()
+                buzzer.calibracao_ok()
+        lcd.mostrar("Calibracao", "OK" if relatorio.get("salva") else "Falhou")
+
+    elif acao == "cancelar":
+        _span = None
+
+    else:
+        relatorio["erro"] = "comando invalido"
+
+    _saida.enfileirar(EVENTO, TOPIC_CALIBRACAO, ujson.dumps(relatorio))
+
+def tratar_config(msg):
+    """Aplica a config retida (validada inteira antes) e confirma a versão."""
+    global _config_nova
+    mudou, erro = _config.aplicar(bytes(msg))
+    if erro:
+        print(f"Config rejeitada: {erro}")
+    if mudou:
+        print(f"Config v{_config.versao} aplicada")
+        _config_nova = True
+    relatorio = dict(_config.valores)
+    relatorio.update(id=CLIENT_ID, v=_config.versao, erro=erro)
+    # Pode chegar durante o SUBSCRIBE: só enfileira, o loop publica (QoS 0)
+    _saida.enfileirar(EVENTO, TOPIC_CONFIG_APLICADA, ujson.dumps(relatorio), True)
+
+# =============================================
+# COMANDOS DE FEEDBACK (tabela de despacho)
+# =============================================
+def _linha_estoque(args):
+    estoque = protocolo.uint16(args)
+    return "" if estoque is None else f"Estoque: {estoque}"
+
+def cmd_entrada_ok(args):
+    buzzer.entrada_206g()
+    led_verde.piscar_entrada()
+    lcd.mostrar("ENTRADA OK", _linha_estoque(args))
+    time.sleep(1) # Mostra no LCD
+
+def cmd_saida_ok(args):
+    buzzer.saida_206g()
+    led_vermelho.piscar_saida()
+    lcd.mostrar("SAIDA OK", _linha_estoque(args))
+    time.sleep(1) # Mostra no LCD
+
+def cmd_erro(args):
+    led_vermelho.sinal_erro()
+    lcd.mostrar("ERRO", "Tente novamente")
+    time.sleep(1)
+
+def cmd_aguardando(args):
+    led_azul.sinal_aguardando()
+
+def cmd_texto(args):
+    if len(args) < 1 or args[0] > 1:
+        raise protocolo.ErroProtocolo("linha do LCD invalida")
+    try:
+        texto = bytes(args[1:]).decode()
+    except UnicodeError:
+        raise protocolo.ErroProtocolo("texto nao e UTF-8")
+    linha = args[0]
+    if lcd.lcd:
+        lcd.lcd.move_to(0, linha)
+        lcd.lcd.putstr((texto + " " * lcd.cols)[:lcd.cols])
+
+def cmd_estoque(args):
+    lcd.mostrar("Estoque", _linha_estoque(args))
+
+def cmd_led(args):
+    if len(args) < 2 or args[0] > protocolo.LED_VERMELHO:
+        raise protocolo.ErroProtocolo("LED invalido")
+    led = (led_azul, led_verde, led_vermelho)[args[0]]
+    padrao = args[1]
+    if padrao == protocolo.PADRAO_DESLIGA:
+        led.off()
+    elif padrao == protocolo.PADRAO_LIGA:
+        led.sinal_aguardando()  # Liga fixo
+    elif padrao == protocolo.PADRAO_ENTRADA:
+        led.piscar_entrada()
+    elif padrao == protocolo.PADRAO_SAIDA:
+        led.piscar_saida()
+    elif padrao == protocolo.PADRAO_ERRO:
+        led.sinal_erro()
+
+_leitura_pedida = False
+
+def cmd_leitura(args):
+    """O RPi detectou lacuna na sequência e pede uma leitura absoluta já."""
+    global _leitura_pedida
+    _leitura_pedida = True
+
+def cmd_beep(args):
+    padrao = args[0] if len(args) else protocolo.PADRAO_ENTRADA
+    if padrao == protocolo.PADRAO_ENTRADA:
+        buzzer.entrada_206g()
+    elif padrao == protocolo.PADRAO_SAIDA:
+        buzzer.saida_206g()
+    elif padrao == protocolo.PADRAO_ERRO:
+        buzzer.calibracao_ok()
+
+DESPACHO = {
+    protocolo.OP_ENTRADA_OK: cmd_entrada_ok,
+    protocolo.OP_SAIDA_OK: cmd_saida_ok,
+    protocolo.OP_ERRO: cmd_erro,
+    protocolo.OP_AGUARDANDO: cmd_aguardando,
+    protocolo.OP_TEXTO: cmd_texto,
+    protocolo.OP_ESTOQUE: cmd_estoque,
+    protocolo.OP_LED: cmd_led,
+    protocolo.OP_BEEP: cmd_beep,
+    protocolo.OP_LEITURA: cmd_leitura,
+}
 
 def mqtt_callback(topic, msg):
-    """Callback para COMANDOS recebidos do RPi."""
-    global lcd, buzzer, led_azul, led_verde, led_vermelho
-
-    print(f"Comando recebido: T={topic.decode()}, M={msg.decode()}")
-
-    if topic == TOPIC_FEEDBACK:
-        msg_str = msg.decode().upper()
-        
-        if msg_str == "ENTRADA_OK":
-            buzzer.entrada_206g()
-            led_verde.piscar_entrada()
-            lcd.mostrar("ENTRADA OK", "")
-            time.sleep(1) # Mostra no LCD
-            
-        elif msg_str == "SAIDA_OK":
-            buzzer.saida_206g()
-            led_vermelho.piscar_saida()
-            lcd.mostrar("SAIDA OK", "")
-            time.sleep(1) # Mostra no LCD
-
-        elif msg_str == "ERRO":
-            led_vermelho.sinal_erro()
-            lcd.mostrar("ERRO", "Tente novamente")
-            time.sleep(1)
-            
-        elif msg_str == "AGUARDANDO":
-            led_azul.sinal_aguardando()
+    """
+    Callback para COMANDOS recebidos do RPi.
+    topic e msg são memoryviews do buffer do cliente MQTT: só valem
+    durante o callback (copiar com bytes() se precisar guardar).
+    """
+    topic = bytes(topic)
+
+    if topic == TOPIC_FEEDBACK or topic == TOPIC_FEEDBACK_DISP:
+        try:
+            for op, args in protocolo.decodificar(msg):
+                tratar = DESPACHO.get(op)
+                if not tratar:
+                    print(f"Opcode desconhecido: {op:#04x}")
+                    continue
+                # Um comando ruim não derruba os outros do quadro nem a sessão MQTT
+                try:
+                    tratar(args)
+                except Exception as e:
+                    print(f"Comando {op:#04x} invalido: {e}")
+        except protocolo.ErroProtocolo as e:
+            print(f"Quadro invalido: {e}")
+
+    elif topic == TOPIC_CALIBRAR:
+        tratar_calibracao(msg)
+
+    elif topic == TOPIC_CONFIG:
+        tratar_config(msg)
+
+def contexto_tls():
+    """SSLContext com CA/certificado já lidos: reaproveitado em todo connect."""
+    import ssl
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.verify_mode = ssl.CERT_REQUIRED
+    with open(MQTT_CA, "rb") as f:
+        ctx.load_verify_locations(cadata=f.read())
+    if MQTT_CERT:
+        ctx.load_cert_chain(MQTT_CERT, MQTT_KEY)
+    return ctx
 
 def make_client():
     c = MQTTClient(
         CLIENT_ID,
         MQTT_BROKER,
         MQTT_PORT,
-        ssl=False # Sem SSL para MQTT local
+        keepalive=KEEPALIVE_S,
+        ssl=contexto_tls() if MQTT_TLS else False  # Sem SSL para MQTT local
     )
     c.set_last_will(TOPIC_STATUS, b"offline")
     c.set_callback(mqtt_callback)
     return c
 
 
+_assinado = False
+
+def conectar_mqtt():
+    """
+    Conecta ao broker do RPi, assina os comandos e anuncia "online".
+    A sessão é persistente: se o broker ainda tem a sessão, as assinaturas
+    continuam valendo e os comandos QoS 1 perdidos na queda são entregues.
+    """
+    print("Conectando ao RPi (MQTT)...")
+    lcd.mostrar("Conectando RPi", MQTT_BROKER)
+    global _assinado
+    sessao_presente = _client.connect(clean_session=False)
+    print(f"Connect em {_client.connect_ms} ms"
+          + (f" (TLS {_client.tls_ms} ms)" if MQTT_TLS else ""))
+    if not (sessao_presente and _assinado):
+        # Uma única ida e volta (SUBSCRIBE com todos os tópicos). Sempre
+        # assina no 1o connect do boot: o firmware pode ter mudado os tópicos.
+        _client.subscribe((TOPIC_FEEDBACK, TOPIC_FEEDBACK_DISP, TOPIC_CALIBRAR, TOPIC_CONFIG), qos=1)
+        _assinado = True
+    _client.publish(TOPIC_STATUS, b"online")
+    print("Conectado! Aguardando...")
+
+_poller = None
+
+def aguardar_comando(espera_ms):
+    """
+    Dorme até espera_ms, mas acorda assim que chegar um comando do RPi.
+    O poll no socket deixa a CPU no idle do FreeRTOS (com o Wi-Fi em
+    power-save); machine.lightsleep() derrubaria a sessão MQTT.
+    """
+    global _poller
+    if espera_ms <= 0 or _client.pending():
+        return  # Pacote já no buffer do cliente: o poll no socket não o veria
+    if _poller is None:
+        _poller = select.poll()
+        _poller.register(_client.sock, select.POLLIN)
+    _poller.poll(espera_ms)
+
+
+# =============================================
+# BOOT EM PARALELO (Wi-Fi + MQTT + HX711)
+# =============================================
+_mqtt_ok = False
+
+def avancar_rede():
+    """
+    Um passo não bloqueante da subida da rede. É chamado enquanto o
+    HX711 converte, então Wi-Fi, MQTT e a tara avançam juntos.
+    """
+    global _mqtt_ok
+    if _mqtt_ok is not False or not _sta.isconnected():
+        return
+    try:
+        conectar_mqtt()
+        _mqtt_ok = True
+    except Exception as e:
+        # O loop principal tenta de novo com backoff
+        print(f"MQTT ainda indisponivel: {e}")
+        _mqtt_ok = None
+
+def obter_calibracao(hx, balance):
+    """Restaura tara/escala da flash se ainda valerem; senão refaz a tara."""
+    registro = RegistroCalibracao.carregar()
+    if registro:
+        # Uma conversão basta para validar o registro salvo; sem ela, refaz a tara
+        raw = hx.read_stable() if hx.aguardar(avancar_rede) else None
+        if raw is not None and registro.valido_para(raw):
+            print(f"Calibracao restaurada da flash: offset={registro.offset_tara}")
+            return registro
+    else:
+        registro = RegistroCalibracao(fator_escala=_config["escala"] or FATOR_ESCALA)
+
+    registro.offset_tara = balance.calibrar_tara(hx, ao_aguardar=avancar_rede)
+    registro.origem = "tara"
+    registro.salvar()
+    return registro
+
+
 # =============================================
 # LOOP PRINCIPAL
 # =============================================
 def run():
-    global _client, lcd, buzzer, led_azul, led_verde, led_vermelho
+    global _client, _mqtt_ok, _poller, lcd, buzzer, led_azul, led_verde, led_vermelho
+    global _hx, _calibracao, _auto_zero, _aquisicao, _leitura_pedida, _config_nova
     
     # 1. Inicializa Hardware (agora nas globais)
     try:
@@ -148,82 +478,195 @@ def run():
         time.sleep(5)
         machine.reset()
 
+    # 2. Dispara o Wi-Fi; ele sobe enquanto o HX711 estabiliza
+    iniciar_wifi()
+    _client = make_client()
+
     try:
-        hx = HX711_Estavel(PIN_HX711_DT, PIN_HX711_SCK)
+        hx = HX711_Estavel(PIN_HX711_DT, PIN_HX711_SCK, CANAIS_HX711)
         hx.power_on()
-        time.sleep(1)
+        # Descarta a primeira conversão após o power-on (ainda assentando)
+        if not hx.aguardar(avancar_rede, TIMEOUT_POWER_ON_MS):
+            raise OSError("HX711 nao responde")
+        hx.read_stable()
     except Exception as e:
         print(f"Falha ao iniciar HX711: {e}")
         lcd.mostrar("Erro HX711", "Reiniciando...")
         time.sleep(5)
         machine.reset()
 
-    # 2. Conecta Wi-Fi
-    connect_wifi()
-
-    # 3. Calibra a Balança
+    # 3. Calibra a Balança (flash ou tara), avançando a rede entre amostras
     balance = Sistema206gInstantaneo(PIN_HX711_DT, PIN_HX711_SCK, PIN_BUZZER, lcd)
-    OFFSET_TARA = balance.calibrar_tara(hx)
+    calibracao = _calibracao = obter_calibracao(hx, balance)
+    auto_zero = _auto_zero = RastreadorZero(calibracao)
+    assentamento = DetectorAssentamento()  # Sobrevive às reconexões MQTT
+    telemetria = Telemetria(CLIENT_ID)     # Nova época de boot a cada boot
+    amostragem = AmostragemAdaptativa(intervalo_ocioso_ms=_config["pub_ms"], taxa_sps=TAXA_HX711_SPS)
+    aquisicao = _aquisicao = Aquisicao(hx, calibracao, auto_zero, assentamento, amostragem)
+    _hx = hx
+
+    # A thread segue amostrando durante as quedas de rede; o anel guarda
+    # as amostras (com o t_ms da leitura) até o loop voltar a publicar
+    amostrador = None
+    if AQUISICAO_EM_THREAD:
+        try:
+            amostrador = Amostrador(aquisicao)
+            amostrador.iniciar()
+        except Exception as e:
+            print(f"Sem thread de aquisicao, lendo no loop: {e}")
+            amostrador = None
 
-    # 4. Conecta MQTT (ao RPi)
-    _client = make_client()
-    backoff = 5
-    
+    # 4. Termina de subir a rede, se a calibração foi mais rápida
+    while _mqtt_ok is False:
+        avancar_rede()
+        time.sleep_ms(20)
+
+    reconexao = ReconexaoMQTT()
+    if _mqtt_ok:
+        reconexao.registrar_conexao(_client.connect_ms)  # Connect do boot
     peso_atual = 0.0
+    boot_reportado = False
 
     while True:
         try:
-            print("Conectando ao RPi (MQTT)...")
-            lcd.mostrar("Conectando RPi", MQTT_BROKER)
-            _client.connect()
-            _client.subscribe(TOPIC_FEEDBACK)
-            _client.publish(TOPIC_STATUS, b"online")
-            
-            print("Conectado! Aguardando...")
+            if not _mqtt_ok:
+                if not _sta.isconnected():
+                    raise OSError("Wi-Fi fora")
+                conectar_mqtt()
+                _mqtt_ok = True
+                reconexao.registrar_conexao(_client.connect_ms)
+                if reconexao.caiu_em is not None:
+                    reconexao.registrar_recuperacao()
+                    print(f"Recuperado em {reconexao.ultima_ms} ms")
+                    _saida.enfileirar(ESTATISTICAS, TOPIC_CONEXAO, ujson.dumps(reconexao.estatisticas()))
+
             lcd.mostrar("Conectado!", "Aguardando...")
             led_azul.sinal_aguardando()
 
-            last_pub_peso = 0
+            _poller = None  # O socket muda a cada conexão
+            ajustar_wifi_ps(amostragem.modo == OCIOSO)
+
+            last_lcd = 0
             last_ping = 0
             
-            PUB_PESO_EVERY_MS = 500  # Envia o peso 2x por segundo
-            PING_EVERY_S = 5
+            last_pub_deriva = time.time()
+            
+            LCD_EVERY_MS = 500       # I2C é lento; não atualiza a cada amostra
+            PING_EVERY_S = _config["ping_s"]
+            PINGRESP_TIMEOUT_MS = 2 * PING_EVERY_S * 1000
+            PUB_DERIVA_EVERY_S = 60
+            ESPERA_THREAD_MS = 20    # Com a thread: folga para ela pôr a amostra devida no anel
 
             while True:
                 now_ms = time.ticks_ms()
                 now_s = time.time()
 
-                # A. Envia o peso bruto para o RPi
-                if time.ticks_diff(now_ms, last_pub_peso) >= PUB_PESO_EVERY_MS:
-                    peso_atual = balance.ler_peso_gramas(hx, OFFSET_TARA, FATOR_ESCALA)
-
-                    # Envia o peso como string simples
-                    _client.publish(TOPIC_PESO_RAW, b"{}".format(peso_atual))
+                # Config remota nova: troca intervalo, ping e escala entre duas voltas
+                if _config_nova:
+                    amostragem.intervalo_ocioso_ms = _config["pub_ms"]
+                    PING_EVERY_S = _config["ping_s"]
+                    PINGRESP_TIMEOUT_MS = 2 * PING_EVERY_S * 1000
+                    escala = _config["escala"] if "escala" in _config.recebidos else None
+                    if escala and escala != calibracao.fator_escala:
+                        calibracao.fator_escala = escala
+                        calibracao.salvar()
+                        auto_zero.rebasear()
+                    _config.recebidos = ()
+                    _config_nova = False
+
+                # A. Amostras da thread de aquisição (anel) ou lidas aqui mesmo
+                if _leitura_pedida:
+                    amostragem.forcar_leitura(now_ms)
+                    _leitura_pedida = False
+                fonte = amostrador if amostrador and amostrador.ativo else aquisicao
+                for t_ms, canal, raw, peso, evento, mudou in fonte.amostras(now_ms):
+                    if canal != CANAIS_HX711[0]:
+                        _saida.enfileirar(TELEMETRIA, TOPIC_CANAL + NOME_CANAL[canal],
+                                          telemetria.quadro_canal(t_ms, raw))
+                        continue
+                    peso_atual = peso
+                    if evento:
+                        _saida.enfileirar(EVENTO, TOPIC_PESO_ESTAVEL,
+                                          ujson.dumps(telemetria.carimbar(evento, t_ms)))
+                    if mudou:
+                        ajustar_wifi_ps(amostragem.modo == OCIOSO)
+
+                    # Envia o peso com época/sequência (texto simples)
+                    _saida.enfileirar(TELEMETRIA, TOPIC_PESO_RAW,
+                                      telemetria.quadro_peso(peso_atual, t_ms, raw))
+
+                    if not boot_reportado:
+                        boot_ms = time.ticks_diff(time.ticks_ms(), T_BOOT_MS)
+                        print(f"Boot ate 1a publicacao: {boot_ms} ms ({calibracao.origem})")
+                        _saida.enfileirar(ESTATISTICAS, TOPIC_BOOT, ujson.dumps({
+                            "boot_ms": boot_ms,
+                            "import_ms": IMPORT_MS,
+                            "mem_livre": MEM_LIVRE_BOOT,
+                            "connect_ms": _client.connect_ms,
+                            "calibracao": calibracao.origem,
+                            "epoca": telemetria.epoca,
+                            "epoca_recomecada": telemetria.epoca_recomecada,
+                            "reset": machine.reset_cause(),
+                        }))
+                        boot_reportado = True
                     
                     # Atualiza o LCD localmente
-                    lcd.mostrar(f"Peso: {peso_atual:.1f}g", "Aguardando...")
-                    last_pub_peso = now_ms
+                    if time.ticks_diff(now_ms, last_lcd) >= LCD_EVERY_MS:
+                        lcd.mostrar(f"Peso: {peso_atual:.1f}g", "Aguardando...")
+                        last_lcd = now_ms
 
                 # B. Verifica comandos recebidos do RPi
                 _client.check_msg()
 
-                # C. Ping periódico (mantém sessão viva)
+                # C. Estatísticas de deriva (e persiste a tara corrigida)
+                if now_s - last_pub_deriva >= PUB_DERIVA_EVERY_S:
+                    _saida.enfileirar(ESTATISTICAS, TOPIC_DERIVA, ujson.dumps(auto_zero.estatisticas()))
+                    _saida.enfileirar(ESTATISTICAS, TOPIC_ENERGIA, ujson.dumps(amostragem.estatisticas(now_ms)))
+                    _saida.enfileirar(ESTATISTICAS, TOPIC_SENSOR, ujson.dumps(hx.estatisticas()))
+                    relatorio = aquisicao.estatisticas()
+                    relatorio["thread"] = fonte is amostrador
+                    if amostrador:
+                        relatorio.update(amostrador.estatisticas())
+                    _saida.enfileirar(ESTATISTICAS, TOPIC_AQUISICAO, ujson.dumps(relatorio))
+                    _saida.enfileirar(ESTATISTICAS, TOPIC_SAIDA, ujson.dumps(_saida.estatisticas()))
+                    if auto_zero.precisa_salvar() and calibracao.salvar():
+                        auto_zero.marcar_salvo()
+                    last_pub_deriva = now_s
+
+                # D. Escreve a saída: eventos inteiros, telemetria até o orçamento da volta
+                _saida.drenar(_client)
+
+                # E. Ping periódico (mantém sessão viva)
                 if now_s - last_ping >= PING_EVERY_S:
+                    if _client.ping_overdue(PINGRESP_TIMEOUT_MS):
+                        raise OSError("Broker sem PINGRESP")
                     _client.ping()
                     last_ping = now_s
 
-                # Loop cooperativo
-                time.sleep_ms(100)
+                # Loop cooperativo: dorme até a próxima amostra ou comando
+                if _saida.pendentes():
+                    continue  # Sobrou telemetria além do orçamento: outra volta já
+                if fonte is amostrador:
+                    # Dorme até a thread ter a próxima amostra (no OCIOSO, o
+                    # intervalo inteiro), não a cada 20 ms: o anel guarda o que chegar
+                    aguardar_comando(max(ESPERA_THREAD_MS, amostragem.espera_ms(time.ticks_ms(), 1000)))
+                else:
+                    aguardar_comando(amostragem.espera_ms(time.ticks_ms(), 1000))
 
         except Exception as e:
-            print(f"MQTT/Loop caiu: {e}")
-            lcd.mostrar("MQTT CAIU", "Reconectando...")
+            wifi_ok = _sta.isconnected()
+            print(f"MQTT/Loop caiu ({'broker' if wifi_ok else 'wifi'}): {e}")
+            lcd.mostrar("MQTT CAIU" if wifi_ok else "WIFI CAIU", "Reconectando...")
+            reconexao.registrar_queda(wifi_ok)
+            _mqtt_ok = False
             try:
-                _client.disconnect()
+                # Sem DISCONNECT: a sessão persistente fica guardada no broker
+                _client.sock.close()
             except:
                 pass
-            time.sleep(backoff)
-            backoff = min(backoff * 2, 30) # Aumenta o backoff
+            if not wifi_ok:
+                religar_wifi()
+            aguardar_rede(reconexao.proxima_espera_ms())
 
 # --- Ponto de Entrada ---
 try:
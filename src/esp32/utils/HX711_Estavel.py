@@ -4,53 +4,172 @@ import time
 # ====/=========================================
 # HX711 CONFIÁVEL
 # =============================================
+# read_stable() devolve a contagem bruta ou INVALIDO (None), nunca um 0
+# inventado: 0 viraria um peso real de -offset/escala (uma falsa SAIDA).
+# Inválido = timeout (espera curta com uma nova tentativa), código de
+# saturação do ADC ou pico de uma única amostra. Um salto grande em
+# relação à última leitura boa fica "suspeito" e só é aceito se a
+# próxima amostra confirmar o novo nível (degrau real atrasa uma amostra).
+INVALIDO = None
+
+SATURADO_POS = 0x7FFFFF       # Códigos de fundo de escala do HX711
+SATURADO_NEG = -0x800000
+TIMEOUT_MS = 150              # Uma conversão a 10 SPS é 100 ms
+TIMEOUT_POWER_ON_MS = 1000    # Primeira conversão após o power-on (~400 ms a 10 SPS)
+TENTATIVAS = 2
+LIMIAR_PICO_RAW = 50000       # ~880 g a -56.97 contagens/g (ganho 128)
+
+# Os pulsos extras depois dos 24 bits escolhem canal/ganho da PRÓXIMA
+# conversão. Com mais de um canal, cada leitura já programa o seguinte
+# (A, B, A, B...) e nenhuma conversão é jogada fora na troca. Atenção:
+# o datasheet dá 400 ms de assentamento (10 SPS) após trocar de canal,
+# então cada amostra intercalada tem mais ruído que uma sequência
+# contínua do mesmo canal; a taxa efetiva por canal cai para 1/n.
+CANAL_A_128 = 1
+CANAL_B_32 = 2
+CANAL_A_64 = 3
+GANHO = {CANAL_A_128: 128, CANAL_B_32: 32, CANAL_A_64: 64}
+NOME_CANAL = {CANAL_A_128: "A128", CANAL_B_32: "B32", CANAL_A_64: "A64"}
+
+
 class HX711_Estavel:
-    def __init__(self, d_out, pd_sck, channel=1):
+    def __init__(self, d_out, pd_sck, canais=(CANAL_A_128,)):
         self.d_out_pin = machine.Pin(d_out, machine.Pin.IN)
         self.pd_sck_pin = machine.Pin(pd_sck, machine.Pin.OUT, value=0)
-        self.channel = channel
+        self.canais = tuple(canais)  # canais[0] é o principal (read_stable)
+        self.intercalado = len(self.canais) > 1
+        self.canal_atual = CANAL_A_128  # Canal da conversão em andamento (padrão do reset)
+        self.ligado = True
+        self.ultimo_valido = {}
+        self.suspeito = {}
+        self.contadores = {"ok": 0, "timeout": 0, "saturado": 0, "pico": 0}
+        self.por_canal = {canal: 0 for canal in self.canais}
+        self.janela_ms = time.ticks_ms()
 
     def _convert_from_twos_complement(self, value):
         if value & (1 << (24 - 1)):
             value -= 1 << 24
         return value
 
-    def _wait(self, timeout_ms=5000):
+    def _wait(self, timeout_ms=TIMEOUT_MS):
         start_time = time.ticks_ms()
         while not self.is_ready():
             if time.ticks_diff(time.ticks_ms(), start_time) > timeout_ms:
-                raise Exception("Timeout")
+                return False
             time.sleep_ms(5)
+        return True
 
     def is_ready(self):
         return self.d_out_pin.value() == 0
 
+    def aguardar(self, ao_aguardar=None, timeout_ms=TIMEOUT_MS):
+        """
+        Espera a próxima conversão chamando ao_aguardar() entre as checagens
+        (o boot avança a rede). False, contado como timeout, se o chip não responder.
+        """
+        inicio = time.ticks_ms()
+        while not self.is_ready():
+            if time.ticks_diff(time.ticks_ms(), inicio) > timeout_ms:
+                self.sem_resposta()
+                return False
+            if ao_aguardar:
+                ao_aguardar()
+            time.sleep_ms(5)
+        return True
+
     def power_off(self):
         self.pd_sck_pin.value(0)
         self.pd_sck_pin.value(1)
         time.sleep_us(100)
+        self.ligado = False
 
     def power_on(self):
         self.pd_sck_pin.value(0)
         time.sleep_us(80)
+        if not self.ligado:
+            self.canal_atual = CANAL_A_128  # O reset volta para o canal A, ganho 128
+            self.ligado = True
+
+    def _proximo_canal(self):
+        if self.canal_atual in self.por_canal:
+            i = self.canais.index(self.canal_atual)
+            return self.canais[(i + 1) % len(self.canais)]
+        return self.canais[0]
+
+    def _ler_bruto(self, proximo):
+        raw_data = 0
+        for i in range(24):
+            self.pd_sck_pin.value(1)
+            self.pd_sck_pin.value(0)
+            raw_data = raw_data << 1 | self.d_out_pin.value()
+
+        # Pulsos 25 a 27: programa já o canal da próxima conversão
+        for _ in range(proximo):
+            self.pd_sck_pin.value(1)
+            self.pd_sck_pin.value(0)
+
+        return self._convert_from_twos_complement(raw_data)
+
+    def sem_resposta(self):
+        """O chamador esperou demais por is_ready(): conta como timeout."""
+        self.contadores["timeout"] += 1
+
+    def ler_proxima(self):
+        """(canal, contagem validada ou INVALIDO) da próxima conversão, de qualquer canal."""
+        for tentativa in range(TENTATIVAS):
+            if self.is_ready() or self._wait():
+                break
+            self.power_on()  # SCK preso em alto desliga o chip; garante ligado
+        else:
+            self.contadores["timeout"] += 1
+            return None, INVALIDO
+
+        canal = self.canal_atual
+        proximo = self._proximo_canal()
+        raw = self._ler_bruto(proximo)
+        self.canal_atual = proximo
+        if canal not in self.por_canal:
+            return canal, INVALIDO  # Conversão do reset num canal que não usamos
+        if raw == SATURADO_POS or raw == SATURADO_NEG:
+            self.contadores["saturado"] += 1
+            return canal, INVALIDO
+
+        limiar = LIMIAR_PICO_RAW * GANHO[canal] // 128
+        ultimo = self.ultimo_valido.get(canal)
+        suspeito = self.suspeito.get(canal)
+        if ultimo is not None and abs(raw - ultimo) > limiar:
+            if suspeito is not None and abs(raw - suspeito) <= limiar:
+                self.suspeito[canal] = None  # Duas amostras no novo nível: degrau real
+            else:
+                if suspeito is not None:
+                    self.contadores["pico"] += 1  # O suspeito anterior não se repetiu
+                self.suspeito[canal] = raw
+                return canal, INVALIDO
+        elif suspeito is not None:
+            self.contadores["pico"] += 1  # Voltou ao nível anterior: era pico
+            self.suspeito[canal] = None
+
+        self.ultimo_valido[canal] = raw
+        self.contadores["ok"] += 1
+        self.por_canal[canal] += 1
+        return canal, raw
 
     def read_stable(self):
-        try:
-            if not self.is_ready():
-                self._wait()
-            
-            raw_data = 0
-            for i in range(24):
-                self.pd_sck_pin.value(1)
-                self.pd_sck_pin.value(0)
-                raw_data = raw_data << 1 | self.d_out_pin.value()
-            
-            for _ in range(self.channel):
-                self.pd_sck_pin.value(1)
-                self.pd_sck_pin.value(0)
-            
-            return self._convert_from_twos_complement(raw_data)
-            
-        except Exception as e:
-            print("Erro leitura: {}".format(e))
-            return 0
+        """Contagem bruta validada do canal principal, ou INVALIDO."""
+        for _ in range(len(self.canais) + 1):
+            canal, raw = self.ler_proxima()
+            if canal is None or canal == self.canais[0]:
+                return raw
+        return INVALIDO
+
+    def estatisticas(self):
+        total = sum(self.contadores.values())
+        dados = dict(self.contadores)
+        dados["invalidas_pct"] = round(100 * (total - self.contadores["ok"]) / total, 2) if total else 0.0
+        # Taxa efetiva de amostras válidas por canal desde o último relatório
+        agora = time.ticks_ms()
+        segundos = max(1, time.ticks_diff(agora, self.janela_ms)) / 1000
+        dados["sps"] = {NOME_CANAL[c]: round(n / segundos, 2) for c, n in self.por_canal.items()}
+        self.por_canal = {canal: 0 for canal in self.canais}
+        self.janela_ms = agora
+        return dados
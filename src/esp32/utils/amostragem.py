@@ -0,0 +1,121 @@
+import time
+from utils.estatistica import JanelaDeslizante
+
+# =============================================
+# AMOSTRAGEM ADAPTATIVA + MODO OCIOSO
+# =============================================
+# RAJADA: lê toda conversão do HX711 (taxa máxima do chip).
+# OCIOSO: peso parado há ESTAVEL_MS -> uma leitura a cada INTERVALO_OCIOSO_MS,
+#         com o HX711 desligado entre as leituras quando sobra tempo para
+#         ele assentar de novo. O assentamento vem da taxa do chip (pino
+#         RATE): 4 conversões pelo datasheet + 1 de folga = 500 ms a
+#         10 SPS, 62 ms a 80 SPS. A 10 SPS, 1000 ms deixa o chip desligado
+#         ~metade do OCIOSO; com 500 ms não sobraria nada para desligar.
+RAJADA = "RAJADA"
+OCIOSO = "OCIOSO"
+
+LIMIAR_MUDANCA_G = 10.0      # Desvio da média que volta para RAJADA
+LIMIAR_ESTAVEL_G = 2.0       # Desvio padrão máximo para considerar parado
+ESTAVEL_MS = 3000            # Tempo parado antes de entrar em OCIOSO
+INTERVALO_OCIOSO_MS = 1000
+TAXA_HX711_SPS = 10          # RATE em GND (placas comuns); 80 com RATE em VCC
+CONVERSOES_ASSENTAMENTO = 5  # 1a conversão válida após power-on: 4 + 1 de folga
+DESLIGADO_MIN_MS = 100       # Só vale desligar o HX711 se ficar off ao menos isso
+
+
+def assentamento_hx_ms(taxa_sps):
+    return CONVERSOES_ASSENTAMENTO * 1000 // taxa_sps
+
+
+class AmostragemAdaptativa:
+    def __init__(self, janela=10, intervalo_ocioso_ms=INTERVALO_OCIOSO_MS, taxa_sps=TAXA_HX711_SPS):
+        self.intervalo_ocioso_ms = intervalo_ocioso_ms  # Ajustável pela config remota
+        self.assentamento_hx_ms = assentamento_hx_ms(taxa_sps)
+        self.modo = RAJADA
+        self.janela = JanelaDeslizante(janela)
+        self.estavel_desde = None
+        self.proxima_ms = time.ticks_ms()
+        self.hx_ligado = True
+        # Contabilidade para estimar consumo (ms em cada condição)
+        self.inicio_ms = self.marca_ms = time.ticks_ms()
+        self.ms_ocioso = 0
+        self.ms_hx_desligado = 0
+        self.amostras = 0
+
+    def _contabilizar(self, agora_ms):
+        dt = time.ticks_diff(agora_ms, self.marca_ms)
+        if self.modo == OCIOSO:
+            self.ms_ocioso += dt
+        if not self.hx_ligado:
+            self.ms_hx_desligado += dt
+        self.marca_ms = agora_ms
+
+    def deve_ligar_hx(self, agora_ms):
+        """Em OCIOSO, religa o HX711 a tempo de assentar antes da leitura."""
+        return not self.hx_ligado and \
+            time.ticks_diff(self.proxima_ms, agora_ms) <= self.assentamento_hx_ms
+
+    def deve_ler(self, agora_ms):
+        return self.hx_ligado and time.ticks_diff(agora_ms, self.proxima_ms) >= 0
+
+    def pode_desligar_hx(self):
+        return self.modo == OCIOSO and \
+            self.intervalo_ocioso_ms - self.assentamento_hx_ms >= DESLIGADO_MIN_MS
+
+    def forcar_leitura(self, agora_ms):
+        """Antecipa a próxima leitura (pedido de leitura absoluta do RPi)."""
+        self.proxima_ms = agora_ms
+
+    def marcar_hx(self, ligado, agora_ms):
+        self._contabilizar(agora_ms)
+        self.hx_ligado = ligado
+
+    def registrar(self, peso, agora_ms):
+        """
+        Registra uma leitura e decide o modo. Retorna True se o modo mudou
+        (o chamador ajusta o power-save do Wi-Fi).
+        """
+        self._contabilizar(agora_ms)
+        self.amostras += 1
+        mudou = False
+
+        if self.janela.n and abs(peso - self.janela.media()) > LIMIAR_MUDANCA_G:
+            # Peso mexeu: volta imediatamente para a taxa máxima
+            self.janela.limpar()
+            self.estavel_desde = None
+            mudou = self.modo != RAJADA
+            self.modo = RAJADA
+        self.janela.adicionar(peso)
+
+        if self.modo == RAJADA:
+            if self.janela.cheia() and self.janela.desvio() <= LIMIAR_ESTAVEL_G:
+                if self.estavel_desde is None:
+                    self.estavel_desde = agora_ms
+                elif time.ticks_diff(agora_ms, self.estavel_desde) >= ESTAVEL_MS:
+                    self.modo = OCIOSO
+                    mudou = True
+            else:
+                self.estavel_desde = None
+
+        intervalo = self.intervalo_ocioso_ms if self.modo == OCIOSO else 0
+        self.proxima_ms = time.ticks_add(agora_ms, intervalo)
+        return mudou
+
+    def espera_ms(self, agora_ms, maximo):
+        """Quanto o loop pode dormir até o próximo evento de amostragem."""
+        if self.modo == RAJADA:
+            return min(5, maximo)  # Só espera a próxima conversão
+        alvo = self.proxima_ms
+        if not self.hx_ligado:
+            alvo = time.ticks_add(alvo, -self.assentamento_hx_ms)
+        return max(0, min(time.ticks_diff(alvo, agora_ms), maximo))
+
+    def estatisticas(self, agora_ms):
+        self._contabilizar(agora_ms)
+        total = max(1, time.ticks_diff(agora_ms, self.inicio_ms))
+        return {
+            "modo": self.modo,
+            "ocioso_pct": round(100 * self.ms_ocioso / total, 1),
+            "hx_desligado_pct": round(100 * self.ms_hx_desligado / total, 1),
+            "amostras_s": round(1000 * self.amostras / total, 2),
+        }
@@ -0,0 +1,241 @@
+import time
+from utils.amostragem import RAJADA
+
+# =============================================
+# AQUISIÇÃO: HX711 -> PESO -> AUTO-ZERO -> ASSENTAMENTO
+# =============================================
+# Aquisicao.passo() é uma volta do pipeline de amostragem; cada amostra
+# sai como a tupla (t_ms, canal, raw, peso, evento, modo_mudou). Pode rodar no
+# próprio loop de rede (modo antigo) ou no Amostrador, uma thread que
+# entrega as amostras pelo AnelAmostras. Com a thread, um PINGRESP lento,
+# um connect ou o LCD I2C não atrasam a leitura do HX711.
+#
+# O MicroPython do ESP32 tem GIL e roda as threads no mesmo núcleo: o
+# ganho não é paralelismo, é que toda espera de rede (socket, poll,
+# sleep) libera o GIL e a thread de aquisição acorda no horário dela.
+# O jitter medido (intervalo entre conversões na RAJADA) mostra isso.
+SEM_RESPOSTA_MS = 2000  # 20 conversões perdidas: chip travado ou solto
+ESPERA_MAX_MS = 250     # A thread dorme até a leitura devida, no máximo isso (forcar_leitura)
+PILHA_THREAD = 8 * 1024
+
+
+class MedidorJitter:
+    """Intervalo entre leituras consecutivas na RAJADA (média/desvio de Welford)."""
+
+    def __init__(self):
+        self.ultimo_us = None
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.n = 0
+        self.media_us = 0.0
+        self.m2 = 0.0
+        self.min_us = None
+        self.max_us = 0
+        self.atrasadas = 0  # Intervalo > 1.5x a média: conversão perdida
+
+    def registrar(self, t_us, continuo=True):
+        """continuo=False (OCIOSO, pausa) quebra a sequência sem contar."""
+        if continuo and self.ultimo_us is not None:
+            dt = time.ticks_diff(t_us, self.ultimo_us)
+            if self.n >= 10 and dt > 1.5 * self.media_us:
+                self.atrasadas += 1
+            self.n += 1
+            d = dt - self.media_us
+            self.media_us += d / self.n
+            self.m2 += d * (dt - self.media_us)
+            if self.min_us is None or dt < self.min_us:
+                self.min_us = dt
+            if dt > self.max_us:
+                self.max_us = dt
+        self.ultimo_us = t_us if continuo else None
+
+    def estatisticas(self):
+        """Janela desde o último relatório; zera os acumuladores."""
+        dados = {
+            "intervalos": self.n,
+            "periodo_ms": round(self.media_us / 1000, 2) if self.n else None,
+            "jitter_ms": round((self.m2 / (self.n - 1)) ** 0.5 / 1000, 2) if self.n > 1 else None,
+            "min_ms": round(self.min_us / 1000, 1) if self.n else None,
+            "max_ms": round(self.max_us / 1000, 1) if self.n else None,
+            "atrasadas": self.atrasadas,
+        }
+        self.reiniciar()
+        return dados
+
+
+class Aquisicao:
+    def __init__(self, hx, calibracao, auto_zero, assentamento, amostragem):
+        self.hx = hx
+        self.calibracao = calibracao
+        self.auto_zero = auto_zero
+        self.assentamento = assentamento
+        self.amostragem = amostragem
+        self.jitter = MedidorJitter()
+        self.espera_hx_desde = None  # Leitura devida e HX711 ainda sem conversão
+        self.pausada = False
+        self.em_passo = False
+
+    def passo(self, agora_ms):
+        """Uma volta do pipeline: a amostra nova, ou None."""
+        self.em_passo = True  # Antes de olhar pausada (ver pausar)
+        try:
+            if self.pausada:
+                return None
+            return self._passo(agora_ms)
+        finally:
+            self.em_passo = False
+
+    def _passo(self, agora_ms):
+        hx = self.hx
+        amostragem = self.amostragem
+        # Intercalado: a conversão do canal secundário é lida assim que
+        # sai, sem depender do ritmo da amostragem (que segue o principal)
+        principal = hx.canal_atual == hx.canais[0]
+        if amostragem.deve_ligar_hx(agora_ms):
+            hx.power_on()
+            amostragem.marcar_hx(True, agora_ms)
+        if principal and not amostragem.deve_ler(agora_ms):
+            self.espera_hx_desde = None
+            return None
+
+        if not hx.is_ready():
+            # HX711 mudo com leitura devida: conta timeout e religa o chip
+            if self.espera_hx_desde is None:
+                self.espera_hx_desde = agora_ms
+            elif time.ticks_diff(agora_ms, self.espera_hx_desde) >= SEM_RESPOSTA_MS:
+                hx.sem_resposta()
+                hx.power_off()
+                hx.power_on()
+                self.espera_hx_desde = agora_ms
+            return None
+        self.espera_hx_desde = None
+
+        if principal:
+            self.jitter.registrar(time.ticks_us(), amostragem.modo == RAJADA)
+        canal, raw = hx.ler_proxima()
+        if raw is None:
+            return None  # Descarta e lê a próxima conversão
+        if not principal:
+            return (agora_ms, canal, raw, None, None, False)  # Só o stream do canal
+
+        peso = self.calibracao.peso(raw)
+        self.auto_zero.atualizar(raw, agora_ms)
+        # Nível assentado vai na hora, sem esperar o próximo peso_raw
+        evento = self.assentamento.atualizar(peso, agora_ms)
+        mudou = amostragem.registrar(peso, agora_ms)
+        if amostragem.pode_desligar_hx() and not hx.intercalado:
+            hx.power_off()  # Intercalado fica ligado: o power-on volta ao canal A
+            amostragem.marcar_hx(False, agora_ms)
+        return (agora_ms, canal, raw, peso, evento, mudou)
+
+    def amostras(self, agora_ms):
+        """Modo no loop: no máximo uma amostra por volta."""
+        amostra = self.passo(agora_ms)
+        if amostra:
+            yield amostra
+
+    def pausar(self):
+        """Libera o HX711 para outro uso (calibração) até retomar()."""
+        self.pausada = True
+        while self.em_passo:
+            time.sleep_ms(1)
+        self.jitter.registrar(0, False)
+
+    def retomar(self):
+        self.pausada = False
+
+    def estatisticas(self):
+        return self.jitter.estatisticas()
+
+
+class AnelAmostras:
+    """
+    Fila SPSC sem trava: só o produtor escreve em cabeca, só o consumidor
+    em cauda, e cada um publica o índice depois de mexer no slot.
+    Cheia, a amostra nova é descartada (o consumidor é dono da cauda).
+    """
+
+    def __init__(self, capacidade=64):
+        self.capacidade = capacidade
+        self.itens = [None] * capacidade  # Pré-alocado
+        self.cabeca = 0
+        self.cauda = 0
+        self.perdidas = 0
+        self.ocupacao_max = 0
+
+    def colocar(self, item):
+        ocupacao = self.cabeca - self.cauda
+        if ocupacao >= self.capacidade:
+            self.perdidas += 1
+            return False
+        self.itens[self.cabeca % self.capacidade] = item
+        self.cabeca += 1
+        if ocupacao >= self.ocupacao_max:
+            self.ocupacao_max = ocupacao + 1
+        return True
+
+    def retirar(self):
+        if self.cauda == self.cabeca:
+            return None
+        i = self.cauda % self.capacidade
+        item = self.itens[i]
+        self.itens[i] = None
+        self.cauda += 1
+        return item
+
+
+class Amostrador:
+    """Roda Aquisicao.passo() numa thread própria e entrega pelo anel."""
+
+    def __init__(self, aquisicao, capacidade=64):
+        self.aquisicao = aquisicao
+        self.anel = AnelAmostras(capacidade)
+        self.ativo = False
+        self.falha = None
+        self.atraso_max_ms = 0  # Da leitura até o loop de rede consumir
+
+    def iniciar(self):
+        import _thread
+        _thread.stack_size(PILHA_THREAD)
+        self.ativo = True
+        _thread.start_new_thread(self._laco, ())
+
+    def parar(self):
+        self.ativo = False
+
+    def _laco(self):
+        aquisicao = self.aquisicao
+        amostragem = aquisicao.amostragem
+        try:
+            while self.ativo:
+                amostra = aquisicao.passo(time.ticks_ms())
+                if amostra:
+                    self.anel.colocar(amostra)
+                espera = amostragem.espera_ms(time.ticks_ms(), ESPERA_MAX_MS)
+                time.sleep_ms(max(1, espera))  # Sempre dorme: libera o GIL
+        except Exception as e:
+            self.falha = str(e)
+            print(f"Thread de aquisicao caiu: {e}")
+        self.ativo = False  # O loop de rede volta a ler o HX711 sozinho
+
+    def amostras(self, agora_ms):
+        """Drena o anel (consumidor único: o loop de rede)."""
+        while True:
+            amostra = self.anel.retirar()
+            if amostra is None:
+                return
+            atraso = time.ticks_diff(agora_ms, amostra[0])
+            if atraso > self.atraso_max_ms:
+                self.atraso_max_ms = atraso
+            yield amostra
+
+    def estatisticas(self):
+        dados = {
+            "anel_perdidas": self.anel.perdidas,
+            "anel_max": self.anel.ocupacao_max,
+            "atraso_max_ms": self.atraso_max_ms,
+        }
+        self.anel.ocupacao_max = 0  # Picos por janela de relatório
+        self.atraso_max_ms = 0
+        return dados
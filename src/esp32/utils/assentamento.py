@@ -0,0 +1,56 @@
+import time
+from utils.estatistica import JanelaDeslizante
+
+# =============================================
+# DETECTOR DE ASSENTAMENTO (nível estável do peso)
+# =============================================
+# Em vez de comparar uma amostra crua com limiares, acompanha desvio e
+# inclinação de uma janela curta e declara um novo nível assim que o sinal
+# assenta. Um prato que balança e volta ao mesmo nível não gera evento.
+LIMIAR_MOVIMENTO_G = 20.0   # Afastamento do nível que indica movimento
+LIMIAR_DESVIO_G = 3.0       # Desvio padrão máximo na janela para assentar
+LIMIAR_INCLINACAO_G = 1.0   # |inclinação| máxima, em g por amostra
+
+
+class DetectorAssentamento:
+    def __init__(self, janela=4):
+        self.janela = JanelaDeslizante(janela)
+        self.nivel = None          # Último nível estável declarado
+        self.movendo_desde = None  # ticks_ms do início do movimento
+
+    def atualizar(self, peso, agora_ms):
+        """
+        Recebe cada amostra. Retorna None ou, quando o peso assenta num
+        nível diferente do anterior, um dicionário com o novo nível.
+        """
+        if self.nivel is not None and self.movendo_desde is None and \
+                abs(peso - self.nivel) > LIMIAR_MOVIMENTO_G:
+            # Começou a mexer: a janela passa a contar só daqui em diante
+            self.movendo_desde = agora_ms
+            self.janela.limpar()
+        self.janela.adicionar(peso)
+
+        if not self.janela.cheia() or \
+                self.janela.desvio() > LIMIAR_DESVIO_G or \
+                abs(self.janela.inclinacao()) > LIMIAR_INCLINACAO_G:
+            return None
+
+        nivel = self.janela.media()
+        if self.nivel is None:
+            self.nivel = nivel  # Primeiro nível após o boot, sem evento
+            return None
+        if self.movendo_desde is None:
+            return None
+
+        anterior = self.nivel
+        assentamento_ms = time.ticks_diff(agora_ms, self.movendo_desde)
+        self.movendo_desde = None
+        if abs(nivel - anterior) <= LIMIAR_MOVIMENTO_G:
+            return None  # Balançou e voltou ao mesmo nível
+        self.nivel = nivel
+        return {
+            "peso": nivel,
+            "anterior": anterior,
+            "delta": nivel - anterior,
+            "assentamento_ms": assentamento_ms,
+        }
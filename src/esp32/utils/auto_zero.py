@@ -0,0 +1,78 @@
+import time
+from utils.estatistica import JanelaDeslizante
+
+# =============================================
+# AUTO-ZERO: RASTREAMENTO CONTÍNUO DA TARA
+# =============================================
+# Só corrige com a plataforma claramente vazia e parada, bem abaixo do
+# limiar de SAIDA (50g), para não "engolir" um uniforme como deriva.
+LIMIAR_VAZIO_G = 5.0       # |peso| abaixo disso conta como vazio
+LIMIAR_DESVIO_G = 1.0      # Desvio padrão máximo na janela
+TAXA_MAX_G_POR_S = 0.05    # Correção máxima (3 g/min), deriva térmica é lenta
+GANHO = 0.1                # Fração do erro corrigida a cada amostra
+
+
+class RastreadorZero:
+    def __init__(self, calibracao, janela=10):
+        self.calibracao = calibracao  # RegistroCalibracao (offset vivo)
+        self.janela = JanelaDeslizante(janela)
+        self.offset_inicial = calibracao.offset_tara
+        self.offset_salvo = calibracao.offset_tara
+        self.correcoes = 0
+        self.ultima_correcao_g = 0.0
+        self.ultimo_ms = None
+
+    def atualizar(self, raw, agora_ms, vazio=True):
+        """
+        Recebe cada leitura bruta. Retorna True se a tara foi ajustada.
+        vazio=False (ex.: estado "206G") desliga o rastreamento.
+        """
+        escala = self.calibracao.fator_escala
+        peso = (raw - self.calibracao.offset_tara) / escala
+
+        if not vazio or abs(peso) > LIMIAR_VAZIO_G:
+            self.janela.limpar()
+            self.ultimo_ms = agora_ms
+            return False
+
+        self.janela.adicionar(raw)
+        dt_ms = 0 if self.ultimo_ms is None else time.ticks_diff(agora_ms, self.ultimo_ms)
+        self.ultimo_ms = agora_ms
+        if not self.janela.cheia() or self.janela.desvio() / abs(escala) > LIMIAR_DESVIO_G:
+            return False
+
+        # Correção proporcional, limitada pela taxa máxima
+        erro = self.janela.media() - self.calibracao.offset_tara
+        passo_max = TAXA_MAX_G_POR_S * abs(escala) * dt_ms / 1000
+        passo = max(-passo_max, min(passo_max, GANHO * erro))
+        if not passo:
+            return False
+        self.calibracao.offset_tara += passo
+        self.correcoes += 1
+        self.ultima_correcao_g = passo / escala
+        return True
+
+    def rebasear(self):
+        """Chamado após uma nova calibração: a deriva volta a contar do zero."""
+        self.janela.limpar()
+        self.offset_inicial = self.calibracao.offset_tara
+        self.offset_salvo = self.calibracao.offset_tara
+
+    def deriva_g(self):
+        """Deriva acumulada desde o boot, em gramas."""
+        return (self.calibracao.offset_tara - self.offset_inicial) / self.calibracao.fator_escala
+
+    def precisa_salvar(self, limiar_g=1.0):
+        """Evita gravar a flash a cada ajuste: só após deriva relevante."""
+        return abs(self.calibracao.offset_tara - self.offset_salvo) / abs(self.calibracao.fator_escala) >= limiar_g
+
+    def marcar_salvo(self):
+        self.offset_salvo = self.calibracao.offset_tara
+
+    def estatisticas(self):
+        return {
+            "offset": int(self.calibracao.offset_tara),
+            "deriva_g": round(self.deriva_g(), 2),
+            "ultima_correcao_g": round(self.ultima_correcao_g, 3),
+            "correcoes": self.correcoes,
+        }
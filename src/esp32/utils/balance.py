@@ -3,6 +3,12 @@ from utils.HX711_Estavel import HX711_Estavel
 from utils.buzzer import BuzzerPreciso
 from utils.led import LEDControl
 from utils.display import LCDControl
+from utils.assentamento import DetectorAssentamento
+from utils.calibracao import RegistroCalibracao, FATOR_ESCALA_PADRAO
+from utils.configuracao import Configuracao
+from utils.reconciliacao import Reconciliador
+
+RECONCILIAR_EVERY_MS = 10000  # Parado, confere o estoque pelo peso a cada 10 s
 
 # =============================================
 # SISTEMA COM DETECÇÃO INSTANTÂNEA
@@ -14,15 +20,27 @@ class Sistema206gInstantaneo:
         self.led = LEDControl(2)  # LED onboard
         self.lcd = lcd
         
-        # Valores da sua calibração
+        # Valores da sua calibração (a escala vem da calibração remota, se houver)
+        registro = RegistroCalibracao.carregar()
         self.offset_tara = 0
-        self.fator_escala = -56.97
+        self.fator_escala = registro.fator_escala if registro else FATOR_ESCALA_PADRAO
+        self.reconciliador = Reconciliador()  # Estoque absoluto pelo peso assentado
+        self.configurar(Configuracao.carregar())
         
         # Controle de estado
         self.estado_atual = "VAZIO"
         self.ultimo_peso = 0
         self.estoque = 0  # Contador de estoque
-        
+        self.assentamento = DetectorAssentamento()
+        
+    def configurar(self, config):
+        """Aplica limiares, peso da unidade (e escala, se definida) de uma Configuracao."""
+        self.entrada_g = config["ent"]  # Acima disso = 206g
+        self.saida_g = config["sai"]    # Abaixo disso = vazio
+        if config["escala"]:
+            self.fator_escala = config["escala"]
+        self.reconciliador.unidade_g = config["unid"]
+
     def calibrar_tara_rigorosa(self):
         """Calibração rigorosa com verificação"""
         print("🔧 CALIBRAÇÃO RIGOROSA")
@@ -32,15 +50,17 @@ class Sistema206gInstantaneo:
         leituras = []
         print("   Coletando: ", end="")
         for i in range(15):
-            try:
-                raw = self.hx.read_stable()
-                leituras.append(raw)
-                time.sleep_ms(100)
-                if i % 5 == 0:
-                    print(".", end="")
-            except:
+            raw = self.hx.read_stable()
+            if raw is None:
                 print("E", end="")
+                continue
+            leituras.append(raw)
+            time.sleep_ms(100)
+            if i % 5 == 0:
+                print(".", end="")
         print()
+        if not leituras:
+            raise OSError("HX711 sem leituras validas")
         
         # Mediana para evitar outliers
         leituras.sort()
@@ -87,26 +107,21 @@ class Sistema206gInstantaneo:
     
     def ler_peso_instantaneo(self):
         """Lê o peso SEM suavização para detecção instantânea"""
-        try:
-            raw = self.hx.read_stable()
-            return (raw - self.offset_tara) / self.fator_escala
-        except:
-            return self.ultimo_peso
+        raw = self.hx.read_stable()
+        if raw is None:
+            return self.ultimo_peso  # Leitura inválida não move o estado
+        return (raw - self.offset_tara) / self.fator_escala
     
     def detectar_mudanca_instantanea(self, peso_atual):
         """Detecta mudanças de estado instantaneamente"""
-        # Limiares conservadores
-        ENTRADA_206G = 150  # Acima de 150g = 206g
-        SAIDA_206G = 50     # Abaixo de 50g = vazio
-        
         mudanca = None
         
-        if self.estado_atual == "VAZIO" and peso_atual > ENTRADA_206G:
+        if self.estado_atual == "VAZIO" and peso_atual > self.entrada_g:
             mudanca = "ENTRADA"
             self.estado_atual = "206G"
             self.estoque += 1  # Incrementa estoque
             
-        elif self.estado_atual == "206G" and peso_atual < SAIDA_206G:
+        elif self.estado_atual == "206G" and peso_atual < self.saida_g:
             mudanca = "SAIDA"
             self.estado_atual = "VAZIO"
             if self.estoque > 0:  # Evita estoque negativo
@@ -115,6 +130,36 @@ class Sistema206gInstantaneo:
         self.ultimo_peso = peso_atual
         return mudanca
     
+    def detectar_mudanca_assentada(self, peso_atual, agora_ms):
+        """
+        Igual à detecção instantânea, mas só decide sobre o nível já
+        assentado: dispara assim que o peso para de mexer e ignora o
+        prato balançando durante a colocação.
+        """
+        evento = self.assentamento.atualizar(peso_atual, agora_ms)
+        if evento is None:
+            self.ultimo_peso = peso_atual
+            return None
+        mudanca = self.detectar_mudanca_instantanea(evento["peso"])
+        if mudanca:
+            print("   Assentou em {} ms".format(evento["assentamento_ms"]))
+        elif self.reconciliar(evento["peso"]):
+            mudanca = "AJUSTE"
+        return mudanca
+
+    def reconciliar(self, peso_assentado):
+        """
+        Confere o contador com o absoluto pelo peso; aplica e retorna a
+        correção (unidades) quando confirmada, senão 0.
+        """
+        correcao = self.reconciliador.observar(peso_assentado, self.estoque)
+        if not correcao:
+            return 0
+        print("   Reconciliacao: estoque {} -> {} ({:+d})".format(
+            self.estoque, self.estoque + correcao, correcao))
+        self.estoque += correcao
+        return correcao
+
     def loop_detecção_instantanea(self):
         print("\n" + "=" * 60)
         print("🔄 DETECÇÃO INSTANTÂNEA ATIVA")
@@ -123,11 +168,12 @@ class Sistema206gInstantaneo:
         print("-" * 35)
         
         contador_acoes = 0
+        ultima_reconciliacao = time.ticks_ms()
         
         try:
             while True:
                 peso = self.ler_peso_instantaneo()
-                mudanca = self.detectar_mudanca_instantanea(peso)
+                mudanca = self.detectar_mudanca_assentada(peso, time.ticks_ms())
                 
                 if mudanca == "ENTRADA":
                     self.buzzer.entrada_206g()  # 1 beep de 0.1s
@@ -140,6 +186,18 @@ class Sistema206gInstantaneo:
                     self.led.piscar_saida()     # Piscar LED para saída
                     print("{:5.1f}g | Vazio  | {:7d} | 🚪 SAÍDA".format(peso, self.estoque))
                     contador_acoes += 1
+
+                elif mudanca == "AJUSTE":
+                    print("{:5.1f}g | Ajuste | {:7d} | 🔄 RECONCILIADO".format(peso, self.estoque))
+                
+                # Parado num nível assentado: reconcilia periodicamente
+                agora = time.ticks_ms()
+                if time.ticks_diff(agora, ultima_reconciliacao) >= RECONCILIAR_EVERY_MS:
+                    ultima_reconciliacao = agora
+                    if self.assentamento.nivel is not None and \
+                            self.assentamento.movendo_desde is None and \
+                            self.reconciliar(self.assentamento.nivel):
+                        print("{:5.1f}g | Ajuste | {:7d} | 🔄 RECONCILIADO".format(peso, self.estoque))
                 
                 # Log mínimo do estado atual
                 if time.ticks_ms() % 2000 < 100:  # A cada 2 segundos
@@ -157,30 +215,37 @@ class Sistema206gInstantaneo:
         except Exception as e:
             print("\n❌ Erro: {}".format(e))
 
-    def calibrar_tara(self, hx):
-        """Calibra a tara (offset) da balança."""
+    def calibrar_tara(self, hx, amostras=15, ao_aguardar=None):
+        """
+        Calibra a tara (offset) da balança.
+        Enquanto o HX711 converte, chama ao_aguardar() para que o boot
+        avance Wi-Fi/MQTT em paralelo em vez de dormir.
+        """
         print("Calibrando Tara... Deixe a balanca vazia.")
         self.lcd.mostrar("Calibrando Tara", "Nao toque!")
         
         leituras = []
-        for _ in range(15):
-            leituras.append(hx.read_stable())
-            time.sleep_ms(100)
+        invalidas = 0
+        while len(leituras) < amostras:
+            # O HX711 entrega uma conversão a cada ~100 ms; chip mudo conta como inválida
+            raw = hx.read_stable() if hx.aguardar(ao_aguardar) else None
+            if raw is None:
+                invalidas += 1
+                if invalidas > amostras:
+                    raise OSError("HX711 sem leituras validas")
+                continue
+            leituras.append(raw)
         
         leituras.sort()
         offset = leituras[len(leituras)//2] # Mediana
         
         print(f"Tara definida: {offset}")
         self.lcd.mostrar("Calibrado!", f"Offset: {offset}")
-        time.sleep(1)
         return offset
 
     def ler_peso_gramas(self, hx, offset_tara, fator_escala):
-        # Lê o peso e converte para gramas
-        try:
-            raw = hx.read_stable()
-            peso = (raw - offset_tara) / fator_escala
-            return peso
-        except Exception as e:
-            print(f"Erro ao ler peso: {e}")
-            return 0.0 # Retorna 0 se falhar
\ No newline at end of file
+        # Lê o peso e converte para gramas; None se a leitura for inválida
+        raw = hx.read_stable()
+        if raw is None:
+            return None
+        return (raw - offset_tara) / fator_escala
\ No newline at end of file
@@ -0,0 +1,61 @@
+import ujson
+import machine
+
+# =============================================
+# REGISTRO DE CALIBRAÇÃO PERSISTIDO NA FLASH
+# =============================================
+ARQUIVO_CALIBRACAO = "calibracao.json"
+VERSAO_REGISTRO = 1
+
+FATOR_ESCALA_PADRAO = -56.97  # Usado até existir um registro salvo
+TOLERANCIA_TARA_G = 10        # Mesma margem da calibração rigorosa
+
+
+class RegistroCalibracao:
+    def __init__(self, offset_tara=0, fator_escala=FATOR_ESCALA_PADRAO, origem="padrao"):
+        self.offset_tara = offset_tara
+        self.fator_escala = fator_escala
+        self.origem = origem  # "padrao", "flash" ou "tara"
+
+    @classmethod
+    def carregar(cls):
+        """Lê o registro da flash. Retorna None se não existir ou estiver corrompido."""
+        try:
+            with open(ARQUIVO_CALIBRACAO) as f:
+                dados = ujson.load(f)
+            if dados.get("v") != VERSAO_REGISTRO or not dados.get("escala"):
+                return None
+            return cls(int(dados["offset"]), float(dados["escala"]), "flash")
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def salvar(self):
+        """Grava o registro na flash (escreve num temporário e renomeia)."""
+        import os
+        tmp = ARQUIVO_CALIBRACAO + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                ujson.dump({
+                    "v": VERSAO_REGISTRO,
+                    "offset": self.offset_tara,
+                    "escala": self.fator_escala,
+                }, f)
+            os.rename(tmp, ARQUIVO_CALIBRACAO)
+            return True
+        except OSError as e:
+            print(f"Falha ao salvar calibracao: {e}")
+            return False
+
+    def peso(self, raw):
+        return (raw - self.offset_tara) / self.fator_escala
+
+    def valido_para(self, raw_vazio):
+        """
+        Decide se o registro salvo ainda vale para este boot.
+        Em reset "quente" (watchdog, machine.reset(), deep sleep) a balança
+        pode estar carregada, então a tara salva é mais confiável que uma nova.
+        No power-on só aceita se a plataforma estiver vazia dentro da tolerância.
+        """
+        if machine.reset_cause() != machine.PWRON_RESET:
+            return True
+        return abs(self.peso(raw_vazio)) <= TOLERANCIA_TARA_G
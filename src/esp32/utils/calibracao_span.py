@@ -0,0 +1,66 @@
+# =============================================
+# CALIBRAÇÃO DE SPAN COM PESOS DE REFERÊNCIA
+# =============================================
+# Ajusta raw = escala * gramas + offset por mínimos quadrados usando
+# todas as amostras coletadas em cada peso de referência.
+AMOSTRAS_POR_PONTO = 20
+LIMIAR_RESIDUO_G = 2.0  # Resíduo máximo aceito para gravar na flash
+
+
+class CalibracaoSpan:
+    def __init__(self):
+        self.pontos = []  # Lista de (gramas, [leituras brutas])
+
+    def coletar_ponto(self, hx, gramas, amostras=AMOSTRAS_POR_PONTO):
+        """Lê o HX711 com o peso de referência já sobre a plataforma."""
+        leituras = []
+        for _ in range(2 * amostras):  # Tolera até metade inválida
+            raw = hx.read_stable()
+            if raw is not None:
+                leituras.append(raw)
+                if len(leituras) == amostras:
+                    break
+        if not leituras:
+            raise OSError("HX711 sem leituras validas")
+        self.pontos.append((gramas, leituras))
+        return sum(leituras) / len(leituras)
+
+    def ajustar(self):
+        """
+        Retorna um dicionário com escala, offset e a qualidade do ajuste,
+        ou None se não houver ao menos dois pesos distintos. ValueError se
+        a escala sair nula (mesma leitura em pesos diferentes: HX711 travado).
+        """
+        if len({g for g, _ in self.pontos}) < 2:
+            return None
+
+        n = sx = sy = sxx = sxy = 0
+        for g, leituras in self.pontos:
+            for raw in leituras:
+                n += 1
+                sx += g
+                sy += raw
+                sxx += g * g
+                sxy += g * raw
+        escala = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        if escala == 0:
+            raise ValueError("escala nula: leituras iguais em pesos diferentes")
+        offset = (sy - escala * sx) / n
+
+        # Resíduo por ponto, em gramas, usando a média de cada ponto
+        residuos = []
+        for g, leituras in self.pontos:
+            media = sum(leituras) / len(leituras)
+            residuos.append((media - offset) / escala - g)
+        rms = (sum(r * r for r in residuos) / len(residuos)) ** 0.5
+        maximo = max(abs(r) for r in residuos)
+
+        return {
+            "escala": escala,
+            "offset": int(offset),
+            "pontos": len(self.pontos),
+            "residuos_g": [round(r, 2) for r in residuos],
+            "rms_g": round(rms, 3),
+            "max_g": round(maximo, 3),
+            "aprovada": maximo <= LIMIAR_RESIDUO_G,
+        }
@@ -0,0 +1,113 @@
+import ujson
+
+# =============================================
+# CONFIGURAÇÃO REMOTA (TÓPICO RETIDO POR DISPOSITIVO)
+# =============================================
+# O RPi publica, retido, em balanca/rpi/config/<id> um JSON compacto:
+#   {"v": 7, "ent": 150, "sai": 50, "pub_ms": 1000, "ping_s": 5, "escala": -56.97, "unid": 206}
+# "v" é obrigatório e crescente; os outros campos são opcionais (o que
+# faltar mantém o valor atual). A config inteira é validada antes de
+# trocar qualquer valor, gravada na flash e confirmada com a versão
+# aplicada. Como o tópico é retido, a balança recebe a config vigente a
+# cada conexão; versões já aplicadas são só reconfirmadas.
+ARQUIVO_CONFIG = "config.json"
+
+# campo: (padrão, mínimo, máximo)
+CAMPOS = {
+    "ent": (150, 1, 5000),       # Limiar de ENTRADA (g)
+    "sai": (50, 0, 5000),        # Limiar de SAIDA (g)
+    "pub_ms": (1000, 50, 60000),  # Intervalo de leitura/publicação no OCIOSO
+    "ping_s": (5, 1, 14),        # Ping MQTT; menor que o keepalive (15 s)
+    "escala": (None, None, None),  # Fator de escala; None = o da calibração
+    "unid": (206, 0, 100000),    # Peso de uma unidade (g) na reconciliação; 0 desativa
+}
+
+
+class Configuracao:
+    def __init__(self, valores=None, versao=0):
+        self.versao = versao
+        self.recebidos = ()  # Campos das versões aplicadas e ainda não consumidas pelo loop
+        self.valores = {campo: spec[0] for campo, spec in CAMPOS.items()}
+        if valores:
+            self.valores.update(valores)
+
+    def __getitem__(self, campo):
+        return self.valores[campo]
+
+    @classmethod
+    def carregar(cls):
+        """Config salva na flash, ou a padrão (versão 0)."""
+        try:
+            with open(ARQUIVO_CONFIG) as f:
+                dados = ujson.load(f)
+            versao = int(dados.pop("v"))
+            return cls(_validar(dados, {}), versao)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return cls()
+
+    def salvar(self):
+        import os
+        tmp = ARQUIVO_CONFIG + ".tmp"
+        try:
+            dados = dict(self.valores)
+            dados["v"] = self.versao
+            with open(tmp, "w") as f:
+                ujson.dump(dados, f)
+            os.rename(tmp, ARQUIVO_CONFIG)
+            return True
+        except OSError as e:
+            print(f"Falha ao salvar config: {e}")
+            return False
+
+    def aplicar(self, msg):
+        """
+        Valida e aplica uma config recebida. Retorna (mudou, erro):
+        mudou=True só se uma versão nova foi aplicada; erro é None ou texto.
+        """
+        try:
+            dados = ujson.loads(msg)
+            if not isinstance(dados, dict):
+                return False, "config nao e um objeto"
+            versao = _numero(dados.pop("v"), int)
+        except (ValueError, KeyError, TypeError):
+            return False, "sem versao"
+        if versao <= self.versao:
+            return False, None  # Retido reentregue ou rollout antigo
+        try:
+            novos = _validar(dados, self.valores)
+        except (ValueError, TypeError, AttributeError) as e:
+            # Qualquer config malformada vira erro na confirmação: uma exceção
+            # aqui sairia do callback antes do PUBACK e o retido voltaria a cada conexão
+            return False, str(e)
+        self.valores = novos  # Troca tudo de uma vez
+        self.versao = versao
+        self.recebidos += tuple(dados)
+        self.salvar()
+        return True, None
+
+
+def _numero(valor, tipo):
+    """int/float de um número JSON; TypeError para lista, objeto, texto ou bool."""
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise TypeError("valor nao numerico: " + repr(valor))
+    return tipo(valor)
+
+
+def _validar(dados, atuais):
+    """Nova tabela de valores (atuais + dados) ou ValueError."""
+    valores = {campo: spec[0] for campo, spec in CAMPOS.items()}
+    valores.update(atuais)
+    for campo, valor in dados.items():
+        spec = CAMPOS.get(campo)
+        if spec is None:
+            raise ValueError("campo desconhecido: " + campo)
+        if valor is not None:
+            valor = _numero(valor, float if campo == "escala" else int)
+            if spec[1] is not None and not spec[1] <= valor <= spec[2]:
+                raise ValueError("fora da faixa: " + campo)
+            if campo == "escala" and valor == 0:
+                raise ValueError("escala zero")
+        valores[campo] = valor
+    if valores["sai"] >= valores["ent"]:
+        raise ValueError("sai deve ser menor que ent")
+    return valores
@@ -0,0 +1,58 @@
+# =============================================
+# JANELA DESLIZANTE (média, variância, inclinação)
+# =============================================
+class JanelaDeslizante:
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self.valores = [0.0] * tamanho  # Buffer circular pré-alocado
+        self.pos = 0
+        self.n = 0
+
+    def adicionar(self, valor):
+        self.valores[self.pos] = valor
+        self.pos = (self.pos + 1) % self.tamanho
+        if self.n < self.tamanho:
+            self.n += 1
+
+    def limpar(self):
+        self.pos = 0
+        self.n = 0
+
+    def cheia(self):
+        return self.n == self.tamanho
+
+    def ultimo(self):
+        return self.valores[(self.pos - 1) % self.tamanho]
+
+    def _ordenados(self):
+        """Valores do mais antigo para o mais novo."""
+        inicio = (self.pos - self.n) % self.tamanho
+        return [self.valores[(inicio + i) % self.tamanho] for i in range(self.n)]
+
+    def media(self):
+        if not self.n:
+            return 0.0
+        return sum(self._ordenados()) / self.n
+
+    def variancia(self):
+        if self.n < 2:
+            return 0.0
+        m = self.media()
+        return sum((v - m) * (v - m) for v in self._ordenados()) / (self.n - 1)
+
+    def desvio(self):
+        return self.variancia() ** 0.5
+
+    def inclinacao(self):
+        """Inclinação da reta de mínimos quadrados, em unidades por amostra."""
+        n = self.n
+        if n < 2:
+            return 0.0
+        xm = (n - 1) / 2
+        ym = self.media()
+        num = 0.0
+        den = 0.0
+        for i, v in enumerate(self._ordenados()):
+            num += (i - xm) * (v - ym)
+            den += (i - xm) * (i - xm)
+        return num / den
@@ -0,0 +1,78 @@
+# =============================================
+# PROTOCOLO BINÁRIO DE COMANDOS (RPi -> ESP32)
+# =============================================
+# Quadro: [versão][n comandos] e, para cada comando, [opcode][tam][args...]
+# Um publish em balanca/rpi/feedback pode levar vários comandos, com
+# argumentos (estoque, texto, padrão). Mensagens ASCII antigas
+# ("ENTRADA_OK", ...) continuam aceitas: começam com uma letra, nunca
+# com o byte de versão.
+VERSAO = 0x01
+
+OP_ENTRADA_OK = 0x01   # args opcionais: estoque (uint16 big-endian)
+OP_SAIDA_OK = 0x02     # args opcionais: estoque (uint16 big-endian)
+OP_ERRO = 0x03
+OP_AGUARDANDO = 0x04
+OP_TEXTO = 0x10        # args: linha (0/1) + texto UTF-8
+OP_ESTOQUE = 0x11      # args: estoque (uint16 big-endian)
+OP_LED = 0x20          # args: led, padrão
+OP_BEEP = 0x30         # args: padrão
+OP_LEITURA = 0x40      # Pede uma leitura absoluta imediata (lacuna de sequência)
+
+LED_AZUL = 0
+LED_VERDE = 1
+LED_VERMELHO = 2
+
+PADRAO_DESLIGA = 0
+PADRAO_LIGA = 1
+PADRAO_ENTRADA = 2     # LED: 1 piscada / BEEP: 1 beep
+PADRAO_SAIDA = 3       # LED: 2 piscadas / BEEP: 2 beeps
+PADRAO_ERRO = 4        # LED: 3 piscadas rápidas / BEEP: 3 beeps
+
+# Compatibilidade com os comandos em texto
+COMANDOS_TEXTO = {
+    b"ENTRADA_OK": OP_ENTRADA_OK,
+    b"SAIDA_OK": OP_SAIDA_OK,
+    b"ERRO": OP_ERRO,
+    b"AGUARDANDO": OP_AGUARDANDO,
+}
+
+_SEM_ARGS = memoryview(b"")
+
+
+class ErroProtocolo(Exception):
+    pass
+
+
+def decodificar(msg):
+    """
+    Gera (opcode, args) para cada comando do quadro. msg pode ser um
+    memoryview (vindo direto do cliente MQTT); args também é memoryview.
+    """
+    if not len(msg):
+        return
+    if msg[0] != VERSAO:
+        op = COMANDOS_TEXTO.get(bytes(msg).upper())
+        if op is None:
+            raise ErroProtocolo("comando desconhecido")
+        yield op, _SEM_ARGS
+        return
+
+    if len(msg) < 2:
+        raise ErroProtocolo("quadro truncado")
+    p = 2
+    for _ in range(msg[1]):
+        if p + 2 > len(msg):
+            raise ErroProtocolo("quadro truncado")
+        op = msg[p]
+        tam = msg[p + 1]
+        p += 2
+        if p + tam > len(msg):
+            raise ErroProtocolo("argumento truncado")
+        yield op, msg[p:p + tam]
+        p += tam
+
+
+def uint16(args, padrao=None):
+    if len(args) < 2:
+        return padrao
+    return args[0] << 8 | args[1]
@@ -0,0 +1,72 @@
+import math
+
+# =============================================
+# RECONCILIAÇÃO DO ESTOQUE PELO PESO ABSOLUTO
+# =============================================
+# O contador de estoque só integra ENTRADAs e SAIDAs: uma SAIDA perdida
+# (ou o "não fica negativo") o deixa errado para sempre. O nível assentado
+# já diz quantas unidades há no prato: round(peso / unidade). Só vale
+# quando o arredondamento não pode errar: o resíduo até o múltiplo mais
+# próximo mais 3 sigmas (variação entre unidades, que cresce com raiz de
+# n, e ruído do nível) tem que ficar abaixo de meia unidade. Uma
+# divergência só vira correção depois de CONFIRMACOES observações
+# seguidas com o mesmo absoluto, e sai como um delta único.
+UNIDADE_G = 206
+DESVIO_UNIDADE_G = 3.0   # Desvio padrão do peso de uma unidade
+RUIDO_G = 3.0            # Desvio do nível assentado (LIMIAR_DESVIO_G)
+CONFIRMACOES = 2
+
+
+class Reconciliador:
+    def __init__(self, unidade_g=UNIDADE_G, desvio_unidade_g=DESVIO_UNIDADE_G,
+                 ruido_g=RUIDO_G, confirmacoes=CONFIRMACOES):
+        self.unidade_g = unidade_g  # 0 desativa
+        self.desvio_unidade_g = desvio_unidade_g
+        self.ruido_g = ruido_g
+        self.confirmacoes = confirmacoes
+        self.candidato = None  # Absoluto divergente ainda não confirmado
+        self.vistas = 0
+        self.ultimo = None     # Absoluto da última observação segura
+        self.observacoes = 0
+        self.incertas = 0
+        self.correcoes = 0
+
+    def absoluto(self, peso):
+        """Unidades no prato pelo peso, ou None se o arredondamento não for seguro."""
+        if not self.unidade_g:
+            return None
+        n = round(peso / self.unidade_g)
+        if n < 0:
+            return None  # Tara deslocada, não estoque negativo
+        margem = 3 * (math.sqrt(max(n, 1)) * self.desvio_unidade_g + self.ruido_g)
+        if abs(peso - n * self.unidade_g) + margem >= self.unidade_g / 2:
+            return None
+        return n
+
+    def observar(self, peso, integrado):
+        """Correção (absoluto - integrado) quando confirmada; senão None."""
+        self.observacoes += 1
+        n = self.ultimo = self.absoluto(peso)
+        if n is None:
+            self.incertas += 1
+            self.candidato = None
+            return None
+        if n == integrado:
+            self.candidato = None
+            return None
+        if n != self.candidato:
+            self.candidato = n
+            self.vistas = 0
+        self.vistas += 1
+        if self.vistas < self.confirmacoes:
+            return None
+        self.candidato = None
+        self.correcoes += 1
+        return n - integrado
+
+    def estatisticas(self):
+        return {
+            "observacoes": self.observacoes,
+            "incertas": self.incertas,
+            "correcoes": self.correcoes,
+        }
@@ -0,0 +1,74 @@
+import time
+import random
+
+# =============================================
+# RECONEXÃO: Wi-Fi x BROKER, BACKOFF COM JITTER
+# =============================================
+# A primeira tentativa é imediata (a maioria das quedas é um blip); as
+# seguintes crescem até BACKOFF_MAX_MS, sempre com jitter para que um
+# corredor inteiro de balanças não bata no broker ao mesmo tempo.
+FALHA_WIFI = "wifi"
+FALHA_BROKER = "broker"
+
+BACKOFF_INICIAL_MS = 250
+BACKOFF_MAX_MS = 30000
+
+
+class ReconexaoMQTT:
+    def __init__(self):
+        self.tentativa = 0
+        self.caiu_em = None
+        self.tipo = None
+        # Métricas de tempo de recuperação (MTTR), por tipo de falha
+        self.recuperacoes = {FALHA_WIFI: 0, FALHA_BROKER: 0}
+        self.total_ms = {FALHA_WIFI: 0, FALHA_BROKER: 0}
+        self.ultima_ms = 0
+        # Custo de cada connect() (TCP + TLS + CONNACK)
+        self.conexoes = 0
+        self.connect_total_ms = 0
+        self.connect_ultimo_ms = None
+
+    def registrar_queda(self, wifi_ok):
+        """Chamado na primeira falha; classifica a causa."""
+        if self.caiu_em is None:
+            self.caiu_em = time.ticks_ms()
+            self.tentativa = 0
+        # Se o Wi-Fi cair no meio da recuperação, a causa passa a ser ele
+        if not wifi_ok or self.tipo is None:
+            self.tipo = FALHA_BROKER if wifi_ok else FALHA_WIFI
+
+    def proxima_espera_ms(self):
+        """0 na primeira tentativa; depois exponencial com jitter (50%..100%)."""
+        self.tentativa += 1
+        if self.tentativa == 1:
+            return 0
+        base = min(BACKOFF_INICIAL_MS << min(self.tentativa - 2, 10), BACKOFF_MAX_MS)
+        return base // 2 + random.getrandbits(16) % (base // 2 + 1)
+
+    def registrar_conexao(self, connect_ms):
+        if connect_ms is None:
+            return
+        self.conexoes += 1
+        self.connect_total_ms += connect_ms
+        self.connect_ultimo_ms = connect_ms
+
+    def registrar_recuperacao(self):
+        if self.caiu_em is None:
+            return
+        self.ultima_ms = time.ticks_diff(time.ticks_ms(), self.caiu_em)
+        self.recuperacoes[self.tipo] += 1
+        self.total_ms[self.tipo] += self.ultima_ms
+        self.caiu_em = None
+        self.tipo = None
+
+    def estatisticas(self):
+        mttr = {}
+        for tipo, n in self.recuperacoes.items():
+            mttr[tipo] = self.total_ms[tipo] // n if n else None
+        return {
+            "recuperacoes": self.recuperacoes,
+            "mttr_ms": mttr,
+            "ultima_ms": self.ultima_ms,
+            "connect_ms": self.connect_ultimo_ms,
+            "connect_medio_ms": self.connect_total_ms // self.conexoes if self.conexoes else None,
+        }
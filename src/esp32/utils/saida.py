@@ -0,0 +1,118 @@
+import time
+
+# =============================================
+# SAÍDA MQTT POR CLASSES (eventos antes de telemetria)
+# =============================================
+# Publicar direto no loop deixa a ordem por conta de quem chamou: depois
+# de uma queda, o anel da aquisição despeja dezenas de peso_raw antes do
+# peso_estavel que dispara o feedback, e o check_msg() só roda depois.
+# Aqui cada publicação entra numa classe:
+#   EVENTO: peso_estavel e respostas a comandos; estrita, sai sempre primeiro
+#   TELEMETRIA / ESTATISTICAS: dividem por peso (WFQ autorrelógio: a cabeça
+#     de cada fila ganha um término virtual bytes/peso e sai a menor)
+# drenar() escreve toda a classe estrita e no máximo ORCAMENTO_BYTES das
+# outras por volta do loop, então um comando que chegue no meio de um
+# backlog espera uma volta, não o backlog inteiro. Filas limitadas: cheia,
+# descarta a mais antiga (ANTIGO) ou recusa a nova (NOVO).
+EVENTO = 0
+TELEMETRIA = 1
+ESTATISTICAS = 2
+NOME_CLASSE = ("evento", "telemetria", "estatisticas")
+
+ANTIGO = 0
+NOVO = 1
+
+ORCAMENTO_BYTES = 1024
+
+# (limite, peso, descarte); peso 0 = estrita
+CLASSES = (
+    (16, 0, ANTIGO),       # O nível assentado mais novo é o que importa
+    (64, 3, ANTIGO),       # Mesmo tamanho do anel da aquisição
+    (8, 1, NOVO),          # Relatórios periódicos: o próximo repõe
+)
+
+
+class _Fila:
+    def __init__(self, limite, peso, descarte):
+        self.limite = limite
+        self.peso = peso
+        self.descarte = descarte
+        self.itens = []          # (topico, msg, retain, t_ms)
+        self.cabeca_fim = 0.0    # Término virtual da mensagem na cabeça
+        self.ultimo_fim = 0.0
+        self.enviadas = 0
+        self.descartadas = 0
+        # Latência enfileirar -> escrita no socket (janela entre relatórios)
+        self.lat_soma_ms = 0
+        self.lat_n = 0
+        self.lat_max_ms = 0
+
+
+class CaixaSaida:
+    def __init__(self, classes=CLASSES, orcamento_bytes=ORCAMENTO_BYTES):
+        self.filas = [_Fila(*c) for c in classes]
+        self.orcamento_bytes = orcamento_bytes
+        self.virtual = 0.0
+
+    def enfileirar(self, classe, topico, msg, retain=False):
+        """False se a fila estava cheia e a política recusou a mensagem."""
+        fila = self.filas[classe]
+        if len(fila.itens) >= fila.limite:
+            fila.descartadas += 1
+            if fila.descarte == NOVO:
+                return False
+            fila.itens.pop(0)
+        if not fila.itens and fila.peso:
+            fila.cabeca_fim = max(self.virtual, fila.ultimo_fim) + len(msg) / fila.peso
+        fila.itens.append((topico, msg, retain, time.ticks_ms()))
+        return True
+
+    def _proxima(self):
+        escolhida = None
+        for fila in self.filas:
+            if not fila.itens:
+                continue
+            if not fila.peso:
+                return fila
+            if escolhida is None or fila.cabeca_fim < escolhida.cabeca_fim:
+                escolhida = fila
+        return escolhida
+
+    def drenar(self, cliente):
+        """Escreve no socket; um OSError deixa a mensagem na fila para a reconexão."""
+        gasto = 0
+        while True:
+            fila = self._proxima()
+            if fila is None or (fila.peso and gasto >= self.orcamento_bytes):
+                return
+            topico, msg, retain, t_ms = fila.itens[0]
+            cliente.publish(topico, msg, retain)
+            fila.itens.pop(0)  # Só sai da fila depois de escrita
+            if fila.peso:
+                gasto += len(msg)
+                self.virtual = fila.ultimo_fim = fila.cabeca_fim
+                if fila.itens:
+                    fila.cabeca_fim += len(fila.itens[0][1]) / fila.peso
+            lat = time.ticks_diff(time.ticks_ms(), t_ms)
+            fila.enviadas += 1
+            fila.lat_soma_ms += lat
+            fila.lat_n += 1
+            if lat > fila.lat_max_ms:
+                fila.lat_max_ms = lat
+
+    def pendentes(self):
+        return sum(len(f.itens) for f in self.filas)
+
+    def estatisticas(self):
+        """Por classe: fila, enviadas, descartadas, latência média/máx (ms); zera a janela."""
+        dados = {}
+        for nome, fila in zip(NOME_CLASSE, self.filas):
+            dados[nome] = {
+                "fila": len(fila.itens),
+                "enviadas": fila.enviadas,
+                "descartadas": fila.descartadas,
+                "lat_media_ms": fila.lat_soma_ms // fila.lat_n if fila.lat_n else None,
+                "lat_max_ms": fila.lat_max_ms,
+            }
+            fila.lat_soma_ms = fila.lat_n = fila.lat_max_ms = 0
+        return dados
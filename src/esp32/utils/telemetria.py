@@ -0,0 +1,92 @@
+# =============================================
+# TELEMETRIA: ÉPOCA DE BOOT + NÚMERO DE SEQUÊNCIA
+# =============================================
+# Todo quadro enviado ao RPi leva (id, época, seq, ticks_ms). A época é
+# incrementada na flash a cada boot; seq cresce sem voltar dentro da
+# mesma época. Assim o edge distingue leitura perdida, duplicada após
+# reconexão ou fora de ordem de uma mudança real de peso.
+#
+# A época é gravada no arquivo e numa cópia na NVS (partição própria, não
+# some com o sistema de arquivos). Se as duas se perderem, a nova época é
+# aleatória acima de EPOCA_RECOMECO, fora do alcance do contador: uma
+# constante (1) ficaria abaixo do que o edge e a nuvem já viram e todo o
+# tráfego seria descartado como antigo. Se mesmo assim cair abaixo, o edge
+# confirma a regressão pelo fluxo de leituras (raspberrypi/sequencia.py).
+ARQUIVO_EPOCA = "epoca.txt"
+EPOCA_RECOMECO = 1 << 30
+
+
+def _ler_arquivo():
+    try:
+        with open(ARQUIVO_EPOCA) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _nvs():
+    try:
+        import esp32
+        return esp32.NVS("telemetria")
+    except (ImportError, OSError):
+        return None
+
+
+def _ler_nvs():
+    nvs = _nvs()
+    try:
+        return nvs.get_i32("epoca") if nvs else None
+    except OSError:
+        return None
+
+
+def proxima_epoca():
+    """(época deste boot, recomeçada?): lê as cópias salvas, incrementa e grava de volta."""
+    salvas = [e for e in (_ler_arquivo(), _ler_nvs()) if e is not None]
+    if salvas:
+        epoca = max(salvas) + 1
+    else:
+        import random
+        epoca = EPOCA_RECOMECO + random.getrandbits(29)
+        print(f"Epoca perdida: recomecando em {epoca}")
+    try:
+        with open(ARQUIVO_EPOCA, "w") as f:
+            f.write(str(epoca))
+    except OSError as e:
+        print(f"Falha ao gravar epoca: {e}")
+    nvs = _nvs()
+    if nvs:
+        try:
+            nvs.set_i32("epoca", epoca)
+            nvs.commit()
+        except OSError as e:
+            print(f"Falha ao gravar epoca na NVS: {e}")
+    return epoca, not salvas
+
+
+class Telemetria:
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.epoca, self.epoca_recomecada = proxima_epoca()
+        self.seq = 0
+
+    def _proximo(self):
+        self.seq += 1
+        return self.seq
+
+    def quadro_peso(self, peso, agora_ms, raw):
+        """peso_raw: "id,epoca,seq,t_ms,peso,raw" (texto, compacto)."""
+        return "{},{},{},{},{:.1f},{}".format(
+            self.client_id, self.epoca, self._proximo(), agora_ms, peso, raw)
+
+    def quadro_canal(self, agora_ms, raw):
+        """Canal secundário do HX711: "id,epoca,t_ms,raw" (sem seq, fora da ordem do peso)."""
+        return "{},{},{},{}".format(self.client_id, self.epoca, agora_ms, raw)
+
+    def carimbar(self, dados, agora_ms):
+        """Acrescenta os campos de sequência a um quadro JSON (dict)."""
+        dados["id"] = self.client_id
+        dados["epoca"] = self.epoca
+        dados["seq"] = self._proximo()
+        dados["t_ms"] = agora_ms
+        return dados
@@ -0,0 +1,167 @@
+"""
+Analítica vetorizada (NumPy) sobre os fluxos de peso de todos os dispositivos.
+
+As amostras chegam uma a uma pelo MQTT, mas são só enfileiradas; a cada
+poucos milissegundos processar() grava o lote inteiro nos buffers
+circulares (uma linha por dispositivo) e calcula, de uma vez para a frota:
+
+- média móvel (filtro) e desvio padrão na janela;
+- degrau: diferença entre a metade nova e a metade antiga da janela;
+- anomalias: sensor travado (raw idêntico na janela inteira) e célula
+  ruidosa (desvio alto sem degrau).
+
+Saturação do HX711 não é flag daqui: o ESP32 descarta os códigos de fundo
+de escala como leitura inválida (HX711_Estavel.py), então eles nunca
+chegam ao edge; quem a reporta é o contador "saturado" do próprio ESP32
+em balanca/esp32/sensor.
+
+O laço do edge só usa as anomalias: processar() calcula apenas o que as
+flags precisam; estatisticas() dá o conjunto completo sob demanda. Um
+dispositivo com menos de uma janela de amostras só entra nas contas com
+as posições já escritas (as demais são zeros da alocação, não leituras).
+Amostra sem raw é gravada como SEM_RAW e fica fora do travado: uma
+janela com lacunas não vira sensor travado.
+"""
+import threading
+
+import numpy as np
+
+CAPACIDADE = 256           # Amostras guardadas por dispositivo
+JANELA = 16                # Janela das estatísticas móveis
+LIMIAR_DEGRAU_G = 100.0    # Meia janela nova x antiga
+LIMIAR_RUIDO_G = 5.0       # Desvio padrão com o peso parado
+
+SEM_RAW = np.iinfo(np.int32).min  # Fora da faixa de 24 bits do HX711
+_RAW_TETO = np.iinfo(np.int32).max
+
+TRAVADO = 1
+# 2 era SATURADO: quem conta a saturação é o ESP32 (ver acima)
+RUIDOSO = 4
+
+
+class AnaliticaFrota:
+    def __init__(self, max_dispositivos=64, capacidade=CAPACIDADE, janela=JANELA):
+        self.capacidade = capacidade
+        self.janela = janela
+        self.linhas = {}  # id do dispositivo -> linha nos buffers
+        self.ids = []
+        self._alocar(max_dispositivos)
+        self._pendentes = []
+        self._trava = threading.Lock()
+
+    def _alocar(self, n):
+        self.peso = np.zeros((n, self.capacidade), dtype=np.float32)
+        self.raw = np.zeros((n, self.capacidade), dtype=np.int32)
+        self.t_ms = np.zeros((n, self.capacidade), dtype=np.int64)
+        self.cursor = np.zeros(n, dtype=np.int64)   # Próxima posição de escrita
+        self.total = np.zeros(n, dtype=np.int64)    # Amostras já recebidas
+
+    def _crescer(self):
+        antigo = (self.peso, self.raw, self.t_ms, self.cursor, self.total)
+        n = len(self.cursor)
+        self._alocar(2 * n)
+        for novo, velho in zip((self.peso, self.raw, self.t_ms, self.cursor, self.total), antigo):
+            novo[:n] = velho
+
+    def linha(self, id):
+        linha = self.linhas.get(id)
+        if linha is None:
+            linha = len(self.ids)
+            if linha == len(self.cursor):
+                self._crescer()
+            self.linhas[id] = linha
+            self.ids.append(id)
+        return linha
+
+    def adicionar(self, amostra):
+        """Chamado pela thread do MQTT: só enfileira (barato)."""
+        with self._trava:
+            self._pendentes.append(amostra)
+
+    def gravar_lote(self, linhas, pesos, raws, ts):
+        """Escreve um lote (arrays alinhados) nos buffers circulares, vetorizado."""
+        if not len(linhas):
+            return
+        # Posição de cada amostra dentro do seu dispositivo, preservando a ordem
+        ordem = np.argsort(linhas, kind="stable")
+        linhas_ord = linhas[ordem]
+        contagem = np.bincount(linhas_ord, minlength=len(self.cursor))
+        inicio_grupo = np.cumsum(contagem) - contagem
+        rank = np.arange(len(linhas_ord)) - inicio_grupo[linhas_ord]
+        pos = (self.cursor[linhas_ord] + rank) % self.capacidade
+        self.peso[linhas_ord, pos] = pesos[ordem]
+        self.raw[linhas_ord, pos] = raws[ordem]
+        self.t_ms[linhas_ord, pos] = ts[ordem]
+        self.cursor = (self.cursor + contagem) % self.capacidade
+        self.total += contagem
+
+    def processar(self):
+        """Consome a fila e devolve as anomalias da frota ({"ids", "flags"})."""
+        with self._trava:
+            lote, self._pendentes = self._pendentes, []
+        if lote:
+            linhas = np.fromiter((self.linha(a.dispositivo) for a in lote), dtype=np.int64, count=len(lote))
+            pesos = np.fromiter((a.peso for a in lote), dtype=np.float32, count=len(lote))
+            raws = np.fromiter((a.raw if a.raw is not None else SEM_RAW for a in lote),
+                               dtype=np.int32, count=len(lote))
+            ts = np.fromiter((a.t_ms for a in lote), dtype=np.int64, count=len(lote))
+            self.gravar_lote(linhas, pesos, raws, ts)
+        return self.anomalias()
+
+    def _janela(self):
+        """Últimas w amostras de cada dispositivo (mais nova por último) e a máscara das escritas."""
+        n = len(self.ids)
+        w = self.janela
+        idx = (self.cursor[:n, None] - w + np.arange(w)[None, :]) % self.capacidade
+        linhas = np.arange(n)[:, None]
+        escritas = np.minimum(self.total[:n], w)
+        validos = np.arange(w)[None, :] >= (w - escritas)[:, None]
+        return self.peso[linhas, idx], self.raw[linhas, idx], validos, escritas
+
+    def _flags(self, pesos, raws, validos, escritas):
+        cheio = escritas >= self.janela
+        metade = self.janela // 2
+        flags = np.zeros(len(escritas), dtype=np.int8)
+        com_raw = validos & (raws != SEM_RAW)
+        # Travado e ruidoso só com a janela inteira: bastam as linhas cheias
+        p, r, c = pesos[cheio], raws[cheio], com_raw[cheio]
+        degrau = p[:, metade:].mean(axis=1) - p[:, :metade].mean(axis=1)
+        cheias = flags[cheio]
+        # Travado: raws presentes (ao menos meia janela) todos iguais
+        menor = np.where(c, r, _RAW_TETO).min(axis=1)
+        maior = np.where(c, r, SEM_RAW).max(axis=1)
+        cheias[(c.sum(axis=1) >= metade) & (menor == maior)] |= TRAVADO
+        cheias[(np.abs(degrau) <= LIMIAR_DEGRAU_G) & (p.std(axis=1) > LIMIAR_RUIDO_G)] |= RUIDOSO
+        flags[cheio] = cheias
+        return flags
+
+    def anomalias(self):
+        pesos, raws, validos, escritas = self._janela()
+        return {"ids": self.ids[:len(escritas)], "flags": self._flags(pesos, raws, validos, escritas)}
+
+    def estatisticas(self):
+        """Dicionário de arrays (uma posição por dispositivo ativo); só posições escritas contam."""
+        pesos, raws, validos, escritas = self._janela()
+        cont = np.maximum(escritas, 1)
+        media = np.where(validos, pesos, 0).sum(axis=1) / cont
+        desvio = np.sqrt(np.where(validos, (pesos - media[:, None]) ** 2, 0).sum(axis=1) / cont)
+        metade = self.janela // 2
+        degrau = pesos[:, metade:].mean(axis=1) - pesos[:, :metade].mean(axis=1)
+        tem_degrau = (escritas >= self.janela) & (np.abs(degrau) > LIMIAR_DEGRAU_G)
+        return {
+            "ids": self.ids[:len(escritas)],
+            "media": media,
+            "desvio": desvio,
+            "degrau": np.where(tem_degrau, degrau, 0.0),
+            "flags": self._flags(pesos, raws, validos, escritas),
+            "ultimo": np.where(escritas > 0, pesos[:, -1], np.nan),
+        }
+
+
+def descrever_flags(flags):
+    nomes = []
+    if flags & TRAVADO:
+        nomes.append("travado")
+    if flags & RUIDOSO:
+        nomes.append("ruidoso")
+    return nomes
@@ -0,0 +1,240 @@
+"""
+Histórico local (SQLite) de amostras de peso e eventos de estoque.
+
+- Inserções em lote: adicionar() só enfileira; descarregar() grava tudo
+  numa transação (executemany), chamado pelo loop do edge.
+- Rollup automático: cada lote já atualiza os agregados de 1 s e 1 min
+  (n, min, max, soma, último) por upsert incremental, sem reler o bruto.
+- Retenção por tabela (bruto 7 dias, 1 s 30 dias, 1 min 1 ano).
+- Tabelas WITHOUT ROWID com chave (dispositivo, t, ...): a consulta por
+  dispositivo e janela de tempo é uma varredura de intervalo no índice.
+  No bruto a chave termina em (época, seq) do ESP32: duas leituras que
+  chegam no mesmo milissegundo do edge (rajada, reenvio após reconexão)
+  são linhas distintas; só a mesma leitura repetida é descartada, antes
+  dos agregados, e contada em `descartadas`.
+"""
+import sqlite3
+import threading
+import time
+
+LOTE_MAX = 2000          # Descarrega antes se a fila passar disso
+DESCARGA_S = 1.0         # Período máximo entre descargas
+
+RETENCAO_S = {
+    "amostras": 7 * 86400,
+    "agregados_1s": 30 * 86400,
+    "agregados_1min": 365 * 86400,
+    "eventos": 365 * 86400,
+}
+
+VERSAO_ESQUEMA = 2  # PRAGMA user_version; 2 = amostras com época/seq na chave
+
+_ESQUEMA_AMOSTRAS = """
+CREATE TABLE IF NOT EXISTS amostras (
+    disp INTEGER NOT NULL, t INTEGER NOT NULL, epoca INTEGER NOT NULL, seq INTEGER NOT NULL,
+    peso REAL, raw INTEGER,
+    PRIMARY KEY (disp, t, epoca, seq)
+) WITHOUT ROWID
+"""
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS dispositivos (
+    id INTEGER PRIMARY KEY,
+    nome TEXT UNIQUE NOT NULL
+);
+""" + _ESQUEMA_AMOSTRAS + """;
+CREATE TABLE IF NOT EXISTS eventos (
+    disp INTEGER NOT NULL, t INTEGER NOT NULL, delta INTEGER, peso REAL,
+    epoca INTEGER, seq INTEGER,
+    PRIMARY KEY (disp, t, seq)
+) WITHOUT ROWID;
+"""
+
+_ESQUEMA_AGREGADO = """
+CREATE TABLE IF NOT EXISTS {tabela} (
+    disp INTEGER NOT NULL, t INTEGER NOT NULL,
+    n INTEGER, minimo REAL, maximo REAL, soma REAL, ultimo REAL, t_ultimo INTEGER,
+    PRIMARY KEY (disp, t)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_AGREGADO = """
+INSERT INTO {tabela} (disp, t, n, minimo, maximo, soma, ultimo, t_ultimo)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (disp, t) DO UPDATE SET
+    n = n + excluded.n,
+    minimo = min(minimo, excluded.minimo),
+    maximo = max(maximo, excluded.maximo),
+    soma = soma + excluded.soma,
+    ultimo = CASE WHEN excluded.t_ultimo >= t_ultimo THEN excluded.ultimo ELSE ultimo END,
+    t_ultimo = max(t_ultimo, excluded.t_ultimo)
+"""
+
+# (tabela, largura do balde em ms)
+AGREGADOS = (("agregados_1s", 1000), ("agregados_1min", 60000))
+_BALDE_MS = dict(AGREGADOS, amostras=1, eventos=1)
+
+
+class ArmazenamentoSerie:
+    def __init__(self, caminho="historico.db"):
+        self.db = sqlite3.connect(caminho)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self._migrar()
+        self.db.executescript(_ESQUEMA)
+        for tabela, _ in AGREGADOS:
+            self.db.executescript(_ESQUEMA_AGREGADO.format(tabela=tabela))
+        self.ids = dict(self.db.execute("SELECT nome, id FROM dispositivos"))
+        self._amostras = []
+        self._eventos = []
+        self._trava = threading.Lock()
+        self._ultima_descarga = time.monotonic()
+        self.gravadas = 0
+        self.descartadas = 0  # Amostras repetidas (mesma época/seq) não gravadas
+
+    def _migrar(self):
+        """
+        Bancos antigos: amostras com chave (disp, t) ganham época/seq (0 no
+        que já existe). Uma transação só (executescript faria COMMIT no meio)
+        e a versão do esquema sobe por último: uma queda no meio volta atrás
+        e a migração roda de novo no próximo início.
+        """
+        if self.db.execute("PRAGMA user_version").fetchone()[0] >= VERSAO_ESQUEMA:
+            return
+        colunas = [c[1] for c in self.db.execute("PRAGMA table_info(amostras)")]
+        self.db.execute("BEGIN")
+        try:
+            if colunas and "seq" not in colunas:
+                self.db.execute("ALTER TABLE amostras RENAME TO amostras_v1")
+                self.db.execute(_ESQUEMA_AMOSTRAS)
+                self.db.execute("INSERT INTO amostras SELECT disp, t, 0, 0, peso, raw FROM amostras_v1")
+                self.db.execute("DROP TABLE amostras_v1")
+            self.db.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    # ---------- escrita ----------
+    def adicionar(self, amostra, t_ms=None):
+        """Enfileira uma Amostra (thread do MQTT). t_ms = relógio do edge."""
+        t_ms = int(time.time() * 1000) if t_ms is None else t_ms
+        with self._trava:
+            self._amostras.append((amostra.dispositivo, t_ms, amostra.epoca, amostra.seq,
+                                   amostra.peso, amostra.raw))
+
+    def adicionar_evento(self, evento):
+        t_ms = int(evento.get("ts", time.time()) * 1000)
+        with self._trava:
+            self._eventos.append((evento["dispositivo"], t_ms, evento["delta_unidades"],
+                                  evento.get("peso"), evento.get("epoca"), evento.get("seq")))
+
+    def precisa_descarregar(self):
+        return len(self._amostras) >= LOTE_MAX or \
+            time.monotonic() - self._ultima_descarga >= DESCARGA_S
+
+    def _id(self, nome):
+        id = self.ids.get(nome)
+        if id is None:
+            id = self.db.execute("INSERT INTO dispositivos (nome) VALUES (?)", (nome,)).lastrowid
+            self.ids[nome] = id
+        return id
+
+    def descarregar(self):
+        """Grava o lote pendente e atualiza os agregados numa transação."""
+        with self._trava:
+            amostras, self._amostras = self._amostras, []
+            eventos, self._eventos = self._eventos, []
+        self._ultima_descarga = time.monotonic()
+        if not amostras and not eventos:
+            return 0
+
+        with self.db:
+            vistas = set()
+            linhas = []
+            for d, t, epoca, seq, p, r in amostras:
+                chave = (self._id(d), t, epoca, seq)
+                if chave not in vistas:
+                    vistas.add(chave)
+                    linhas.append(chave + (p, r))
+            antes = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO amostras VALUES (?, ?, ?, ?, ?, ?)", linhas)
+            gravadas = self.db.total_changes - antes
+            self.gravadas += gravadas
+            self.descartadas += len(amostras) - gravadas
+            self.db.executemany("INSERT OR IGNORE INTO eventos VALUES (?, ?, ?, ?, ?, ?)",
+                                [(self._id(e[0]),) + e[1:] for e in eventos])
+            for tabela, largura in AGREGADOS:
+                self.db.executemany(_UPSERT_AGREGADO.format(tabela=tabela),
+                                    _agregar(linhas, largura))
+        return len(amostras)
+
+    def estatisticas(self):
+        return {"gravadas": self.gravadas, "descartadas": self.descartadas}
+
+    def aplicar_retencao(self, agora_ms=None):
+        """Apaga o que passou da retenção (por dispositivo, usando a chave)."""
+        agora_ms = int(time.time() * 1000) if agora_ms is None else agora_ms
+        with self.db:
+            for tabela, retencao in RETENCAO_S.items():
+                limite = (agora_ms - retencao * 1000) // _BALDE_MS[tabela]
+                for id in self.ids.values():
+                    self.db.execute(f"DELETE FROM {tabela} WHERE disp = ? AND t < ?", (id, limite))
+
+    # ---------- consulta ----------
+    def consultar(self, dispositivo, inicio_ms, fim_ms, resolucao=None):
+        """
+        Série de um dispositivo em [inicio_ms, fim_ms). resolucao "bruto",
+        "1s" ou "1min"; por padrão escolhe pela largura da janela (até
+        10 min bruto, até 1 h em 1 s, acima disso 1 min).
+        Agregados retornam (t_ms, n, min, max, media, ultimo).
+        """
+        id = self.ids.get(dispositivo)
+        if id is None:
+            return []
+        if resolucao is None:
+            largura = fim_ms - inicio_ms
+            resolucao = "bruto" if largura <= 600000 else ("1s" if largura <= 3600000 else "1min")
+        if resolucao == "bruto":
+            return self.db.execute(
+                "SELECT t, peso, raw FROM amostras WHERE disp = ? AND t >= ? AND t < ? ORDER BY t",
+                (id, inicio_ms, fim_ms)).fetchall()
+        tabela, balde = ("agregados_1s", 1000) if resolucao == "1s" else ("agregados_1min", 60000)
+        return self.db.execute(
+            f"SELECT t * {balde}, n, minimo, maximo, soma / n, ultimo FROM {tabela} "
+            "WHERE disp = ? AND t >= ? AND t < ? ORDER BY t",
+            (id, inicio_ms // balde, -(-fim_ms // balde))).fetchall()
+
+    def consultar_eventos(self, dispositivo, inicio_ms, fim_ms):
+        id = self.ids.get(dispositivo)
+        if id is None:
+            return []
+        return self.db.execute(
+            "SELECT t, delta, peso, epoca, seq FROM eventos "
+            "WHERE disp = ? AND t >= ? AND t < ? ORDER BY t",
+            (id, inicio_ms, fim_ms)).fetchall()
+
+    def fechar(self):
+        self.descarregar()
+        self.db.close()
+
+
+def _agregar(linhas, largura):
+    """Agrega um lote (disp, t, epoca, seq, peso, raw) em baldes de `largura` ms."""
+    baldes = {}
+    for disp, t, _, _, peso, _ in linhas:
+        chave = (disp, t // largura)
+        b = baldes.get(chave)
+        if b is None:
+            baldes[chave] = [1, peso, peso, peso, peso, t]
+        else:
+            b[0] += 1
+            if peso < b[1]:
+                b[1] = peso
+            if peso > b[2]:
+                b[2] = peso
+            b[3] += peso
+            if t >= b[5]:
+                b[4] = peso
+                b[5] = t
+    return [chave + tuple(b) for chave, b in baldes.items()]
@@ -0,0 +1,65 @@
+"""
+Benchmark do histórico SQLite: vazão de inserção em lote e latência de
+consultas por dispositivo/janela depois de dias de dados.
+
+    python bench_armazenamento.py --dispositivos 4 --dias 3 --taxa 1
+
+Usa um banco temporário; --taxa 1 (o padrão) é o ESP32 ocioso com o pub_ms padrão (1000 ms).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from armazenamento import ArmazenamentoSerie
+from telemetria import Amostra
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do histórico SQLite")
+    parser.add_argument("--dispositivos", type=int, default=4)
+    parser.add_argument("--dias", type=float, default=3.0)
+    parser.add_argument("--taxa", type=float, default=1.0, help="Amostras/s por dispositivo")
+    args = parser.parse_args()
+
+    caminho = os.path.join(tempfile.mkdtemp(), "bench.db")
+    historico = ArmazenamentoSerie(caminho)
+    ids = [f"esp32-balanca-{i:02d}" for i in range(args.dispositivos)]
+    passo_ms = int(1000 / args.taxa)
+    fim_ms = int(time.time() * 1000)
+    inicio_ms = fim_ms - int(args.dias * 86400000)
+
+    # 1) Inserção: um lote por segundo simulado, como no edge
+    total = 0
+    inicio = time.perf_counter()
+    seq = 0
+    for t_lote in range(inicio_ms, fim_ms, 1000):
+        for t in range(t_lote, t_lote + 1000, passo_ms):
+            seq += 1
+            for id in ids:
+                historico.adicionar(Amostra(id, 1, seq, 0, 206 * random.random(), 0), t)
+        total += historico.descarregar()
+    decorrido = time.perf_counter() - inicio
+    print(f"Inserção: {total} amostras em {decorrido:.1f} s -> {total / decorrido:,.0f} amostras/s "
+          f"({os.path.getsize(caminho) / 2**20:.0f} MiB)")
+
+    # 2) Consultas: janela aleatória por resolução
+    for nome, largura_ms in (("10 min (bruto)", 600000), ("1 h (1 s)", 3600000),
+                             ("1 dia (1 min)", 86400000), ("todo o período (1 min)", fim_ms - inicio_ms)):
+        tempos = []
+        for _ in range(20):
+            a = random.randint(inicio_ms, max(inicio_ms, fim_ms - largura_ms))
+            t0 = time.perf_counter()
+            linhas = historico.consultar(random.choice(ids), a, a + largura_ms)
+            tempos.append(time.perf_counter() - t0)
+        tempos.sort()
+        print(f"Consulta {nome}: {len(linhas)} linhas, mediana {1000 * tempos[10]:.2f} ms, "
+              f"pior {1000 * tempos[-1]:.2f} ms")
+
+    historico.fechar()
+    os.remove(caminho)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark do broker embutido contra um broker externo (Mosquitto).
+
+    python bench_broker.py [--externo localhost:1883] --dispositivos 48 --segundos 10 --ritmo 2000
+
+Os dois caminhos entregam os mesmos quadros do gerador_frota à mesma
+pipeline (LogicaEdge):
+  embutido: gerador -> BrokerMQTT (neste processo) -> assinante interno
+  externo:  gerador -> broker em outro processo -> cliente paho -> pipeline
+
+O gerador roda em outro processo, com uma conexão MQTT e os PUBLISH já
+codificados. Vazão: todos os quadros de uma vez, do primeiro envio à
+última entrega. Latência: --ritmo quadros/s durante alguns segundos,
+envio -> pipeline (relógio monotônico do sistema, comum aos processos).
+Sem --externo, o próprio broker_mqtt.py sobe como processo separado no
+papel do Mosquitto: mede o custo do salto extra com o mesmo código.
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from broker_mqtt import BrokerMQTT, pacote_publish
+from edge_logic import LogicaEdge, TOPIC_PESO_ESTAVEL, TOPIC_PESO_RAW
+from gerador_frota import frota
+
+LOTE_ENVIO = 64      # PUBLISH por sendall() na fase de vazão
+OCIOSO_S = 5         # Sem entregas por esse tempo: o que faltou foi perdido
+
+
+def _gerar(host, porta, pacotes, ritmo, inicio, canal):
+    """Processo gerador: conecta, espera o sinal e envia; devolve os instantes de envio."""
+    sock = socket.create_connection((host, porta))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    corpo = struct.pack("!H", 4) + b"MQTT" + bytes([4, 0x02]) + struct.pack("!H", 60)
+    cid = f"bench-{os.getpid()}".encode()
+    corpo += struct.pack("!H", len(cid)) + cid
+    sock.sendall(bytes([0x10, len(corpo)]) + corpo)
+    if sock.recv(4)[3] != 0:
+        raise ConnectionError("CONNECT recusado")
+    canal.send("pronto")
+    inicio.wait()
+    envios = []
+    if ritmo:
+        t0 = time.monotonic_ns()
+        passo = 1e9 / ritmo
+        for i, pacote in enumerate(pacotes):
+            alvo = t0 + i * passo
+            while time.monotonic_ns() < alvo:
+                pass
+            envios.append(time.monotonic_ns())
+            sock.sendall(pacote)
+    else:
+        for i in range(0, len(pacotes), LOTE_ENVIO):
+            envios.extend([time.monotonic_ns()] * len(pacotes[i:i + LOTE_ENVIO]))
+            sock.sendall(b"".join(pacotes[i:i + LOTE_ENVIO]))
+    canal.send(envios)
+    time.sleep(OCIOSO_S)  # Mantém a conexão até o receptor terminar
+    sock.close()
+
+
+class Receptor:
+    """Pipeline de detecção + instante de cada entrega (mesma ordem do envio)."""
+
+    def __init__(self):
+        self.logica = LogicaEdge(lambda id, q: None, lambda e: None, lambda id: None)
+        self.chegadas = []
+        self.terminou = threading.Event()
+        self.esperadas = 0
+
+    def receber(self, topico, payload):
+        if topico == TOPIC_PESO_RAW:
+            self.logica.processar_peso_raw(payload)
+        elif topico == TOPIC_PESO_ESTAVEL:
+            self.logica.processar_peso_estavel(payload)
+        self.chegadas.append(time.monotonic_ns())
+        if len(self.chegadas) >= self.esperadas:
+            self.terminou.set()
+
+    def medir(self, host, porta, pacotes, ritmo):
+        self.chegadas = []
+        self.esperadas = len(pacotes)
+        self.terminou.clear()
+        inicio = multiprocessing.Event()
+        nosso, deles = multiprocessing.Pipe()
+        gerador = multiprocessing.Process(target=_gerar, args=(host, porta, pacotes, ritmo, inicio, deles))
+        gerador.start()
+        nosso.recv()
+        inicio.set()
+        envios = nosso.recv()
+        while not self.terminou.wait(OCIOSO_S):
+            if not self.chegadas or time.monotonic_ns() - self.chegadas[-1] > OCIOSO_S * 1e9:
+                break
+        gerador.join()
+        n = len(self.chegadas)
+        latencias = sorted((c - e) / 1e6 for c, e in zip(self.chegadas, envios))
+        duracao = (self.chegadas[-1] - envios[0]) / 1e9 if n else 0
+        return {
+            "entregues": n,
+            "perdidos": len(pacotes) - n,
+            "vazao": n / duracao if duracao else 0,
+            "p50_ms": latencias[n // 2] if n else None,
+            "p99_ms": latencias[min(n - 1, n * 99 // 100)] if n else None,
+            "max_ms": latencias[-1] if n else None,
+        }
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_embutido(pacotes, amostra, ritmo):
+    """Receptor como assinante interno do BrokerMQTT."""
+    receptor = Receptor()
+    broker = BrokerMQTT("127.0.0.1", 0)
+    for topico in (TOPIC_PESO_RAW, TOPIC_PESO_ESTAVEL):
+        broker.assinar_interno(topico, lambda t, p, r: receptor.receber(t, p))
+    broker.iniciar()
+    try:
+        return (receptor.medir("127.0.0.1", broker.porta, pacotes, 0),
+                receptor.medir("127.0.0.1", broker.porta, amostra, ritmo))
+    finally:
+        broker.encerrar()
+
+
+def medir_externo(externo, pacotes, amostra, ritmo):
+    """Broker em outro processo + cliente paho, como o edge com Mosquitto."""
+    processo = None
+    if externo:
+        host, porta = externo.rsplit(":", 1)
+        porta = int(porta)
+        nome = f"externo ({externo})"
+    else:
+        host, porta = "127.0.0.1", porta_livre()
+        processo = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), "broker_mqtt.py"),
+                                     "--host", host, "--porta", str(porta)], stdout=subprocess.DEVNULL)
+        time.sleep(1)
+        nome = "externo (broker_mqtt.py em outro processo)"
+    receptor = Receptor()
+    cliente = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-edge")
+    cliente.on_message = lambda c, u, m: receptor.receber(m.topic, m.payload)
+    try:
+        cliente.connect(host, porta)
+        cliente.subscribe([(TOPIC_PESO_RAW, 0), (TOPIC_PESO_ESTAVEL, 0)])
+        cliente.loop_start()
+        time.sleep(0.5)
+        return nome, (receptor.medir(host, porta, pacotes, 0),
+                      receptor.medir(host, porta, amostra, ritmo))
+    finally:
+        cliente.loop_stop()
+        if processo:
+            processo.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broker embutido x broker externo")
+    parser.add_argument("--externo", help="host:porta do Mosquitto (padrão: broker_mqtt.py em outro processo)")
+    parser.add_argument("--dispositivos", type=int, default=48)
+    parser.add_argument("--taxa", type=float, default=10, help="Leituras/s de cada dispositivo")
+    parser.add_argument("--segundos", type=float, default=10, help="Tempo simulado da frota")
+    parser.add_argument("--ritmo", type=int, default=2000, help="Quadros/s na fase de latência")
+    parser.add_argument("--latencia-s", type=float, default=3)
+    args = parser.parse_args()
+
+    pacotes = [pacote_publish(t.encode(), p) for t, p in frota(args.dispositivos, args.taxa, args.segundos)]
+    amostra = pacotes[:int(args.ritmo * args.latencia_s)]
+    print(f"{len(pacotes)} quadros de {args.dispositivos} dispositivos; {os.cpu_count()} núcleo(s)")
+
+    with contextlib.redirect_stdout(io.StringIO()):  # ENTRADA/SAIDA da pipeline
+        resultados = {"embutido": medir_embutido(pacotes, amostra, args.ritmo)}
+        nome, medidas = medir_externo(args.externo, pacotes, amostra, args.ritmo)
+        resultados[nome] = medidas
+
+    print(f"{'':<44}{'vazão (q/s)':>12}{'perdidos':>10}   latência a {args.ritmo}/s: p50 / p99 / máx (ms)")
+    for nome, (vazao, latencia) in resultados.items():
+        print(f"{nome:<44}{vazao['vazao']:>12,.0f}{vazao['perdidos']:>10}   "
+              f"{latencia['p50_ms']:.2f} / {latencia['p99_ms']:.2f} / {latencia['max_ms']:.2f}"
+              f" ({latencia['perdidos']} perdidos)")
+
+
+if __name__ == "__main__":
+    main()
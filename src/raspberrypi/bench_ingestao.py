@@ -0,0 +1,61 @@
+"""
+Benchmark da ingestão em processos: vazão com 1 a 4 trabalhadores contra
+o processo único, usando a carga do gerador_frota.
+
+    python bench_ingestao.py --dispositivos 48 --segundos 10 --max-trabalhadores 4
+
+Mede só o edge (sem broker): o coordenador despacha os quadros já
+prontos o mais rápido que os anéis aceitam e o tempo vai até o último
+trabalhador esvaziar seu anel.
+"""
+import argparse
+import os
+import time
+
+from edge_logic import TOPIC_PESO_RAW, LogicaEdge
+from gerador_frota import frota
+from ingestao_paralela import PESO_ESTAVEL, PESO_RAW, IngestaoParalela
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da ingestão em processos")
+    parser.add_argument("--dispositivos", type=int, default=48)
+    parser.add_argument("--taxa", type=float, default=80)
+    parser.add_argument("--segundos", type=float, default=10, help="Tempo simulado da frota")
+    parser.add_argument("--max-trabalhadores", type=int, default=4)
+    args = parser.parse_args()
+
+    quadros = [(PESO_RAW if t == TOPIC_PESO_RAW else PESO_ESTAVEL, p)
+               for t, p in frota(args.dispositivos, args.taxa, args.segundos)]
+    total = len(quadros)
+    print(f"{total} quadros de {args.dispositivos} dispositivos; {os.cpu_count()} núcleo(s)")
+    eventos = []
+
+    # Referência: tudo num processo só
+    logica = LogicaEdge(lambda id, q: None, eventos.append, lambda id: None)
+    processar = {PESO_RAW: logica.processar_peso_raw, PESO_ESTAVEL: logica.processar_peso_estavel}
+    inicio = time.perf_counter()
+    for tipo, payload in quadros:
+        processar[tipo](payload)
+    base = total / (time.perf_counter() - inicio)
+    print(f"processo único: {base:,.0f} quadros/s ({len(eventos)} eventos)")
+
+    for n in range(1, args.max_trabalhadores + 1):
+        eventos = []
+        ingestao = IngestaoParalela(n, lambda id, q: None, eventos.append, lambda id: None)
+        ingestao.iniciar()
+        time.sleep(0.5)  # Trabalhadores importando módulos
+        inicio = time.perf_counter()
+        for tipo, payload in quadros:
+            while not ingestao.despachar(tipo, payload):
+                ingestao.coletar()  # Anel cheio: espera o trabalhador
+        while ingestao.pendentes():
+            time.sleep(0.0005)
+        vazao = total / (time.perf_counter() - inicio)
+        ingestao.encerrar()
+        print(f"{n} trabalhador(es): {vazao:,.0f} quadros/s ({vazao / base:.2f}x, "
+              f"{len(eventos)} eventos, {ingestao.anel_cheio} esperas por anel cheio)")
+
+
+if __name__ == "__main__":
+    main()
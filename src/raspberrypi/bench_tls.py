@@ -0,0 +1,61 @@
+"""
+Custo de reconectar na nuvem por TLS: handshake completo x sessão retomada.
+
+    python bench_tls.py --broker localhost --porta 8883 --ca ca.pem [--cert c.pem --key k.pem]
+
+Conecta e desconecta --conexoes vezes com o ClienteNuvem, primeiro sem
+oferecer a sessão anterior e depois oferecendo, e compara a mediana do
+tempo até o CONNACK. Qualquer broker MQTT com TLS serve (ex.: Mosquitto
+com listener 8883 e um certificado autoassinado).
+"""
+import argparse
+import threading
+
+import paho.mqtt.client as mqtt
+
+from cliente_nuvem import ClienteNuvem
+
+
+def medir(args, retomar):
+    cliente = ClienteNuvem(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-tls",
+                           retomar=retomar)
+    cliente.tls_set(ca_certs=args.ca, certfile=args.cert, keyfile=args.key)
+    conectado = threading.Event()
+    ao_conectar = cliente.on_connect
+
+    def on_connect(client, userdata, flags, reason_code, properties):
+        ao_conectar(client, userdata, flags, reason_code, properties)
+        conectado.set()
+
+    cliente.on_connect = on_connect
+    for i in range(args.conexoes):
+        conectado.clear()
+        if i == 0:
+            cliente.connect(args.broker, args.porta)
+        else:
+            cliente.reconnect()
+        while not conectado.is_set():
+            cliente.loop(0.05)
+        cliente.disconnect()
+        cliente.loop(0.05)
+    return cliente.estatisticas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da retomada de sessão TLS")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--porta", type=int, default=8883)
+    parser.add_argument("--ca", required=True)
+    parser.add_argument("--cert")
+    parser.add_argument("--key")
+    parser.add_argument("--conexoes", type=int, default=50)
+    args = parser.parse_args()
+
+    for nome, retomar in (("handshake completo", False), ("sessão retomada", True)):
+        stats = medir(args, retomar)
+        print(f"{nome:<20} connect {stats['connect_ms']} ms (TLS {stats['tls_ms']} ms), "
+              f"{stats['tls_retomadas']}/{stats['conexoes']} retomadas")
+
+
+if __name__ == "__main__":
+    main()
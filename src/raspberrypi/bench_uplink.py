@@ -0,0 +1,120 @@
+"""
+Tráfego de uplink por dispositivo e por hora: bruto x eventos x agregados.
+
+    python bench_uplink.py --dispositivos 48 --taxa 10 --horas 1 [--broker localhost]
+
+Roda a frota simulada (gerador_frota.py) em tempo simulado pela
+LogicaEdge, com o UplinkNuvem como consumidor. Os lotes vão a um broker
+MQTT local no lugar do IoT Core (tópico estoque/telemetria) e um
+assinante conta os bytes recebidos e decodifica cada lote para conferir
+amostras e eventos. Sem broker, conta os bytes no próprio processo.
+Compara com repassar cada peso_raw e com um JSON por evento.
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from edge_logic import LogicaEdge, TOPIC_NUVEM_EVENTOS
+from gerador_frota import TOPIC_PESO_ESTAVEL, TOPIC_PESO_RAW, frota
+from uplink import UplinkNuvem, decodificar_lote
+
+TOPIC_NUVEM_TELEMETRIA = "estoque/telemetria"
+CABECALHO_MQTT = 2 + 2  # Cabeçalho fixo + tamanho do tópico de um PUBLISH QoS 0
+T0 = 1760000000.0       # Início do tempo simulado (época Unix)
+
+
+def conectar(broker, porta, recebidos):
+    import paho.mqtt.client as mqtt
+
+    def on_message(client, userdata, message):
+        recebidos.append(message.payload)
+
+    assinante = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-nuvem")
+    assinante.on_message = on_message
+    assinante.connect(broker, porta)
+    assinante.subscribe(TOPIC_NUVEM_TELEMETRIA, qos=1)
+    assinante.loop_start()
+    emissor = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-edge")
+    emissor.connect(broker, porta)
+    emissor.loop_start()
+    time.sleep(0.5)  # SUBACK antes do primeiro lote
+    return emissor, assinante
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do uplink agregado")
+    parser.add_argument("--dispositivos", type=int, default=48)
+    parser.add_argument("--taxa", type=float, default=10, help="Quadros/s por dispositivo")
+    parser.add_argument("--horas", type=float, default=1)
+    parser.add_argument("--troca-s", type=float, default=30.0)
+    parser.add_argument("--janela-s", type=int, default=60)
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--porta", type=int, default=1883)
+    args = parser.parse_args()
+
+    recebidos = []
+    emissor = assinante = None
+    try:
+        emissor, assinante = conectar(args.broker, args.porta, recebidos)
+        publicar = lambda carga: emissor.publish(TOPIC_NUVEM_TELEMETRIA, carga, qos=1)
+    except OSError as e:
+        print(f"Broker {args.broker}:{args.porta} indisponível ({e}); contando localmente")
+        publicar = recebidos.append
+
+    relogio = [T0]
+    uplink = UplinkNuvem(publicar, janela_s=args.janela_s, relogio=lambda: relogio[0])
+    bruto = {"mensagens": 0, "bytes": 0}
+    eventos = {"mensagens": 0, "bytes": 0}
+
+    def publicar_evento(evento):
+        uplink.evento(evento)
+        eventos["mensagens"] += 1
+        eventos["bytes"] += len(json.dumps(evento)) + len(TOPIC_NUVEM_EVENTOS) + CABECALHO_MQTT
+
+    logica = LogicaEdge(lambda id, quadro: None, publicar_evento, lambda id: None, (uplink,))
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Sem o log de cada ENTRADA/SAIDA
+        for topico, payload in frota(args.dispositivos, args.taxa, args.horas * 3600,
+                                     args.troca_s):
+            if topico == TOPIC_PESO_RAW:
+                relogio[0] = T0 + int(payload.split(b",")[3]) / 1000
+                bruto["mensagens"] += 1
+                bruto["bytes"] += len(payload) + len(topico) + CABECALHO_MQTT
+                logica.processar_peso_raw(payload)
+            elif topico == TOPIC_PESO_ESTAVEL:
+                logica.processar_peso_estavel(payload)
+            uplink.tick()
+    uplink.descarregar()
+    tempo = time.perf_counter() - inicio
+
+    if emissor:
+        limite = time.monotonic() + 5
+        while len(recebidos) < uplink.lotes and time.monotonic() < limite:
+            time.sleep(0.05)
+        emissor.loop_stop()
+        assinante.loop_stop()
+
+    registros = [r for carga in recebidos for r in decodificar_lote(carga)]
+    amostras = sum(r["n"] for r in registros)
+    contados = sum(r["entradas"] + r["saidas"] for r in registros)
+    agregado = sum(len(c) for c in recebidos) + len(recebidos) * (len(TOPIC_NUVEM_TELEMETRIA) + CABECALHO_MQTT)
+    print(f"{len(recebidos)}/{uplink.lotes} lotes recebidos, {len(registros)} janelas: "
+          f"amostras {'conferem' if amostras == uplink.amostras else 'DIVERGEM'}, "
+          f"eventos {'conferem' if contados == eventos['mensagens'] else 'DIVERGEM'}")
+
+    por_hora = args.dispositivos * args.horas
+    print(f"{args.dispositivos} dispositivos a {args.taxa:g} Hz por {args.horas:g} h "
+          f"(processado em {tempo:.1f} s)")
+    for nome, mensagens, total in (
+            ("peso_raw a cada leitura", bruto["mensagens"], bruto["bytes"]),
+            ("um JSON por evento", eventos["mensagens"], eventos["bytes"]),
+            ("agregados em lote", len(recebidos), agregado)):
+        print(f"  {nome:<24} {mensagens / por_hora:>9.1f} msg/disp/h "
+              f"{total / por_hora:>11.0f} B/disp/h")
+    print(f"  Uplink: {uplink.estatisticas()}")
+
+
+if __name__ == "__main__":
+    main()
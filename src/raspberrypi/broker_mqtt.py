@@ -0,0 +1,461 @@
+"""
+Broker MQTT 3.1.1 embutido no edge (asyncio, opcional).
+
+Com o Mosquitto, cada quadro do ESP32 passa por dois processos e um salto
+TCP de loopback (ESP32 -> Mosquitto -> cliente paho do edge). Com
+--broker-embutido o edge escuta a porta MQTT ele mesmo: os PUBLISH
+recebidos vão direto para os assinantes internos (a pipeline de detecção)
+como (tópico, bytes), sem reserializar, e o que o edge publica é roteado
+no mesmo processo para os ESP32s e painéis conectados.
+
+Suporta o que a frota usa: CONNECT/CONNACK (sessão limpa ou persistente,
+com "session present"), SUBSCRIBE/UNSUBSCRIBE com curingas + e #,
+PUBLISH QoS 0 e 1 (QoS 2 recebido é aceito; assinaturas recebem no máximo
+QoS 1), mensagens retidas, last will, keepalive (1.5x) e troca de sessão
+quando o mesmo client id reconecta. Sem autenticação nem TLS: é o broker
+da rede local do corredor.
+
+Um PUBLISH QoS 0 é codificado uma vez e os mesmos bytes vão para todos
+os assinantes; um cliente que não lê (buffer acima de BUFFER_MAX) perde
+QoS 0 em vez de acumular memória. QoS 1 para sessões persistentes
+desconectadas fica numa fila limitada (FILA_OFFLINE) até a reconexão.
+
+Uso isolado (ex.: para o bench_broker.py):
+    python broker_mqtt.py --porta 1883
+"""
+import argparse
+import asyncio
+import struct
+import threading
+from collections import deque, namedtuple
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+QOS_MAX = 1
+FILA_OFFLINE = 1000        # QoS 1 guardados por sessão persistente desconectada
+EM_VOO_MAX = 100           # QoS 1 sem PUBACK por sessão; o resto espera na fila
+BUFFER_MAX = 256 * 1024    # Acima disso no socket, QoS 0 para esse cliente é descartado
+CONNECT_TIMEOUT_S = 10
+DESTINOS_MAX = 10000       # Tópicos distintos no cache de roteamento
+
+_Info = namedtuple("_Info", "rc mid")
+
+
+class ErroProtocolo(Exception):
+    pass
+
+
+def _comprimento(n):
+    buf = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        buf.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(buf)
+
+
+def _pacote(tipo_flags, corpo=b""):
+    return bytes([tipo_flags]) + _comprimento(len(corpo)) + corpo
+
+
+def pacote_publish(topico, carga, qos=0, retain=False, pid=0, dup=False):
+    cabecalho = PUBLISH << 4 | dup << 3 | qos << 1 | retain
+    corpo = struct.pack("!H", len(topico)) + topico
+    if qos:
+        corpo += struct.pack("!H", pid)
+    return _pacote(cabecalho, corpo + carga)
+
+
+def _str(dados, pos):
+    n = struct.unpack_from("!H", dados, pos)[0]
+    return bytes(dados[pos + 2:pos + 2 + n]), pos + 2 + n
+
+
+def casa(filtro, topico):
+    """Filtro MQTT (com + e #) contra um tópico concreto."""
+    if topico.startswith("$") and filtro[:1] in ("+", "#"):
+        return False
+    partes_f = filtro.split("/")
+    partes_t = topico.split("/")
+    for i, parte in enumerate(partes_f):
+        if parte == "#":
+            return True
+        if i >= len(partes_t) or (parte != "+" and parte != partes_t[i]):
+            return False
+    return len(partes_f) == len(partes_t)
+
+
+class _Sessao:
+    def __init__(self, client_id, limpa):
+        self.client_id = client_id
+        self.limpa = limpa
+        self.assinaturas = {}   # filtro -> QoS concedido
+        self.escritor = None    # None = desconectada
+        self.pid = 0
+        self.em_voo = {}        # pid -> (tópico, carga) aguardando PUBACK
+        self.fila = deque(maxlen=FILA_OFFLINE)  # QoS 1 esperando janela ou reconexão
+        self.qos2 = set()       # pids QoS 2 recebidos, aguardando PUBREL
+        self.will = None
+        self.keepalive = 0
+        self.visto = 0.0        # loop.time() do último pacote recebido
+        self.descartadas = 0
+
+    def proximo_pid(self):
+        while True:
+            self.pid = self.pid % 0xFFFF + 1
+            if self.pid not in self.em_voo:
+                return self.pid
+
+
+class BrokerMQTT:
+    def __init__(self, host="0.0.0.0", porta=1883):
+        self.host = host
+        self.porta = porta
+        self.sessoes = {}      # client_id -> _Sessao
+        self.retidos = {}      # tópico -> (carga, qos)
+        self.internos = []     # (filtro, callback(tópico, carga, retain))
+        self._destinos = {}    # Cache tópico -> [(sessão, qos)]; zerado ao mudar assinaturas
+        self.loop = None
+        self.pronto = threading.Event()
+        self.recebidas = 0
+        self.entregues = 0
+        self.descartadas = 0
+
+    # ---------- API do edge ----------
+    def assinar_interno(self, filtro, callback):
+        """Assinante no próprio processo; registrar antes de iniciar()."""
+        self.internos.append((filtro, callback))
+
+    def publicar(self, topico, carga, qos=0, retain=False, ao_rotear=None):
+        """Publica a partir de qualquer thread; ao_rotear() roda depois de entregue aos sockets."""
+        if isinstance(carga, str):
+            carga = carga.encode()
+        self.loop.call_soon_threadsafe(self._publicar_interno, topico, bytes(carga), qos, retain, ao_rotear)
+
+    def _publicar_interno(self, topico, carga, qos, retain, ao_rotear):
+        self._rotear(topico, carga, qos, retain)
+        if ao_rotear:
+            ao_rotear()
+
+    def iniciar(self):
+        threading.Thread(target=asyncio.run, args=(self._principal(),),
+                         name="broker-mqtt", daemon=True).start()
+        self.pronto.wait()
+
+    def encerrar(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._parar.set)
+
+    def estatisticas(self):
+        return {
+            "clientes": sum(1 for s in self.sessoes.values() if s.escritor),
+            "sessoes": len(self.sessoes),
+            "retidos": len(self.retidos),
+            "recebidas": self.recebidas,
+            "entregues": self.entregues,
+            "descartadas": self.descartadas,
+        }
+
+    # ---------- loop asyncio ----------
+    async def _principal(self):
+        self.loop = asyncio.get_running_loop()
+        self._parar = asyncio.Event()
+        servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        self.porta = servidor.sockets[0].getsockname()[1]
+        print(f"Broker MQTT embutido em {self.host}:{self.porta}")
+        self.pronto.set()
+        vigia = asyncio.create_task(self._vigiar())
+        async with servidor:
+            await self._parar.wait()
+        vigia.cancel()
+
+    async def _vigiar(self):
+        """Keepalive: um relógio por segundo em vez de um timeout por pacote lido."""
+        while True:
+            await asyncio.sleep(1)
+            agora = self.loop.time()
+            for sessao in self.sessoes.values():
+                if sessao.escritor is not None and sessao.keepalive and \
+                        agora - sessao.visto > 1.5 * sessao.keepalive:
+                    sessao.escritor.close()  # O leitor vê EOF e publica o will
+
+    async def _ler_pacote(self, leitor):
+        cabecalho, byte = await leitor.readexactly(2)
+        n = byte & 0x7F
+        deslocamento = 7
+        while byte & 0x80:
+            if deslocamento > 21:
+                raise ErroProtocolo("comprimento restante inválido")
+            byte = (await leitor.readexactly(1))[0]
+            n |= (byte & 0x7F) << deslocamento
+            deslocamento += 7
+        return cabecalho, await leitor.readexactly(n) if n else b""
+
+    async def _atender(self, leitor, escritor):
+        sessao = None
+        limpo = False
+        try:
+            cabecalho, corpo = await asyncio.wait_for(self._ler_pacote(leitor), CONNECT_TIMEOUT_S)
+            if cabecalho >> 4 != CONNECT:
+                return
+            sessao = self._conectar(corpo, escritor)
+            if sessao is None:
+                return
+            while True:
+                cabecalho, corpo = await self._ler_pacote(leitor)
+                sessao.visto = self.loop.time()
+                if cabecalho >> 4 == DISCONNECT:
+                    limpo = True
+                    return
+                self._tratar(sessao, cabecalho, corpo)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        except (ErroProtocolo, struct.error, IndexError, ValueError) as e:
+            # Pacote malformado (inclui id/tópico que não é UTF-8): só este cliente cai
+            quem = sessao.client_id if sessao else escritor.get_extra_info("peername")
+            print(f"Cliente MQTT {quem} desconectado por pacote inválido: {e!r}")
+        finally:
+            if sessao is not None and sessao.escritor is escritor:
+                self._desconectar(sessao, limpo)
+            escritor.close()
+
+    def _conectar(self, corpo, escritor):
+        protocolo, pos = _str(corpo, 0)
+        nivel, flags, keepalive = struct.unpack_from("!BBH", corpo, pos)
+        pos += 4
+        if protocolo != b"MQTT" or nivel != 4:
+            escritor.write(_pacote(CONNACK << 4, b"\x00\x01"))  # Versão não suportada
+            return None
+        client_id, pos = _str(corpo, pos)
+        limpa = bool(flags & 0x02)
+        will = None
+        if flags & 0x04:
+            topico, pos = _str(corpo, pos)
+            carga, pos = _str(corpo, pos)
+            will = (topico.decode(), carga, min((flags >> 3) & 3, QOS_MAX), bool(flags & 0x20))
+        client_id = client_id.decode()
+        if not client_id:
+            if not limpa:
+                escritor.write(_pacote(CONNACK << 4, b"\x00\x02"))  # Id vazio exige sessão limpa
+                return None
+            client_id = f"anonimo-{id(escritor):x}"
+
+        sessao = self.sessoes.get(client_id)
+        if sessao is not None and sessao.escritor is not None:
+            # Mesmo id reconectou (ex.: ESP32 sem DISCONNECT): derruba o antigo
+            sessao.escritor.close()
+            self._desconectar(sessao, False)
+            sessao = self.sessoes.get(client_id)
+        presente = sessao is not None and not limpa
+        if not presente:
+            sessao = self.sessoes[client_id] = _Sessao(client_id, limpa)
+            self._destinos.clear()
+        sessao.limpa = limpa
+        sessao.will = will
+        sessao.keepalive = keepalive
+        sessao.visto = self.loop.time()
+        sessao.escritor = escritor
+        escritor.write(_pacote(CONNACK << 4, bytes([presente, 0])))
+        # Sessão retomada: reenvia o que ficou sem PUBACK e o que chegou offline
+        for pid, (topico, carga) in sessao.em_voo.items():
+            escritor.write(pacote_publish(topico, carga, 1, pid=pid, dup=True))
+        self._esvaziar_fila(sessao)
+        return sessao
+
+    def _desconectar(self, sessao, limpo):
+        sessao.escritor = None
+        will, sessao.will = sessao.will, None
+        if sessao.limpa:
+            del self.sessoes[sessao.client_id]
+            self._destinos.clear()
+        if will and not limpo:
+            self._rotear(*will)
+
+    def _tratar(self, sessao, cabecalho, corpo):
+        tipo = cabecalho >> 4
+        escritor = sessao.escritor
+        if tipo == PUBLISH:
+            qos = (cabecalho >> 1) & 3
+            topico, pos = _str(corpo, 0)
+            pid = 0
+            if qos:
+                pid = struct.unpack_from("!H", corpo, pos)[0]
+                pos += 2
+            carga = bytes(corpo[pos:])
+            if qos == 1:
+                escritor.write(_pacote(PUBACK << 4, struct.pack("!H", pid)))
+            elif qos == 2:
+                escritor.write(_pacote(PUBREC << 4, struct.pack("!H", pid)))
+                if pid in sessao.qos2:
+                    return  # Reenvio antes do PUBREL: já entregue
+                sessao.qos2.add(pid)
+            self._rotear(topico.decode(), carga, min(qos, QOS_MAX), bool(cabecalho & 1))
+        elif tipo == PUBACK:
+            sessao.em_voo.pop(struct.unpack_from("!H", corpo)[0], None)
+            self._esvaziar_fila(sessao)
+        elif tipo == PUBREL:
+            pid = struct.unpack_from("!H", corpo)[0]
+            sessao.qos2.discard(pid)
+            escritor.write(_pacote(PUBCOMP << 4, struct.pack("!H", pid)))
+        elif tipo == SUBSCRIBE:
+            pid = struct.unpack_from("!H", corpo)[0]
+            pos = 2
+            concedidos = bytearray()
+            novos = []
+            while pos < len(corpo):
+                filtro, pos = _str(corpo, pos)
+                qos = min(corpo[pos], QOS_MAX)
+                pos += 1
+                filtro = filtro.decode()
+                sessao.assinaturas[filtro] = qos
+                concedidos.append(qos)
+                novos.append((filtro, qos))
+            self._destinos.clear()
+            escritor.write(_pacote(SUBACK << 4, struct.pack("!H", pid) + concedidos))
+            # Retidos depois do SUBACK, com a flag de retain
+            for topico, (carga, qos_retido) in self.retidos.items():
+                for filtro, qos in novos:
+                    if casa(filtro, topico):
+                        self._entregar(sessao, topico.encode(), carga, min(qos, qos_retido), True)
+                        break
+        elif tipo == UNSUBSCRIBE:
+            pid = struct.unpack_from("!H", corpo)[0]
+            pos = 2
+            while pos < len(corpo):
+                filtro, pos = _str(corpo, pos)
+                sessao.assinaturas.pop(filtro.decode(), None)
+            self._destinos.clear()
+            escritor.write(_pacote(UNSUBACK << 4, struct.pack("!H", pid)))
+        elif tipo == PINGREQ:
+            escritor.write(_pacote(PINGRESP << 4))
+        else:
+            raise ErroProtocolo(f"pacote inesperado: {tipo}")
+
+    # ---------- roteamento ----------
+    def _rotear(self, topico, carga, qos, retain):
+        self.recebidas += 1
+        if retain:
+            if carga:
+                self.retidos[topico] = (carga, qos)
+            else:
+                self.retidos.pop(topico, None)
+        for filtro, callback in self.internos:
+            if casa(filtro, topico):
+                try:
+                    callback(topico, carga, retain)
+                except Exception as e:
+                    print(f"Assinante interno falhou em {topico}: {e}")
+        destinos = self._destinos.get(topico)
+        if destinos is None:
+            destinos = []
+            for sessao in self.sessoes.values():
+                # Vários filtros casando: vale o maior QoS, uma entrega só
+                concedido = max((q for f, q in sessao.assinaturas.items() if casa(f, topico)), default=None)
+                if concedido is not None:
+                    destinos.append((sessao, concedido))
+            if len(self._destinos) > DESTINOS_MAX:
+                self._destinos.clear()
+            self._destinos[topico] = destinos
+        if not destinos:
+            return
+        topico_b = topico.encode()
+        pacote_qos0 = None  # Codificado uma vez para todos os assinantes QoS 0
+        for sessao, concedido in destinos:
+            qos_entrega = min(qos, concedido)
+            if qos_entrega == 0:
+                if sessao.escritor is None:
+                    continue
+                if pacote_qos0 is None:
+                    pacote_qos0 = pacote_publish(topico_b, carga)
+                self._escrever_qos0(sessao, pacote_qos0)
+            else:
+                self._entregar(sessao, topico_b, carga, qos_entrega, False)
+
+    def _escrever_qos0(self, sessao, pacote):
+        if sessao.escritor.transport.get_write_buffer_size() > BUFFER_MAX:
+            sessao.descartadas += 1
+            self.descartadas += 1
+            return
+        sessao.escritor.write(pacote)
+        self.entregues += 1
+
+    def _entregar(self, sessao, topico_b, carga, qos, retain):
+        if qos == 0:
+            if sessao.escritor is not None:
+                self._escrever_qos0(sessao, pacote_publish(topico_b, carga, retain=retain))
+            return
+        if sessao.escritor is None or sessao.fila or len(sessao.em_voo) >= EM_VOO_MAX:
+            if len(sessao.fila) == sessao.fila.maxlen:
+                sessao.descartadas += 1
+                self.descartadas += 1
+            sessao.fila.append((topico_b, carga))
+            return
+        pid = sessao.proximo_pid()
+        sessao.em_voo[pid] = (topico_b, carga)
+        sessao.escritor.write(pacote_publish(topico_b, carga, 1, retain, pid))
+        self.entregues += 1
+
+    def _esvaziar_fila(self, sessao):
+        while sessao.fila and sessao.escritor is not None and len(sessao.em_voo) < EM_VOO_MAX:
+            topico_b, carga = sessao.fila.popleft()
+            pid = sessao.proximo_pid()
+            sessao.em_voo[pid] = (topico_b, carga)
+            sessao.escritor.write(pacote_publish(topico_b, carga, 1, pid=pid))
+            self.entregues += 1
+
+
+class ClienteInterno:
+    """
+    Fachada com a parte do paho.mqtt.Client que o EscalonadorSaida usa
+    (publish + on_publish), publicando direto no broker embutido. Nunca
+    desconecta: on_disconnect existe só para o escalonador poder atribuí-lo.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.on_publish = None
+        self.on_disconnect = None
+        self._mid = 0
+        self._trava = threading.Lock()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        with self._trava:
+            self._mid = self._mid % 0xFFFF + 1
+            mid = self._mid
+        self.broker.publicar(topic, payload or b"", qos, retain,
+                             ao_rotear=lambda: self._publicado(mid))
+        return _Info(0, mid)  # 0 = MQTT_ERR_SUCCESS
+
+    def _publicado(self, mid):
+        if self.on_publish:
+            self.on_publish(self, None, mid, 0, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broker MQTT 3.1.1 (o mesmo embutido no edge)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--porta", type=int, default=1883)
+    args = parser.parse_args()
+    broker = BrokerMQTT(args.host, args.porta)
+    try:
+        asyncio.run(broker._principal())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Calibração remota de span de várias balanças ao mesmo tempo.
+
+Uso:
+    python calibrar_corredor.py --pesos 0 206 412 esp32-balanca-01 esp32-balanca-02
+
+O operador coloca o mesmo peso de referência em todas as balanças; cada
+comando "ponto" é enviado sem "id", então todas coletam em paralelo.
+"""
+import argparse
+import json
+import time
+
+import paho.mqtt.client as mqtt
+
+TOPIC_CALIBRAR = "balanca/rpi/calibrar"
+TOPIC_CALIBRACAO = "balanca/esp32/calibracao"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra o span de um corredor de balanças")
+    parser.add_argument("dispositivos", nargs="+", help="CLIENT_ID de cada ESP32")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--porta", type=int, default=1883)
+    parser.add_argument("--pesos", type=float, nargs="+", default=[0, 206],
+                        help="Pesos de referência em gramas (ao menos dois)")
+    parser.add_argument("--timeout", type=float, default=10.0,
+                        help="Tempo máximo de espera por etapa (s)")
+    args = parser.parse_args()
+
+    relatorios = {}
+
+    def on_message(client, userdata, message):
+        rel = json.loads(message.payload)
+        if rel.get("id") in args.dispositivos:
+            relatorios.setdefault(rel["cmd"], {})[rel["id"]] = rel
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.on_message = on_message
+    client.connect(args.broker, args.porta)
+    client.subscribe(TOPIC_CALIBRACAO)
+    client.loop_start()
+
+    def etapa(cmd, **extra):
+        relatorios.pop(cmd, None)
+        client.publish(TOPIC_CALIBRAR, json.dumps(dict(cmd=cmd, **extra)))
+        limite = time.monotonic() + args.timeout
+        while time.monotonic() < limite:
+            if len(relatorios.get(cmd, {})) == len(args.dispositivos):
+                break
+            time.sleep(0.05)
+        faltando = set(args.dispositivos) - set(relatorios.get(cmd, {}))
+        if faltando:
+            print(f"  Sem resposta de: {', '.join(sorted(faltando))}")
+        return relatorios.get(cmd, {})
+
+    etapa("inicio")
+    for gramas in args.pesos:
+        input(f"Coloque {gramas:g} g em todas as balanças e pressione ENTER...")
+        etapa("ponto", g=gramas)
+
+    print(f"{'Dispositivo':<22} {'Escala':>10} {'Offset':>10} {'RMS (g)':>8} {'Max (g)':>8}  Status")
+    for disp, rel in sorted(etapa("fim").items()):
+        if "erro" in rel:
+            print(f"{disp:<22} {rel['erro']}")
+            continue
+        status = "SALVA" if rel.get("salva") else "REPROVADA"
+        print(f"{disp:<22} {rel['escala']:>10.3f} {rel['offset']:>10} "
+              f"{rel['rms_g']:>8.2f} {rel['max_g']:>8.2f}  {status}")
+
+    client.loop_stop()
+    client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cliente MQTT da nuvem com sessão TLS retomada entre reconexões.
+
+O paho já reaproveita o SSLContext de tls_set() (CA e certificados lidos
+uma vez), mas cada reconexão faz um handshake completo. ClienteNuvem
+oferece ao broker a sessão da conexão anterior (ticket do TLS 1.3 ou
+session ID do 1.2): se ele aceitar, a reconexão pula a troca de chaves
+e a verificação da cadeia. Também mede cada conexão até o CONNACK.
+
+O broker decide: sem suporte a retomada (ou ticket vencido) a conexão
+só volta a ser um handshake completo, então é seguro ligar sempre.
+
+O gancho é um método privado do paho 2.x (requirements.txt fixa <3): se
+ele não existir, o cliente avisa e segue sem retomada.
+"""
+import ssl
+import time
+from collections import deque
+
+import paho.mqtt.client as mqtt
+
+
+class ClienteNuvem(mqtt.Client):
+    def __init__(self, *args, retomar=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        if retomar and not callable(getattr(mqtt.Client, "_ssl_wrap_socket", None)):
+            print("paho sem _ssl_wrap_socket: conexões à nuvem sem retomada de sessão TLS")
+            retomar = False
+        self.retomar = retomar
+        self._sessao_tls = None
+        self._sock_tls = None
+        self._inicio = None
+        self.on_pre_connect = self._marcar_inicio
+        self.on_connect = self._ao_conectar
+        self.conexoes = 0
+        self.retomadas = 0
+        self.connect_ms = deque(maxlen=100)  # Últimas conexões, até o CONNACK
+        self.tls_ms = deque(maxlen=100)      # Só o handshake
+
+    def _marcar_inicio(self, client, userdata):
+        self._inicio = time.monotonic()
+
+    # Mesmo fluxo do paho 2.x (inclusive a verificação do host quando o
+    # SSLContext não a faz e tls_insecure não está ligado), com session=
+    def _ssl_wrap_socket(self, tcp_sock):
+        sessao = self._sessao_tls if self.retomar else None
+        verificar_host = not self._tls_insecure
+        try:
+            ssl_sock = self._ssl_context.wrap_socket(
+                tcp_sock, server_hostname=self._host, do_handshake_on_connect=False,
+                session=sessao)
+        except ssl.CertificateError:
+            raise
+        except ValueError:
+            # Sem SNI (ou sessão recusada pelo contexto): o mesmo wrap do paho, sem retomada
+            ssl_sock = self._ssl_context.wrap_socket(tcp_sock, do_handshake_on_connect=False)
+        else:
+            if getattr(self._ssl_context, "check_hostname", False):
+                verificar_host = False  # O handshake já conferiu
+        ssl_sock.settimeout(self._keepalive)
+        inicio = time.monotonic()
+        ssl_sock.do_handshake()
+        self.tls_ms.append(1000 * (time.monotonic() - inicio))
+        if verificar_host:
+            if not hasattr(ssl, "match_hostname"):  # Python 3.12+
+                raise ssl.CertificateError(
+                    "sem ssl.match_hostname: use um SSLContext com check_hostname=True")
+            ssl.match_hostname(ssl_sock.getpeercert(), self._host)
+        self._sock_tls = ssl_sock
+        return ssl_sock
+
+    def _ao_conectar(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            print(f"Nuvem recusou a conexão: {reason_code}")
+            return
+        if self._inicio is not None:
+            self.connect_ms.append(1000 * (time.monotonic() - self._inicio))
+        self.conexoes += 1
+        if self._sock_tls is not None:
+            if self._sock_tls.session_reused:
+                self.retomadas += 1
+            # Depois do CONNACK: no TLS 1.3 o ticket chega após o handshake
+            self._sessao_tls = self._sock_tls.session
+
+    def estatisticas(self):
+        def mediana(valores):
+            return round(sorted(valores)[len(valores) // 2], 1) if valores else None
+        return {
+            "conexoes": self.conexoes,
+            "tls_retomadas": self.retomadas,
+            "connect_ms": mediana(self.connect_ms),
+            "tls_ms": mediana(self.tls_ms),
+        }
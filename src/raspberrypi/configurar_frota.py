@@ -0,0 +1,87 @@
+"""
+Rollout de configuração remota para a frota de balanças.
+
+Uso:
+    python configurar_frota.py --ent 140 --sai 40 --pub-ms 250 esp32-balanca-01 esp32-balanca-02
+
+Publica, retido, em balanca/rpi/config/<id> um JSON compacto com versão
+nova ({"v": ..., "ent": ..., ...}) e espera cada ESP32 confirmar a versão
+aplicada em balanca/esp32/config/<id>. Como é retido, quem estiver offline
+aplica ao reconectar. Campos omitidos não mudam no dispositivo.
+"""
+import argparse
+import json
+import time
+
+import paho.mqtt.client as mqtt
+
+TOPIC_CONFIG = "balanca/rpi/config"             # + "/<id>"
+TOPIC_CONFIG_APLICADA = "balanca/esp32/config"  # + "/<id>"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envia config remota às balanças")
+    parser.add_argument("dispositivos", nargs="+", help="CLIENT_ID de cada ESP32")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--porta", type=int, default=1883)
+    parser.add_argument("--versao", type=int, default=int(time.time()),
+                        help="Versão da config (padrão: horário atual, sempre crescente)")
+    parser.add_argument("--ent", type=int, help="Limiar de ENTRADA (g)")
+    parser.add_argument("--sai", type=int, help="Limiar de SAIDA (g)")
+    parser.add_argument("--pub-ms", type=int, help="Intervalo de leitura no modo ocioso (ms)")
+    parser.add_argument("--ping-s", type=int, help="Intervalo do ping MQTT (s)")
+    parser.add_argument("--escala", type=float, help="Fator de escala do HX711")
+    parser.add_argument("--unid", type=int,
+                        help="Peso de uma unidade (g) para reconciliar o estoque (0 desativa)")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    config = {"v": args.versao}
+    for campo in ("ent", "sai", "pub_ms", "ping_s", "escala", "unid"):
+        valor = getattr(args, campo)
+        if valor is not None:
+            config[campo] = valor
+
+    confirmados = {}
+
+    def on_message(client, userdata, message):
+        if message.retain:
+            return  # Confirmação guardada de um rollout anterior
+        dados = json.loads(message.payload)
+        if dados.get("id") not in args.dispositivos:
+            return
+        if dados.get("v", 0) >= args.versao or dados.get("erro"):
+            confirmados[dados["id"]] = (time.monotonic(), dados)
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.on_message = on_message
+    client.connect(args.broker, args.porta)
+    client.subscribe(f"{TOPIC_CONFIG_APLICADA}/+", qos=1)
+    client.loop_start()
+
+    inicio = time.monotonic()
+    carga = json.dumps(config, separators=(",", ":"))
+    for id in args.dispositivos:
+        client.publish(f"{TOPIC_CONFIG}/{id}", carga, qos=1, retain=True)
+    print(f"Config v{args.versao} enviada a {len(args.dispositivos)} balança(s): {carga}")
+
+    limite = inicio + args.timeout
+    while len(confirmados) < len(args.dispositivos) and time.monotonic() < limite:
+        time.sleep(0.05)
+
+    for id in sorted(args.dispositivos):
+        if id not in confirmados:
+            print(f"{id:<22} sem confirmação (aplica ao reconectar)")
+            continue
+        quando, dados = confirmados[id]
+        if dados.get("erro"):
+            print(f"{id:<22} REJEITADA: {dados['erro']} (continua em v{dados['v']})")
+        else:
+            print(f"{id:<22} v{dados['v']} aplicada em {1000 * (quando - inicio):.0f} ms")
+
+    client.loop_stop()
+    client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""
+Serviço Edge (Raspberry Pi): o "cérebro" do sistema.
+
+- Assina balanca/esp32/peso_raw e balanca/esp32/peso_estavel (broker local).
+- Detecta ENTRADA/SAIDA por dispositivo sobre o nível assentado.
+- Responde o feedback em balanca/rpi/feedback/<id> (protocolo binário).
+- Envia o evento processado ({"delta_unidades": ±1, ...}) para a nuvem.
+- Rastreia época/seq de cada dispositivo: lacunas pedem uma leitura
+  absoluta nova ao ESP32, que ressincroniza o estado sozinho.
+- Guarda amostras e eventos no histórico local (SQLite, armazenamento.py).
+- Expõe estado e um stream ao vivo para painéis (HTTP/SSE, servidor_api.py).
+- Usa os limiares que cada ESP32 confirmou ter aplicado (config remota,
+  ver configurar_frota.py).
+- Com --trabalhadores N, divide os dispositivos entre N processos
+  (ingestao_paralela.py); este processo fica só com MQTT e a nuvem.
+- Sobe para a nuvem agregados por janela em lotes comprimidos (uplink.py)
+  em vez de cada leitura; os eventos de estoque seguem um a um.
+- Reconcilia o contador de cada balança com o absoluto pelo peso
+  assentado (reconciliacao.py): uma divergência confirmada vira um único
+  evento de correção ("motivo": "reconciliacao").
+- Com --broker-embutido, o próprio edge é o broker MQTT local
+  (broker_mqtt.py): os quadros dos ESP32s vão direto para a detecção,
+  sem Mosquitto nem o salto de loopback.
+- Tudo que sai passa pelo escalonador por classes (fila_saida.py): o
+  feedback ao operador e os eventos de estoque nunca esperam atrás de
+  estatísticas ou lotes de telemetria.
+
+Uso:
+    python edge_logic.py --broker localhost [--historico historico.db] [--api-porta 8080] [--nuvem-endpoint xxx.iot.us-east-1.amazonaws.com \\
+        --ca AmazonRootCA1.pem --cert device.pem.crt --key private.pem.key]
+
+    python edge_logic.py --broker-embutido [--porta 1883] ...   (dispensa o Mosquitto)
+
+    Sem --ca a conexão com a nuvem é MQTT simples: um broker local serve de
+    substituto do IoT Core (ex.: --nuvem-endpoint localhost --nuvem-porta 1883).
+"""
+import argparse
+import json
+import time
+
+import paho.mqtt.client as mqtt
+
+from armazenamento import ArmazenamentoSerie
+from broker_mqtt import BrokerMQTT, ClienteInterno
+from cliente_nuvem import ClienteNuvem
+from fila_saida import CLASSES_LOCAL, CLASSES_NUVEM, EscalonadorSaida
+from ingestao_paralela import CONFIG, PESO_ESTAVEL, PESO_RAW, IngestaoParalela
+from protocolo import Quadro
+from reconciliacao import Reconciliador
+from sequencia import RastreadorSequencia, NOVO, REINICIO, REGRESSAO
+from servidor_api import ServidorApi
+from telemetria import ler_peso_raw, ler_peso_estavel
+from uplink import UplinkNuvem
+
+try:
+    from analitica import AnaliticaFrota, descrever_flags
+except ImportError:  # NumPy é opcional: sem ele o edge só não roda a analítica
+    AnaliticaFrota = None
+
+TOPIC_PESO_RAW = "balanca/esp32/peso_raw"
+TOPIC_PESO_ESTAVEL = "balanca/esp32/peso_estavel"
+TOPIC_CONFIG_APLICADA = "balanca/esp32/config"  # + "/<id>": versão e valores aplicados
+TOPIC_FEEDBACK = "balanca/rpi/feedback"       # + "/<id>" para um dispositivo
+TOPIC_SEQUENCIA = "balanca/rpi/sequencia"     # Estatísticas de perda por dispositivo
+TOPIC_ANOMALIAS = "balanca/rpi/anomalias"     # + "/<id>": sensor travado/ruidoso
+TOPIC_UPLINK = "balanca/rpi/uplink"           # Bytes/dispositivo/hora do uplink agregado
+TOPIC_NUVEM_CONEXAO = "balanca/rpi/nuvem"      # Latência de conexão e sessões TLS retomadas
+TOPIC_SAIDA = "balanca/rpi/saida"             # Latência e descartes por classe de saída
+TOPIC_HISTORICO = "balanca/rpi/historico"     # Amostras gravadas/descartadas no SQLite
+TOPIC_INGESTAO = "balanca/rpi/ingestao"       # Quadros descartados pelos anéis (--trabalhadores)
+TOPIC_NUVEM_EVENTOS = "estoque/eventos"
+TOPIC_NUVEM_TELEMETRIA = "estoque/telemetria"  # Lotes de agregados (uplink.py)
+
+# Limiares conservadores (os mesmos do ESP32); a config remota pode mudar por dispositivo
+ENTRADA_206G = 150  # Acima de 150g = 206g
+SAIDA_206G = 50     # Abaixo de 50g = vazio
+
+RECONCILIAR_EVERY_S = 10  # Parado, confere o estoque pelo peso_raw nesse intervalo
+PARADO_G = 5.0            # Variação entre dois peso_raw que ainda conta como parado
+
+PUB_SEQUENCIA_EVERY_S = 60
+RETENCAO_EVERY_S = 3600
+ANALITICA_EVERY_MS = 5
+
+
+# =============================================
+# ESTADO POR DISPOSITIVO
+# =============================================
+class Dispositivo:
+    def __init__(self, id, ao_detectar_lacuna=None):
+        self.id = id
+        self.estado = "VAZIO"
+        self.estoque = 0
+        self.estoque_conhecido = False  # Até a 1a reconciliação segura, o contador parte do zero
+        self.reconciliador = Reconciliador()
+        self.reconciliado_em = 0.0
+        self.ultimo_peso = None
+        self.ressincronizar = False  # Próxima leitura absoluta corrige o estado
+        self.entrada_g = ENTRADA_206G
+        self.saida_g = SAIDA_206G
+        self.versao_config = 0
+        self.sequencia = RastreadorSequencia(ao_detectar_lacuna)
+        self.regressao_pendente = False  # O próximo evento avisa a nuvem da época menor
+
+    def detectar(self, peso):
+        """Mesma máquina de estados de Sistema206gInstantaneo."""
+        mudanca = None
+        if self.estado == "VAZIO" and peso > self.entrada_g:
+            mudanca = "ENTRADA"
+            self.estado = "206G"
+            self.estoque += 1
+        elif self.estado == "206G" and peso < self.saida_g:
+            mudanca = "SAIDA"
+            self.estado = "VAZIO"
+            if self.estoque > 0:  # Evita estoque negativo
+                self.estoque -= 1
+        self.ultimo_peso = peso
+        return mudanca
+
+
+# =============================================
+# REGRAS DE NEGÓCIO (sem MQTT)
+# =============================================
+class LogicaEdge:
+    def __init__(self, publicar_feedback, publicar_evento, pedir_leitura, consumidores=()):
+        # Callbacks de saída: (id, bytes) / (dict) / (id)
+        self.publicar_feedback = publicar_feedback
+        self.publicar_evento = publicar_evento
+        self.pedir_leitura = pedir_leitura
+        # Recebem toda amostra nova via .adicionar(amostra) (analítica, histórico)
+        self.consumidores = [c for c in consumidores if c is not None]
+        self.dispositivos = {}
+
+    def dispositivo(self, id):
+        disp = self.dispositivos.get(id)
+        if disp is None:
+            disp = Dispositivo(id)
+            disp.sequencia.ao_detectar_lacuna = lambda faltando: self._lacuna(disp, faltando)
+            self.dispositivos[id] = disp
+        return disp
+
+    def _lacuna(self, disp, faltando):
+        print(f"[{disp.id}] {faltando} quadro(s) perdido(s); pedindo leitura absoluta")
+        disp.ressincronizar = True
+        self.pedir_leitura(disp.id)
+
+    def processar_peso_raw(self, payload):
+        amostra = ler_peso_raw(payload)
+        if amostra is None:
+            return None
+        disp = self.dispositivo(amostra.dispositivo)
+        if not self._sequencia_nova(disp, amostra):
+            return None  # Duplicado/atrasado não move o estado
+        for consumidor in self.consumidores:
+            consumidor.adicionar(amostra)
+        if disp.ressincronizar:
+            # Após perda, a leitura absoluta decide (ex.: uma SAIDA perdida)
+            disp.ressincronizar = False
+            return self._aplicar(disp, amostra)
+        parado = disp.ultimo_peso is not None and abs(amostra.peso - disp.ultimo_peso) <= PARADO_G
+        disp.ultimo_peso = amostra.peso
+        if parado and time.monotonic() - disp.reconciliado_em >= RECONCILIAR_EVERY_S:
+            return self._reconciliar(disp, amostra)
+        return None
+
+    def processar_peso_estavel(self, payload):
+        lido = ler_peso_estavel(payload)
+        if lido is None:
+            return None
+        amostra, _ = lido
+        disp = self.dispositivo(amostra.dispositivo)
+        if not self._sequencia_nova(disp, amostra):
+            return None
+        disp.ressincronizar = False
+        return self._aplicar(disp, amostra)
+
+    def _sequencia_nova(self, disp, amostra):
+        classe = disp.sequencia.registrar(amostra.epoca, amostra.seq)
+        if classe == REGRESSAO:
+            print(f"[{disp.id}] época regrediu para {amostra.epoca}: ESP32 perdeu o contador; "
+                  "aceitando como reinício")
+            disp.regressao_pendente = True
+        return classe in (NOVO, REINICIO, REGRESSAO)
+
+    def _evento(self, disp, amostra, delta, **campos):
+        evento = {
+            "dispositivo": disp.id,
+            "epoca": amostra.epoca,
+            "seq": amostra.seq,
+            "delta_unidades": delta,
+            **campos,
+            "peso": round(amostra.peso, 1),
+            "ts": time.time(),
+        }
+        if disp.regressao_pendente:
+            evento["regressao"] = True  # A nuvem só reinicia numa época menor com essa marca
+            disp.regressao_pendente = False
+        return evento
+
+    def processar_config(self, payload):
+        """Confirmação de config do ESP32: passa a usar os limiares dele."""
+        try:
+            dados = json.loads(payload)
+            disp = self.dispositivo(dados["id"])
+            if dados.get("erro") is None:
+                disp.entrada_g = dados["ent"]
+                disp.saida_g = dados["sai"]
+                disp.versao_config = dados["v"]
+                disp.reconciliador.unidade_g = dados.get("unid", disp.reconciliador.unidade_g)
+        except (ValueError, KeyError, TypeError):
+            return None
+        return disp.versao_config
+
+    def _aplicar(self, disp, amostra):
+        mudanca = disp.detectar(amostra.peso)
+        if mudanca is None:
+            # Nível assentado sem ENTRADA/SAIDA: o seq desta amostra fica livre para a correção
+            return self._reconciliar(disp, amostra)
+        quadro = Quadro()
+        if mudanca == "ENTRADA":
+            quadro.entrada_ok(estoque=disp.estoque)
+        else:
+            quadro.saida_ok(estoque=disp.estoque)
+        self.publicar_feedback(disp.id, quadro.codificar())
+        evento = self._evento(disp, amostra, 1 if mudanca == "ENTRADA" else -1)
+        self.publicar_evento(evento)
+        print(f"[{disp.id}] {mudanca}: {amostra.peso:.1f}g | estoque {disp.estoque}")
+        return evento
+
+    def _reconciliar(self, disp, amostra):
+        """Emite um evento de correção quando o absoluto pelo peso diverge (confirmado)."""
+        disp.reconciliado_em = time.monotonic()
+        correcao = disp.reconciliador.observar(amostra.peso, disp.estoque)
+        if not disp.estoque_conhecido:
+            # Edge recém-iniciado: adota o absoluto sem evento (a nuvem já tem o total dela)
+            if disp.reconciliador.ultimo is not None:
+                disp.estoque = disp.reconciliador.ultimo
+                disp.estoque_conhecido = True
+            return None
+        if not correcao:
+            return None
+        anterior = disp.estoque
+        disp.estoque += correcao
+        self.publicar_feedback(disp.id, Quadro().estoque(disp.estoque).codificar())
+        evento = self._evento(disp, amostra, correcao, motivo="reconciliacao", estoque=disp.estoque)
+        self.publicar_evento(evento)
+        print(f"[{disp.id}] RECONCILIAÇÃO: {amostra.peso:.1f}g | estoque {anterior} -> {disp.estoque}")
+        return evento
+
+    def estatisticas_sequencia(self):
+        return {id: d.sequencia.estatisticas() for id, d in self.dispositivos.items()}
+
+
+# =============================================
+# SERVIÇO (MQTT local + nuvem)
+# =============================================
+class ServicoEdge:
+    def __init__(self, args):
+        self.broker = None
+        if args.broker_embutido:
+            # Broker no próprio processo: assinaturas internas, sem cliente paho local
+            self.broker = BrokerMQTT(porta=args.porta)
+            for topico in (TOPIC_PESO_RAW, TOPIC_PESO_ESTAVEL, f"{TOPIC_CONFIG_APLICADA}/+"):
+                self.broker.assinar_interno(topico, self._receber_interno)
+            self.local = ClienteInterno(self.broker)
+        else:
+            self.local = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="rpi-edge")
+            self.local.on_connect = self._on_connect
+            self.local.on_message = self._on_message
+        self.saida_local = EscalonadorSaida(self.local, CLASSES_LOCAL)
+
+        self.nuvem = None
+        if args.nuvem_endpoint:
+            # Sessão TLS retomada a cada reconexão (cliente_nuvem.py)
+            self.nuvem = ClienteNuvem(mqtt.CallbackAPIVersion.VERSION2, client_id="rpi-edge")
+            if args.ca:
+                self.nuvem.tls_set(ca_certs=args.ca, certfile=args.cert, keyfile=args.key)
+            self.nuvem.connect_async(args.nuvem_endpoint, args.nuvem_porta)
+            self.saida_nuvem = EscalonadorSaida(self.nuvem, CLASSES_NUVEM)
+        self.uplink = None
+        if self.nuvem and args.uplink_janela_s:
+            self.uplink = UplinkNuvem(self._publicar_telemetria, janela_s=args.uplink_janela_s)
+
+        self.analitica = AnaliticaFrota() if AnaliticaFrota else None
+        self.historico = ArmazenamentoSerie(args.historico) if args.historico else None
+        self.flags = {}  # Último conjunto de anomalias publicado por dispositivo
+        self.logica = LogicaEdge(self._publicar_feedback, self._publicar_evento,
+                                 self._pedir_leitura, (self.analitica, self.historico, self.uplink))
+        self.paralela = None
+        if args.trabalhadores:
+            # O estado fica nos trabalhadores: analítica, amostras no histórico e
+            # no uplink e a API (que lê self.logica) não se aplicam; eventos continuam aqui
+            perdidos = [nome for nome, ativo in (("analítica", self.analitica),
+                                                 ("amostras no histórico", self.historico),
+                                                 ("amostras no uplink", self.uplink),
+                                                 ("API HTTP", args.api_porta)) if ativo]
+            print(f"Aviso: --trabalhadores {args.trabalhadores} é mais lento que o processo único "
+                  "em bench_ingestao.py (ver ingestao_paralela.py)")
+            if perdidos:
+                print(f"Aviso: --trabalhadores {args.trabalhadores} desativa {', '.join(perdidos)}")
+            self.paralela = IngestaoParalela(args.trabalhadores, self._publicar_feedback,
+                                             self._publicar_evento, self._pedir_leitura)
+            self.analitica = None
+            self.logica.consumidores.clear()
+        self.api = None
+        if args.api_porta and not self.paralela:
+            self.api = ServidorApi(self.logica, porta=args.api_porta, flags=self.flags)
+            self.logica.consumidores.append(self.api)
+        self.args = args
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        print(f"Conectado ao broker local: {reason_code}")
+        client.subscribe([(TOPIC_PESO_RAW, 0), (TOPIC_PESO_ESTAVEL, 0),
+                          (f"{TOPIC_CONFIG_APLICADA}/+", 1)])
+
+    def _on_message(self, client, userdata, message):
+        self._receber(message.topic, message.payload)
+
+    def _receber_interno(self, topico, payload, retain):
+        self._receber(topico, payload)
+
+    def _receber(self, topico, payload):
+        if topico == TOPIC_PESO_RAW:
+            tipo = PESO_RAW
+        elif topico == TOPIC_PESO_ESTAVEL:
+            tipo = PESO_ESTAVEL
+        elif topico.startswith(TOPIC_CONFIG_APLICADA):
+            tipo = CONFIG
+        else:
+            return
+        if self.paralela:
+            self.paralela.despachar(tipo, payload)
+        elif tipo == PESO_RAW:
+            self.logica.processar_peso_raw(payload)
+        elif tipo == PESO_ESTAVEL:
+            self.logica.processar_peso_estavel(payload)
+        else:
+            self.logica.processar_config(payload)
+
+    def _publicar_feedback(self, id, quadro):
+        self.saida_local.enfileirar("feedback", f"{TOPIC_FEEDBACK}/{id}", quadro, qos=1)
+
+    def _pedir_leitura(self, id):
+        self.saida_local.enfileirar("feedback", f"{TOPIC_FEEDBACK}/{id}",
+                                    Quadro().leitura().codificar(), qos=1)
+
+    def _publicar_evento(self, evento):
+        if self.historico:
+            self.historico.adicionar_evento(evento)
+        if self.api:
+            self.api.evento(evento)
+        if self.uplink:
+            self.uplink.evento(evento)
+        if self.nuvem and not self.saida_nuvem.enfileirar(
+                "eventos", TOPIC_NUVEM_EVENTOS, json.dumps(evento), qos=1):
+            print(f"Fila de eventos da nuvem cheia, evento só no histórico: {evento}")
+
+    def _publicar_telemetria(self, lote):
+        self.saida_nuvem.enfileirar("telemetria", TOPIC_NUVEM_TELEMETRIA, lote, qos=1)
+
+    def _rodar_analitica(self):
+        """Processa o lote acumulado e publica só as anomalias que mudaram."""
+        stats = self.analitica.processar()
+        for id, flags in zip(stats["ids"], stats["flags"].tolist()):
+            if self.flags.get(id, 0) != flags:
+                self.flags[id] = flags
+                self.saida_local.enfileirar("anomalias", f"{TOPIC_ANOMALIAS}/{id}", json.dumps(
+                    {"dispositivo": id, "anomalias": descrever_flags(flags)}), retain=True)
+
+    def rodar(self):
+        if self.broker:
+            self.broker.iniciar()
+        else:
+            self.local.connect(self.args.broker, self.args.porta)
+        self.saida_local.iniciar()
+        if self.nuvem:
+            self.saida_nuvem.iniciar()
+            self.nuvem.loop_start()
+        if not self.broker:
+            self.local.loop_start()
+        if self.api:
+            self.api.iniciar()
+        if self.paralela:
+            self.paralela.iniciar()
+        proxima_sequencia = time.monotonic() + PUB_SEQUENCIA_EVERY_S
+        proxima_retencao = time.monotonic()
+        try:
+            while True:
+                time.sleep(ANALITICA_EVERY_MS / 1000)
+                if self.paralela:
+                    self.paralela.coletar()
+                if self.analitica:
+                    self._rodar_analitica()
+                if time.monotonic() >= proxima_sequencia:
+                    proxima_sequencia += PUB_SEQUENCIA_EVERY_S
+                    saida = {"local": self.saida_local.estatisticas()}
+                    estatisticas = [(TOPIC_SEQUENCIA, self.logica.estatisticas_sequencia()),
+                                    (TOPIC_SAIDA, saida)]
+                    if self.uplink:
+                        estatisticas.append((TOPIC_UPLINK, self.uplink.estatisticas()))
+                    if self.historico:
+                        estatisticas.append((TOPIC_HISTORICO, self.historico.estatisticas()))
+                    if self.paralela:
+                        estatisticas.append((TOPIC_INGESTAO, self.paralela.estatisticas()))
+                    if self.nuvem:
+                        saida["nuvem"] = self.saida_nuvem.estatisticas()
+                        estatisticas.append((TOPIC_NUVEM_CONEXAO, self.nuvem.estatisticas()))
+                    for topico, dados in estatisticas:
+                        self.saida_local.enfileirar("estatisticas", topico, json.dumps(dados))
+                if self.uplink:
+                    self.uplink.tick()
+                if self.historico:
+                    if self.historico.precisa_descarregar():
+                        self.historico.descarregar()
+                    if time.monotonic() >= proxima_retencao:
+                        proxima_retencao += RETENCAO_EVERY_S
+                        self.historico.aplicar_retencao()
+        except KeyboardInterrupt:
+            print("Serviço interrompido")
+        finally:
+            if self.broker:
+                self.broker.encerrar()
+            else:
+                self.local.loop_stop()
+            self.saida_local.encerrar()
+            if self.paralela:
+                self.paralela.encerrar()
+            if self.uplink:
+                self.uplink.descarregar()
+            if self.nuvem:
+                if not self.saida_nuvem.esvaziar():
+                    print(f"Encerrando com {self.saida_nuvem.pendentes()} mensagens para a nuvem pendentes")
+                self.saida_nuvem.encerrar()
+                self.nuvem.loop_stop()
+            if self.historico:
+                self.historico.fechar()
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Serviço Edge da balança")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--porta", type=int, default=1883)
+    parser.add_argument("--broker-embutido", action="store_true",
+                        help="Serve MQTT na --porta no próprio processo (sem Mosquitto)")
+    parser.add_argument("--historico", default="historico.db",
+                        help="Banco SQLite do histórico local ('' desativa)")
+    parser.add_argument("--api-porta", type=int, default=8080,
+                        help="Porta da API HTTP/SSE para painéis (0 desativa)")
+    parser.add_argument("--trabalhadores", type=int, default=0,
+                        help="Processos de ingestão (padrão 0 = tudo neste processo). Desativa API, "
+                             "analítica e amostras no histórico/uplink; com a lógica atual é "
+                             "0.5x-0.8x do processo único em bench_ingestao.py: meça antes de ligar")
+    parser.add_argument("--nuvem-endpoint", help="Endpoint do AWS IoT Core (opcional)")
+    parser.add_argument("--nuvem-porta", type=int, default=8883)
+    parser.add_argument("--uplink-janela-s", type=int, default=60,
+                        help="Janela dos agregados enviados à nuvem (0 desativa)")
+    parser.add_argument("--ca")
+    parser.add_argument("--cert")
+    parser.add_argument("--key")
+    return parser
+
+
+if __name__ == "__main__":
+    ServicoEdge(argumentos().parse_args()).rodar()
@@ -0,0 +1,194 @@
+"""
+Saída MQTT por classes: feedback antes de telemetria.
+
+Publicar direto no paho põe tudo numa fila só: uma rajada de
+estatísticas ou de lotes da nuvem atrasa o ENTRADA_OK que o operador
+está esperando ouvir. O EscalonadorSaida fica na frente do cliente:
+
+- cada classe tem a sua fila, limitada, com política de descarte
+  (ANTIGO: sai a mais velha, para dados em que só o recente importa;
+  NOVO: recusa a que chega, para o que não pode ser reordenado);
+- classes estritas (feedback, eventos) sempre saem primeiro;
+- as demais dividem o que sobra por peso (WFQ autorrelógio: a cabeça
+  de cada fila ganha um término virtual proporcional a bytes/peso e
+  sai a de menor término), sem que nenhuma fique sem vez;
+- só JANELA mensagens QoS 1 ficam dentro do paho ao mesmo tempo
+  (liberadas pelo on_publish/PUBACK), então a fila interna dele nunca
+  cresce a ponto de atrasar uma mensagem prioritária que chegue depois.
+  QoS 0 não conta na janela: o paho a descarta numa queda sem chamar
+  on_publish, e o on_disconnect a tira de em_voo (como descartada);
+  contada, ela prenderia a janela, e as estritas, para sempre.
+
+A latência de cada classe vai de enfileirar() até o on_publish (QoS 0:
+escrita no socket; QoS 1: PUBACK).
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+import paho.mqtt.client as mqtt
+
+ANTIGO = "antigo"
+NOVO = "novo"
+JANELA = 16
+
+Classe = namedtuple("Classe", "nome estrita peso limite descarte", defaults=(False, 1, 1024, ANTIGO))
+
+# Conexão com o broker local (ESP32s e painéis)
+CLASSES_LOCAL = (
+    Classe("feedback", estrita=True, limite=256),
+    Classe("anomalias", peso=3, limite=256),
+    Classe("estatisticas", peso=1, limite=64),
+)
+# Conexão com a nuvem: eventos de estoque nunca são descartados em silêncio
+CLASSES_NUVEM = (
+    Classe("eventos", estrita=True, limite=100000, descarte=NOVO),
+    Classe("telemetria", peso=1, limite=64),
+)
+
+_Mensagem = namedtuple("_Mensagem", "topico carga qos retain entrada")
+
+
+class _Fila:
+    def __init__(self, classe):
+        self.classe = classe
+        self.itens = deque()
+        self.cabeca_fim = 0.0  # Término virtual da mensagem na cabeça
+        self.ultimo_fim = 0.0  # Término da última que saiu
+        self.enviadas = 0
+        self.descartadas = 0
+        self.latencias = deque(maxlen=1000)  # ms, últimas mensagens
+
+
+class EscalonadorSaida:
+    def __init__(self, cliente, classes, janela=JANELA):
+        self.cliente = cliente
+        self.filas = {c.nome: _Fila(c) for c in classes}
+        self.estritas = [f for f in self.filas.values() if f.classe.estrita]
+        self.ponderadas = [f for f in self.filas.values() if not f.classe.estrita]
+        self.janela = janela
+        self.virtual = 0.0          # Tempo virtual do WFQ
+        self.em_voo = {}            # mid -> (fila, entrada, qos)
+        self.confirmando = 0        # Quantas de em_voo são QoS 1 (ocupam a janela)
+        self.adiantados = set()     # on_publish que chegou antes do publish() voltar
+        self.cond = threading.Condition()
+        self.ativo = False
+        cliente.on_publish = self._publicado
+        cliente.on_disconnect = self._desconectado
+
+    def enfileirar(self, classe, topico, carga, qos=0, retain=False):
+        """Põe na fila da classe; False se a política recusou a mensagem."""
+        fila = self.filas[classe]
+        with self.cond:
+            if len(fila.itens) >= fila.classe.limite:
+                fila.descartadas += 1
+                if fila.classe.descarte == NOVO:
+                    return False
+                fila.itens.popleft()
+            if not fila.itens and not fila.classe.estrita:
+                # Fila ociosa volta a partir do tempo virtual corrente, sem crédito acumulado
+                fila.cabeca_fim = max(self.virtual, fila.ultimo_fim) + len(carga) / fila.classe.peso
+            fila.itens.append(_Mensagem(topico, carga, qos, retain, time.monotonic()))
+            self.cond.notify()
+        return True
+
+    def _proxima(self):
+        """Fila da próxima mensagem: estritas na ordem, depois o menor término."""
+        for fila in self.estritas:
+            if fila.itens:
+                return fila
+        escolhida = None
+        for fila in self.ponderadas:
+            if fila.itens and (escolhida is None or fila.cabeca_fim < escolhida.cabeca_fim):
+                escolhida = fila
+        return escolhida
+
+    def _laco(self):
+        while True:
+            with self.cond:
+                while self.ativo and (self.confirmando >= self.janela or self._proxima() is None):
+                    self.cond.wait()
+                if not self.ativo:
+                    return
+                fila = self._proxima()
+                msg = fila.itens.popleft()
+                if not fila.classe.estrita:
+                    self.virtual = fila.ultimo_fim = fila.cabeca_fim
+                    if fila.itens:
+                        fila.cabeca_fim += len(fila.itens[0].carga) / fila.classe.peso
+            # Fora da trava: o paho chama on_publish com as travas dele presas
+            info = self.cliente.publish(msg.topico, msg.carga, qos=msg.qos, retain=msg.retain)
+            with self.cond:
+                if info.rc != mqtt.MQTT_ERR_SUCCESS and msg.qos == 0:
+                    fila.descartadas += 1  # QoS 0 desconectado: o paho descarta
+                elif info.mid in self.adiantados:
+                    self.adiantados.discard(info.mid)
+                    self._concluir(fila, msg.entrada)
+                else:
+                    self.em_voo[info.mid] = (fila, msg.entrada, msg.qos)
+                    if msg.qos:
+                        self.confirmando += 1
+
+    def _concluir(self, fila, entrada):
+        fila.enviadas += 1
+        fila.latencias.append(1000 * (time.monotonic() - entrada))
+
+    def _publicado(self, client, userdata, mid, reason_code, properties):
+        with self.cond:
+            voo = self.em_voo.pop(mid, None)
+            if voo is None:
+                self.adiantados.add(mid)
+            else:
+                fila, entrada, qos = voo
+                if qos:
+                    self.confirmando -= 1
+                self._concluir(fila, entrada)
+            self.cond.notify()
+
+    def _desconectado(self, client, userdata, flags, reason_code, properties):
+        """QoS 0 ainda no paho se perdeu na queda; QoS 1 ele reenvia ao reconectar."""
+        with self.cond:
+            for mid in [mid for mid, voo in self.em_voo.items() if not voo[2]]:
+                self.em_voo.pop(mid)[0].descartadas += 1
+            self.cond.notify_all()
+
+    def iniciar(self):
+        self.ativo = True
+        threading.Thread(target=self._laco, name="saida-mqtt", daemon=True).start()
+
+    def encerrar(self):
+        with self.cond:
+            self.ativo = False
+            self.cond.notify()
+
+    def esvaziar(self, timeout_s=5):
+        """Espera as filas e a janela zerarem (encerramento); False se estourou."""
+        limite = time.monotonic() + timeout_s
+        with self.cond:
+            while any(f.itens for f in self.filas.values()) or self.em_voo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self.cond.wait(restante)
+        return True
+
+    def pendentes(self):
+        with self.cond:
+            return sum(len(f.itens) for f in self.filas.values()) + len(self.em_voo)
+
+    def estatisticas(self):
+        """Por classe: fila, enviadas, descartadas e latência p50/p99/máx (ms)."""
+        dados = {}
+        with self.cond:
+            for nome, fila in self.filas.items():
+                latencias = sorted(fila.latencias)
+                n = len(latencias)
+                dados[nome] = {
+                    "fila": len(fila.itens),
+                    "enviadas": fila.enviadas,
+                    "descartadas": fila.descartadas,
+                    "p50_ms": round(latencias[n // 2], 2) if n else None,
+                    "p99_ms": round(latencias[min(n - 1, n * 99 // 100)], 2) if n else None,
+                    "max_ms": round(latencias[-1], 2) if n else None,
+                }
+        return dados
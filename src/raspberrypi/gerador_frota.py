@@ -0,0 +1,89 @@
+"""
+Gerador de carga: simula uma frota de balanças publicando peso_raw e
+peso_estavel como o firmware (mesmos formatos, época/seq por dispositivo).
+
+    python gerador_frota.py --broker localhost --dispositivos 48 --taxa 80 --segundos 30
+
+Cada dispositivo alterna entre vazio e com produto a cada --troca-s
+segundos, então o edge vê ENTRADA/SAIDA além do fluxo contínuo.
+"""
+import argparse
+import json
+import random
+import time
+
+TOPIC_PESO_RAW = "balanca/esp32/peso_raw"
+TOPIC_PESO_ESTAVEL = "balanca/esp32/peso_estavel"
+
+
+class BalancaSimulada:
+    def __init__(self, id, troca_s=5.0):
+        self.id = id
+        self.epoca = 1
+        self.seq = 0
+        self.troca_ms = int(troca_s * 1000)
+        self.nivel = 0.0
+        self.fase = random.randrange(self.troca_ms)  # Desencontra os dispositivos
+
+    def quadros(self, t_ms):
+        """Quadros de um instante: peso_raw e, na troca, peso_estavel."""
+        nivel = 206.0 if (t_ms + self.fase) // self.troca_ms % 2 else 0.0
+        peso = nivel + random.gauss(0, 0.5)
+        self.seq += 1
+        saida = [(TOPIC_PESO_RAW, f"{self.id},{self.epoca},{self.seq},{t_ms},{peso:.1f},"
+                                  f"{int(peso * -56.97)}".encode())]
+        if nivel != self.nivel:
+            self.seq += 1
+            saida.append((TOPIC_PESO_ESTAVEL, json.dumps({
+                "id": self.id, "epoca": self.epoca, "seq": self.seq, "t_ms": t_ms,
+                "peso": nivel, "anterior": self.nivel, "delta": nivel - self.nivel,
+                "assentamento_ms": 400}).encode()))
+            self.nivel = nivel
+        return saida
+
+
+def frota(dispositivos, taxa, segundos, troca_s=5.0):
+    """Gera (tópico, payload) em ordem de tempo simulado, sem dormir."""
+    balancas = [BalancaSimulada(f"esp32-balanca-{i:02d}", troca_s) for i in range(dispositivos)]
+    passo_ms = 1000 / taxa
+    for k in range(int(segundos * taxa)):
+        t_ms = int(k * passo_ms)
+        for balanca in balancas:
+            yield from balanca.quadros(t_ms)
+
+
+def main():
+    import paho.mqtt.client as mqtt
+
+    parser = argparse.ArgumentParser(description="Gerador de carga da frota")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--porta", type=int, default=1883)
+    parser.add_argument("--dispositivos", type=int, default=48)
+    parser.add_argument("--taxa", type=float, default=80, help="Quadros/s por dispositivo")
+    parser.add_argument("--segundos", type=float, default=30)
+    parser.add_argument("--troca-s", type=float, default=5.0)
+    args = parser.parse_args()
+
+    cliente = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="gerador-frota")
+    cliente.max_queued_messages_set(0)
+    cliente.connect(args.broker, args.porta)
+    cliente.loop_start()
+
+    inicio = time.monotonic()
+    enviados = 0
+    por_instante = args.dispositivos
+    for topico, payload in frota(args.dispositivos, args.taxa, args.segundos, args.troca_s):
+        cliente.publish(topico, payload)
+        enviados += 1
+        if enviados % por_instante == 0:
+            # Mantém o ritmo em tempo real
+            atraso = inicio + enviados / (por_instante * args.taxa) - time.monotonic()
+            if atraso > 0:
+                time.sleep(atraso)
+    decorrido = time.monotonic() - inicio
+    cliente.loop_stop()
+    print(f"{enviados} quadros em {decorrido:.1f} s ({enviados / decorrido:,.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
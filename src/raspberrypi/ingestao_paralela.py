@@ -0,0 +1,199 @@
+"""
+Ingestão do edge dividida entre processos (um por núcleo do Pi).
+
+O GIL prende um processo Python a um núcleo. Aqui o coordenador (que
+tem a conexão MQTT e o uplink da nuvem) só escolhe o trabalhador pelo
+hash do id do dispositivo e copia o payload para um anel em memória
+compartilhada; cada trabalhador é dono das máquinas de estado
+(LogicaEdge) dos seus dispositivos e consome o anel em lotes.
+
+- Anel SPSC por trabalhador (multiprocessing.shared_memory): slots fixos
+  de SLOT bytes, índices cabeça/cauda de 64 bits no cabeçalho. Só o
+  coordenador escreve a cabeça e só o trabalhador escreve a cauda.
+- Saídas (feedback, eventos, pedidos de leitura) são raras e voltam por
+  uma multiprocessing.Queue; o coordenador as publica em coletar().
+- O hash é crc32 (estável entre processos, ao contrário de hash()).
+- Quadro maior que um slot ou que chega com o anel cheio é descartado e
+  contado (estatisticas(), publicado pelo serviço em balanca/rpi/ingestao).
+
+Desligado por padrão (--trabalhadores 0) e mais lento que o processo
+único com a lógica atual: bench_ingestao.py com 48 dispositivos mediu
+0.47x (1 trabalhador), 0.63x (2), 0.83x (3) e 0.70x (4) da vazão do
+processo único numa máquina de 1 núcleo. O coordenador paga o hash e a
+cópia de cada quadro, e LogicaEdge custa poucos µs por quadro; só
+compensa ligar se a lógica por quadro ficar bem mais cara, medindo no Pi.
+"""
+import multiprocessing as mp
+import queue
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+
+SLOT = 256            # Bytes por mensagem (tipo + tamanho + payload)
+SLOTS = 8192          # Mensagens por anel
+CABECALHO = 16        # cabeça, cauda (uint64)
+LOTE = 512            # Mensagens por retirada
+MAX_PAYLOAD = SLOT - 3
+
+# Tipos de mensagem no anel
+PESO_RAW = 1
+PESO_ESTAVEL = 2
+CONFIG = 3            # Confirmação de config remota (JSON com "id")
+
+# Saídas dos trabalhadores
+FEEDBACK = 1
+EVENTO = 2
+LEITURA = 3
+
+
+class AnelCompartilhado:
+    def __init__(self, nome=None, slots=SLOTS):
+        criar = nome is None
+        self.shm = shared_memory.SharedMemory(nome, create=criar,
+                                              size=CABECALHO + slots * SLOT if criar else 0)
+        self.criador = criar
+        self.nome = self.shm.name
+        self.slots = slots
+        self.indices = self.shm.buf[:CABECALHO].cast("Q")  # [cabeça, cauda]
+        self.dados = self.shm.buf[CABECALHO:]
+        if criar:
+            self.indices[0] = self.indices[1] = 0
+
+    def pendentes(self):
+        return self.indices[0] - self.indices[1]
+
+    def colocar(self, tipo, payload):
+        """Só o coordenador chama. False se o anel estiver cheio."""
+        cabeca = self.indices[0]
+        n = len(payload)
+        if cabeca - self.indices[1] >= self.slots or n > MAX_PAYLOAD:
+            return False
+        i = (cabeca % self.slots) * SLOT
+        struct.pack_into("<BH", self.dados, i, tipo, n)
+        self.dados[i + 3:i + 3 + n] = payload
+        self.indices[0] = cabeca + 1  # Publica o slot só depois de escrito
+        return True
+
+    def retirar_lote(self, maximo=LOTE):
+        """Só o trabalhador chama. Lista de (tipo, payload)."""
+        cauda = self.indices[1]
+        n = min(self.indices[0] - cauda, maximo)
+        lote = []
+        for k in range(cauda, cauda + n):
+            i = (k % self.slots) * SLOT
+            tipo, tamanho = struct.unpack_from("<BH", self.dados, i)
+            lote.append((tipo, bytes(self.dados[i + 3:i + 3 + tamanho])))
+        self.indices[1] = cauda + n
+        return lote
+
+    def fechar(self):
+        """Só quem criou apaga o segmento (os trabalhadores dividem o resource_tracker)."""
+        self.indices.release()
+        self.dados.release()
+        self.shm.close()
+        if self.criador:
+            self.shm.unlink()
+
+
+def dispositivo_do_payload(tipo, payload):
+    """Id do dispositivo sem decodificar o quadro inteiro."""
+    if tipo == PESO_RAW:
+        return payload[:payload.find(b",")]
+    i = payload.find(b'"id"')
+    if i < 0:
+        return b""
+    inicio = payload.find(b'"', i + 4) + 1
+    return payload[inicio:payload.find(b'"', inicio)]
+
+
+def _trabalhador(nome, slots, saida, parar):
+    from edge_logic import LogicaEdge  # Import aqui: edge_logic importa este módulo
+
+    anel = AnelCompartilhado(nome, slots)
+    logica = LogicaEdge(lambda id, quadro: saida.put((FEEDBACK, id, quadro)),
+                        lambda evento: saida.put((EVENTO, evento)),
+                        lambda id: saida.put((LEITURA, id)))
+    processar = {PESO_RAW: logica.processar_peso_raw,
+                 PESO_ESTAVEL: logica.processar_peso_estavel,
+                 CONFIG: logica.processar_config}
+    try:
+        while True:
+            lote = anel.retirar_lote()
+            if not lote:
+                if parar.is_set():
+                    break
+                time.sleep(0.001)
+                continue
+            for tipo, payload in lote:
+                processar[tipo](payload)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        anel.fechar()
+
+
+class IngestaoParalela:
+    def __init__(self, trabalhadores, publicar_feedback, publicar_evento, pedir_leitura,
+                 slots=SLOTS):
+        self.saidas = {FEEDBACK: publicar_feedback, EVENTO: publicar_evento,
+                       LEITURA: pedir_leitura}
+        self.saida = mp.Queue()
+        self.parar = mp.Event()
+        self.aneis = [AnelCompartilhado(slots=slots) for _ in range(trabalhadores)]
+        self.processos = [
+            mp.Process(target=_trabalhador, args=(a.nome, slots, self.saida, self.parar),
+                       name=f"ingestao-{i}", daemon=True)
+            for i, a in enumerate(self.aneis)]
+        self.despachados = 0
+        self.anel_cheio = 0     # Descartadas porque o trabalhador não acompanhou
+        self.grande_demais = 0  # Descartadas por não caber num slot
+
+    def iniciar(self):
+        for p in self.processos:
+            p.start()
+
+    def despachar(self, tipo, payload):
+        """Chamado da thread do MQTT (único produtor de todos os anéis)."""
+        if len(payload) > MAX_PAYLOAD:
+            if not self.grande_demais:
+                print(f"Quadro de {len(payload)} bytes não cabe no anel ({MAX_PAYLOAD}); descartado")
+            self.grande_demais += 1
+            return False
+        id = dispositivo_do_payload(tipo, payload)
+        if self.aneis[zlib.crc32(id) % len(self.aneis)].colocar(tipo, payload):
+            self.despachados += 1
+            return True
+        self.anel_cheio += 1
+        return False
+
+    def coletar(self):
+        """Repassa as saídas dos trabalhadores (thread principal)."""
+        while True:
+            try:
+                tipo, *args = self.saida.get_nowait()
+            except queue.Empty:
+                return
+            self.saidas[tipo](*args)
+
+    def pendentes(self):
+        return sum(a.pendentes() for a in self.aneis)
+
+    def estatisticas(self):
+        return {
+            "trabalhadores": len(self.aneis),
+            "despachados": self.despachados,
+            "anel_cheio": self.anel_cheio,
+            "grande_demais": self.grande_demais,
+            "pendentes": self.pendentes(),
+        }
+
+    def encerrar(self):
+        self.parar.set()
+        for p in self.processos:
+            while p.is_alive():
+                self.coletar()  # A fila precisa esvaziar para o processo terminar
+                p.join(timeout=0.05)
+        self.coletar()
+        for a in self.aneis:
+            a.fechar()
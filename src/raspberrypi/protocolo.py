@@ -0,0 +1,118 @@
+"""
+Protocolo binário de comandos do RPi para o ESP32 (balanca/rpi/feedback).
+
+Espelha src/esp32/utils/protocolo.py. Um quadro leva vários comandos:
+
+    [versão][n comandos] + n x [opcode][tam][args]
+
+Exemplo (um único publish acende o LED, bipa e mostra o estoque):
+
+    quadro = Quadro().entrada_ok(estoque=12).texto(1, "Camisa M").codificar()
+    client.publish(TOPIC_FEEDBACK, quadro)
+"""
+import struct
+
+VERSAO = 0x01
+
+OP_ENTRADA_OK = 0x01
+OP_SAIDA_OK = 0x02
+OP_ERRO = 0x03
+OP_AGUARDANDO = 0x04
+OP_TEXTO = 0x10
+OP_ESTOQUE = 0x11
+OP_LED = 0x20
+OP_BEEP = 0x30
+OP_LEITURA = 0x40
+
+LED_AZUL = 0
+LED_VERDE = 1
+LED_VERMELHO = 2
+
+PADRAO_DESLIGA = 0
+PADRAO_LIGA = 1
+PADRAO_ENTRADA = 2
+PADRAO_SAIDA = 3
+PADRAO_ERRO = 4
+
+MAX_COMANDOS = 255
+MAX_ARGS = 255
+
+
+class Quadro:
+    """Monta um quadro com vários comandos (métodos encadeáveis)."""
+
+    def __init__(self):
+        self.comandos = []
+
+    def comando(self, opcode, args=b""):
+        if len(self.comandos) >= MAX_COMANDOS:
+            raise ValueError("quadro com comandos demais")
+        if len(args) > MAX_ARGS:
+            raise ValueError("argumento maior que 255 bytes")
+        self.comandos.append((opcode, bytes(args)))
+        return self
+
+    def entrada_ok(self, estoque=None):
+        return self.comando(OP_ENTRADA_OK, _estoque(estoque))
+
+    def saida_ok(self, estoque=None):
+        return self.comando(OP_SAIDA_OK, _estoque(estoque))
+
+    def erro(self):
+        return self.comando(OP_ERRO)
+
+    def aguardando(self):
+        return self.comando(OP_AGUARDANDO)
+
+    def texto(self, linha, texto):
+        return self.comando(OP_TEXTO, bytes([linha]) + texto[:16].encode())
+
+    def estoque(self, estoque):
+        return self.comando(OP_ESTOQUE, _estoque(estoque))
+
+    def led(self, led, padrao):
+        return self.comando(OP_LED, bytes([led, padrao]))
+
+    def beep(self, padrao=PADRAO_ENTRADA):
+        return self.comando(OP_BEEP, bytes([padrao]))
+
+    def leitura(self):
+        """Pede ao ESP32 um peso_raw absoluto imediato."""
+        return self.comando(OP_LEITURA)
+
+    def codificar(self):
+        partes = [bytes([VERSAO, len(self.comandos)])]
+        for opcode, args in self.comandos:
+            partes.append(bytes([opcode, len(args)]))
+            partes.append(args)
+        return b"".join(partes)
+
+
+def _estoque(estoque):
+    if estoque is None:
+        return b""
+    return struct.pack("!H", max(0, min(estoque, 0xFFFF)))
+
+
+class ErroProtocolo(ValueError):
+    """Quadro malformado ou truncado."""
+
+
+def decodificar(dados):
+    """Lista de (opcode, args) de um quadro; útil para logs e depuração."""
+    if not dados or dados[0] != VERSAO:
+        raise ErroProtocolo("quadro sem o byte de versão")
+    if len(dados) < 2:
+        raise ErroProtocolo("quadro truncado")
+    comandos = []
+    p = 2
+    for _ in range(dados[1]):
+        if p + 2 > len(dados):
+            raise ErroProtocolo("quadro truncado")
+        opcode, tam = dados[p], dados[p + 1]
+        p += 2
+        if p + tam > len(dados):
+            raise ErroProtocolo("argumento truncado")
+        comandos.append((opcode, dados[p:p + tam]))
+        p += tam
+    return comandos
@@ -0,0 +1,133 @@
+"""
+Rastreamento de sequência por dispositivo: lacunas, duplicatas e reordenação.
+
+Cada quadro do ESP32 traz (época de boot, seq). Por dispositivo guardamos
+só a maior seq vista e um bitmap das JANELA seqs anteriores (um int), então
+o custo é constante por quadro e a memória não cresce com o tráfego.
+
+Uma época menor que a atual é reenvio de antes de um reboot, exceto se o
+ESP32 perdeu o contador de épocas da flash: aí todo o tráfego dele seria
+descartado para sempre. REGRESSAO_CONFIRMACOES quadros seguidos da mesma
+época menor, com seq crescente e nenhum da época atual no meio, são um
+reinício (REGRESSAO); reenvios esparsos nunca confirmam.
+"""
+
+JANELA = 64
+_MASCARA = (1 << JANELA) - 1
+
+NOVO = "novo"
+DUPLICADO = "duplicado"
+REORDENADO = "reordenado"
+ANTIGO = "antigo"          # Mais velho que a janela ou de uma época anterior
+REINICIO = "reinicio"      # Primeiro quadro de uma nova época (reboot)
+REGRESSAO = "regressao"    # Reinício numa época menor (ESP32 perdeu o contador)
+
+REGRESSAO_CONFIRMACOES = 3
+
+
+class RastreadorSequencia:
+    def __init__(self, ao_detectar_lacuna=None):
+        # ao_detectar_lacuna(faltando) é o gancho de recuperação: por
+        # exemplo, pedir ao ESP32 uma leitura absoluta nova.
+        self.ao_detectar_lacuna = ao_detectar_lacuna
+        self.epoca = None
+        self.maior = 0
+        self.bitmap = 0  # bit i = seq (maior - i) recebida
+        self.recebidos = 0
+        self.duplicados = 0
+        self.reordenados = 0
+        self.antigos = 0
+        self.perdidos = 0   # Confirmados: saíram da janela sem chegar
+        self.reinicios = 0
+        self.regressoes = 0
+        self.candidata = None  # (época menor, última seq) ainda não confirmada
+        self.vistas = 0
+
+    def registrar(self, epoca, seq):
+        """Classifica um quadro; só NOVO/REINICIO/REGRESSAO devem mover o estado do negócio."""
+        classe = NOVO
+        if epoca == self.epoca:
+            self.candidata = None
+        elif self.epoca is not None and epoca < self.epoca and not self._regrediu(epoca, seq):
+            self.antigos += 1
+            return ANTIGO
+        else:
+            if self.epoca is not None:
+                # As lacunas da época anterior não têm mais como chegar
+                self.perdidos += self.pendentes()
+                if epoca > self.epoca:
+                    self.reinicios += 1
+                    classe = REINICIO
+                else:
+                    self.regressoes += 1
+                    classe = REGRESSAO
+            self.epoca = epoca
+            self.maior = 0
+            self.bitmap = 0
+            self.candidata = None
+
+        if seq > self.maior:
+            salto = seq - self.maior
+            self._deslocar(salto)
+            self.bitmap |= 1
+            self.maior = seq
+            self.recebidos += 1
+            if salto > 1 and self.ao_detectar_lacuna:
+                self.ao_detectar_lacuna(salto - 1)
+            return classe
+
+        distancia = self.maior - seq
+        if distancia >= JANELA:
+            self.antigos += 1
+            return ANTIGO
+        bit = 1 << distancia
+        if self.bitmap & bit:
+            self.duplicados += 1
+            return DUPLICADO
+        self.bitmap |= bit
+        self.recebidos += 1
+        self.reordenados += 1
+        return REORDENADO
+
+    def _regrediu(self, epoca, seq):
+        """Conta quadros seguidos da mesma época menor; True quando confirma."""
+        if self.candidata and self.candidata[0] == epoca and seq > self.candidata[1]:
+            self.vistas += 1
+        else:
+            self.vistas = 1
+        self.candidata = (epoca, seq)
+        return self.vistas >= REGRESSAO_CONFIRMACOES
+
+    def _deslocar(self, salto):
+        """Avança a janela; seqs que saem dela sem ter chegado viram perda."""
+        primeiro = max(1, self.maior - JANELA + 1)
+        ultimo = self.maior - JANELA + salto
+        saindo_validos = max(0, ultimo - primeiro + 1)
+        if salto >= JANELA:
+            saindo = self.bitmap
+            self.bitmap = 0
+        else:
+            saindo = self.bitmap >> (JANELA - salto)
+            self.bitmap = (self.bitmap << salto) & _MASCARA
+        self.perdidos += saindo_validos - bin(saindo).count("1")
+
+    def pendentes(self):
+        """Lacunas ainda dentro da janela (podem chegar fora de ordem)."""
+        return min(JANELA, self.maior) - bin(self.bitmap).count("1")
+
+    def estatisticas(self):
+        pendentes = self.pendentes()
+        esperados = self.recebidos + self.perdidos + pendentes
+        return {
+            "epoca": self.epoca,
+            "seq": self.maior,
+            "recebidos": self.recebidos,
+            "perdidos": self.perdidos,
+            "pendentes": pendentes,
+            "duplicados": self.duplicados,
+            "reordenados": self.reordenados,
+            "antigos": self.antigos,
+            "reinicios": self.reinicios,
+            "regressoes": self.regressoes,
+            "perda_pct": round(100 * (self.perdidos + pendentes) / esperados, 3) if esperados else 0.0,
+        }
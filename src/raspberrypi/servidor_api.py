@@ -0,0 +1,200 @@
+"""
+API HTTP local do edge para painéis (Grafana, navegador).
+
+GET /estoque                  -> {"<id>": estoque, ...}
+GET /dispositivos             -> estado de todos os dispositivos
+GET /dispositivos/<id>        -> estado de um dispositivo
+GET /clientes                 -> clientes do stream (fps, descartes)
+GET /stream?fps=10&dispositivos=a,b
+                              -> Server-Sent Events "leitura" e "evento"
+
+Uma única assinatura MQTT (a do edge) alimenta todos os clientes: a thread
+do MQTT só guarda a última leitura por dispositivo; um relógio a FPS_MAX
+recolhe o que mudou, serializa uma vez e distribui. Cada cliente tem a
+sua fila: leituras são coalescidas (fica só a mais recente de cada
+dispositivo), eventos vão para uma fila limitada (descarta os mais
+antigos) e o envio é limitado ao fps pedido. Um cliente lento só segura
+a própria tarefa em drain(); enquanto isso suas leituras continuam
+sendo coalescidas.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+FPS_PADRAO = 10
+FPS_MAX = 30
+EVENTOS_POR_CLIENTE = 256
+HEARTBEAT_S = 15
+DRAIN_MAX_S = 30          # Cliente que não lê por esse tempo é desconectado
+
+
+class ClienteStream:
+    def __init__(self, fps, filtro=None):
+        self.fps = fps
+        self.filtro = filtro  # Conjunto de ids, ou None para todos
+        self.leituras = {}
+        self.eventos = deque(maxlen=EVENTOS_POR_CLIENTE)
+        self.descartados = 0
+        self.coalescidas = 0
+
+    def aceita(self, id):
+        return self.filtro is None or id in self.filtro
+
+    def receber(self, leituras, eventos):
+        for id, texto in leituras.items():
+            if self.aceita(id):
+                if id in self.leituras:
+                    self.coalescidas += 1
+                self.leituras[id] = texto
+        for id, texto in eventos:
+            if self.aceita(id):
+                if len(self.eventos) == self.eventos.maxlen:
+                    self.descartados += 1
+                self.eventos.append(texto)
+
+    def retirar(self):
+        leituras, self.leituras = self.leituras, {}
+        eventos = list(self.eventos)
+        self.eventos.clear()
+        return leituras, eventos
+
+    def estatisticas(self):
+        return {
+            "fps": self.fps,
+            "dispositivos": sorted(self.filtro) if self.filtro else None,
+            "coalescidas": self.coalescidas,
+            "descartados": self.descartados,
+        }
+
+
+class ServidorApi:
+    def __init__(self, logica, host="0.0.0.0", porta=8080, flags=None):
+        self.logica = logica
+        self.flags = flags if flags is not None else {}  # Anomalias por dispositivo
+        self.host = host
+        self.porta = porta
+        self.clientes = set()
+        self._trava = threading.Lock()
+        self._leituras = {}
+        self._eventos = []
+
+    # ---------- chamados da thread do MQTT ----------
+    def adicionar(self, amostra):
+        """Consumidor de LogicaEdge: guarda só a última leitura."""
+        with self._trava:
+            self._leituras[amostra.dispositivo] = amostra
+
+    def evento(self, evento):
+        with self._trava:
+            self._eventos.append(evento)
+
+    # ---------- loop asyncio (thread própria) ----------
+    def iniciar(self):
+        threading.Thread(target=asyncio.run, args=(self._principal(),),
+                         name="api", daemon=True).start()
+
+    async def _principal(self):
+        servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        print(f"API HTTP em http://{self.host}:{self.porta}")
+        async with servidor:
+            await asyncio.gather(servidor.serve_forever(), self._relogio())
+
+    async def _relogio(self):
+        """Recolhe o que chegou desde o último tique e distribui aos clientes."""
+        while True:
+            await asyncio.sleep(1 / FPS_MAX)
+            with self._trava:
+                if not self._leituras and not self._eventos:
+                    continue
+                amostras, self._leituras = self._leituras, {}
+                eventos, self._eventos = self._eventos, []
+            if not self.clientes:
+                continue
+            leituras = {id: json.dumps(a._asdict()) for id, a in amostras.items()}
+            eventos = [(e["dispositivo"], json.dumps(e)) for e in eventos]
+            for cliente in self.clientes:
+                cliente.receber(leituras, eventos)
+
+    async def _atender(self, reader, writer):
+        try:
+            linha = await asyncio.wait_for(reader.readline(), 10)
+            metodo, alvo, _ = linha.decode("latin-1").split(" ", 2)
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # Cabeçalhos ignorados
+            url = urlsplit(alvo)
+            if metodo != "GET":
+                await self._responder(writer, 405, {"erro": "só GET"})
+            elif url.path == "/stream":
+                await self._stream(writer, parse_qs(url.query))
+            else:
+                await self._responder(writer, *self._rota(url.path))
+        except (ValueError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _estado(self, disp):
+        return {
+            "estado": disp.estado,
+            "estoque": disp.estoque,
+            "ultimo_peso": disp.ultimo_peso,
+            "ressincronizar": disp.ressincronizar,
+            "anomalias": self.flags.get(disp.id, 0),
+            "sequencia": disp.sequencia.estatisticas(),
+        }
+
+    def _rota(self, caminho):
+        partes = caminho.strip("/").split("/")
+        dispositivos = dict(self.logica.dispositivos)  # Cópia: a thread do MQTT insere
+        if partes == ["estoque"]:
+            return 200, {id: d.estoque for id, d in dispositivos.items()}
+        if partes == ["dispositivos"]:
+            return 200, {id: self._estado(d) for id, d in dispositivos.items()}
+        if len(partes) == 2 and partes[0] == "dispositivos" and partes[1] in dispositivos:
+            return 200, self._estado(dispositivos[partes[1]])
+        if partes == ["clientes"]:
+            return 200, [c.estatisticas() for c in list(self.clientes)]
+        return 404, {"erro": "não encontrado"}
+
+    async def _responder(self, writer, status, corpo):
+        dados = json.dumps(corpo).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            "Connection: close\r\n\r\n".encode() + dados)
+        await writer.drain()
+
+    async def _stream(self, writer, consulta):
+        try:
+            fps = min(FPS_MAX, max(1, int(consulta.get("fps", [FPS_PADRAO])[0])))
+        except ValueError:
+            fps = FPS_PADRAO
+        filtro = consulta.get("dispositivos")
+        cliente = ClienteStream(fps, set(",".join(filtro).split(",")) if filtro else None)
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Access-Control-Allow-Origin: *\r\n\r\n")
+        self.clientes.add(cliente)
+        ultimo_envio = time.monotonic()
+        try:
+            while not writer.transport.is_closing():
+                await asyncio.sleep(1 / fps)
+                leituras, eventos = cliente.retirar()
+                partes = [f"event: evento\ndata: {e}\n\n" for e in eventos]
+                partes += [f"event: leitura\ndata: {l}\n\n" for l in leituras.values()]
+                if not partes:
+                    if time.monotonic() - ultimo_envio < HEARTBEAT_S:
+                        continue
+                    partes.append(": ping\n\n")  # Mantém proxies/navegador conectados
+                writer.write("".join(partes).encode())
+                ultimo_envio = time.monotonic()
+                await asyncio.wait_for(writer.drain(), DRAIN_MAX_S)
+        finally:
+            self.clientes.discard(cliente)
@@ -0,0 +1,34 @@
+"""
+Leitura dos quadros de telemetria publicados pelo ESP32.
+
+peso_raw:     "id,epoca,seq,t_ms,peso,raw"      (texto; raw = contagens do HX711)
+peso_estavel: {"id", "epoca", "seq", "t_ms", "peso", "delta", ...} (JSON)
+"""
+import json
+from collections import namedtuple
+
+Amostra = namedtuple("Amostra", "dispositivo epoca seq t_ms peso raw", defaults=(None,))
+
+
+def ler_peso_raw(payload):
+    """Converte o payload de peso_raw; None se o quadro estiver malformado."""
+    try:
+        partes = payload.decode().split(",")
+        if len(partes) < 5:
+            return None
+        raw = int(partes[5]) if len(partes) > 5 else None
+        return Amostra(partes[0], int(partes[1]), int(partes[2]),
+                       int(partes[3]), float(partes[4]), raw)
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def ler_peso_estavel(payload):
+    """Retorna (Amostra com o nível assentado, dicionário completo) ou None."""
+    try:
+        dados = json.loads(payload)
+        amostra = Amostra(dados["id"], int(dados["epoca"]), int(dados["seq"]),
+                          int(dados["t_ms"]), float(dados["peso"]))
+        return amostra, dados
+    except (ValueError, KeyError, TypeError):
+        return None
@@ -0,0 +1,257 @@
+"""
+Uplink para a nuvem: agregados por janela em vez de cada leitura.
+
+O custo do IoT Core cresce com mensagens e bytes; mandar cada peso_raw
+escala com taxa x frota. Aqui cada dispositivo vira um registro por
+janela de JANELA_S (n, mínimo, máximo, média, último, ENTRADAs, SAIDAs),
+e os registros fechados entram num lote binário:
+
+    lote     = zlib([VERSAO][janela_s][janela_base] + registros)
+    registro = [disp][Δjanela][n] + se n: [Δmédia][média-mín][máx-média][último-média]
+               + [entradas][saidas]
+
+Tudo em varint (zigzag quando pode ser negativo), pesos em decigramas.
+Δ é contra o registro anterior do mesmo dispositivo no lote, e disp é o
+índice do dispositivo no lote (um índice novo vem seguido do nome), então
+cada lote se decodifica sozinho. O lote sai quando o codificado passa de
+LOTE_MAX_BYTES ou o mais antigo espera LOTE_MAX_S.
+
+Os eventos de estoque continuam indo um a um para estoque/eventos (a
+Lambda aplica exatamente uma vez); aqui eles só entram como contagem.
+"""
+import threading
+import time
+import zlib
+
+VERSAO = 1
+JANELA_S = 60
+LOTE_MAX_BYTES = 16 * 1024  # Codificado; comprimido cabe folgado em 128 KB do IoT Core
+LOTE_MAX_S = 300
+
+
+def _varint(buf, valor):
+    while valor > 0x7F:
+        buf.append((valor & 0x7F) | 0x80)
+        valor >>= 7
+    buf.append(valor)
+
+
+def _zigzag(buf, valor):
+    _varint(buf, valor << 1 if valor >= 0 else (-valor << 1) - 1)
+
+
+def _ler_varint(dados, pos):
+    valor = 0
+    deslocamento = 0
+    while True:
+        byte = dados[pos]
+        pos += 1
+        valor |= (byte & 0x7F) << deslocamento
+        if byte < 0x80:
+            return valor, pos
+        deslocamento += 7
+
+
+def _ler_zigzag(dados, pos):
+    valor, pos = _ler_varint(dados, pos)
+    return (valor >> 1) ^ -(valor & 1), pos
+
+
+class _Janela:
+    __slots__ = ("indice", "n", "minimo", "maximo", "soma", "ultimo", "entradas", "saidas")
+
+    def __init__(self, indice):
+        self.indice = indice
+        self.n = 0
+        self.minimo = self.maximo = self.soma = self.ultimo = 0.0
+        self.entradas = 0
+        self.saidas = 0
+
+    def adicionar(self, peso):
+        if self.n == 0:
+            self.minimo = self.maximo = peso
+        elif peso < self.minimo:
+            self.minimo = peso
+        elif peso > self.maximo:
+            self.maximo = peso
+        self.n += 1
+        self.soma += peso
+        self.ultimo = peso
+
+
+class _Lote:
+    def __init__(self, janela_s, base):
+        self.buf = bytearray([VERSAO])
+        _varint(self.buf, janela_s)
+        _varint(self.buf, base)
+        self.base = base
+        self.indices = {}   # id -> índice no lote
+        self.anterior = {}  # id -> (janela, média_dg)
+
+    def codificar(self, id, janela):
+        buf = self.buf
+        indice = self.indices.get(id)
+        if indice is None:
+            indice = self.indices[id] = len(self.indices)
+            _varint(buf, indice)
+            nome = id.encode()
+            _varint(buf, len(nome))
+            buf += nome
+        else:
+            _varint(buf, indice)
+        janela_ant, media_ant = self.anterior.get(id, (self.base, 0))
+        _zigzag(buf, janela.indice - janela_ant)
+        _varint(buf, janela.n)
+        media = media_ant
+        if janela.n:
+            media = round(10 * janela.soma / janela.n)
+            _zigzag(buf, media - media_ant)
+            _varint(buf, media - round(10 * janela.minimo))
+            _varint(buf, round(10 * janela.maximo) - media)
+            _zigzag(buf, round(10 * janela.ultimo) - media)
+        _varint(buf, janela.entradas)
+        _varint(buf, janela.saidas)
+        self.anterior[id] = (janela.indice, media)
+
+
+def decodificar_lote(carga):
+    """Inverso do lote publicado: lista de dicts, um por dispositivo e janela."""
+    dados = zlib.decompress(carga)
+    if dados[0] != VERSAO:
+        raise ValueError(f"versão de lote desconhecida: {dados[0]}")
+    janela_s, pos = _ler_varint(dados, 1)
+    base, pos = _ler_varint(dados, pos)
+    nomes = []
+    anterior = {}
+    registros = []
+    while pos < len(dados):
+        indice, pos = _ler_varint(dados, pos)
+        if indice == len(nomes):
+            tamanho, pos = _ler_varint(dados, pos)
+            nomes.append(dados[pos:pos + tamanho].decode())
+            pos += tamanho
+        id = nomes[indice]
+        janela_ant, media = anterior.get(id, (base, 0))
+        delta, pos = _ler_zigzag(dados, pos)
+        janela = janela_ant + delta
+        n, pos = _ler_varint(dados, pos)
+        registro = {"dispositivo": id, "inicio": janela * janela_s, "janela_s": janela_s, "n": n}
+        if n:
+            delta, pos = _ler_zigzag(dados, pos)
+            media += delta
+            abaixo, pos = _ler_varint(dados, pos)
+            acima, pos = _ler_varint(dados, pos)
+            ultimo, pos = _ler_zigzag(dados, pos)
+            registro.update(media=media / 10, minimo=(media - abaixo) / 10,
+                            maximo=(media + acima) / 10, ultimo=(media + ultimo) / 10)
+        registro["entradas"], pos = _ler_varint(dados, pos)
+        registro["saidas"], pos = _ler_varint(dados, pos)
+        anterior[id] = (janela, media)
+        registros.append(registro)
+    return registros
+
+
+class UplinkNuvem:
+    """
+    Consumidor da LogicaEdge (.adicionar(amostra)) que agrega por janela e
+    chama publicar(bytes) com cada lote comprimido. tick() fecha as janelas
+    vencidas e decide o envio; relogio permite simular o tempo.
+    """
+
+    def __init__(self, publicar, janela_s=JANELA_S, lote_max_bytes=LOTE_MAX_BYTES,
+                 lote_max_s=LOTE_MAX_S, relogio=time.time):
+        self.publicar = publicar
+        self.janela_s = janela_s
+        self.lote_max_bytes = lote_max_bytes
+        self.lote_max_s = lote_max_s
+        self.relogio = relogio
+        self.abertas = {}  # id -> _Janela da janela corrente
+        self.indice = None  # Janela corrente vista pelo tick()
+        self.lote = None
+        self.lote_inicio = None  # Relógio do primeiro registro do lote
+        self.trava = threading.Lock()  # adicionar() vem da thread do paho
+        self.inicio = relogio()
+        self.dispositivos = set()
+        self.amostras = 0
+        self.lotes = 0
+        self.bytes = 0
+        self.bytes_codificados = 0
+
+    def _janela(self, id, agora):
+        indice = int(agora // self.janela_s)
+        janela = self.abertas.get(id)
+        if janela is None or janela.indice != indice:
+            if janela is not None:
+                self._fechar(id, janela, agora)
+            janela = self.abertas[id] = _Janela(indice)
+            self.dispositivos.add(id)
+        return janela
+
+    def adicionar(self, amostra):
+        with self.trava:
+            self._janela(amostra.dispositivo, self.relogio()).adicionar(amostra.peso)
+            self.amostras += 1
+
+    def evento(self, evento):
+        if evento.get("motivo"):
+            return  # Correção de reconciliação não é movimento
+        with self.trava:
+            janela = self._janela(evento["dispositivo"], self.relogio())
+            if evento["delta_unidades"] > 0:
+                janela.entradas += 1
+            else:
+                janela.saidas += 1
+
+    def _fechar(self, id, janela, agora):
+        if self.lote is None:
+            self.lote = _Lote(self.janela_s, janela.indice)
+            self.lote_inicio = agora
+        self.lote.codificar(id, janela)
+
+    def tick(self):
+        """Chamado no loop do serviço: fecha janelas vencidas e envia se for a hora."""
+        with self.trava:
+            agora = self.relogio()
+            indice = int(agora // self.janela_s)
+            if indice != self.indice:  # Só varre os dispositivos na virada da janela
+                self.indice = indice
+                for id, janela in list(self.abertas.items()):
+                    if janela.indice < indice:
+                        self._fechar(id, janela, agora)
+                        del self.abertas[id]
+            if self.lote is None:
+                return None
+            if len(self.lote.buf) < self.lote_max_bytes and \
+                    agora - self.lote_inicio < self.lote_max_s:
+                return None
+            return self._enviar()
+
+    def descarregar(self):
+        """Fecha tudo e envia o que houver (encerramento do serviço)."""
+        with self.trava:
+            agora = self.relogio()
+            for id, janela in self.abertas.items():
+                self._fechar(id, janela, agora)
+            self.abertas.clear()
+            return self._enviar() if self.lote else None
+
+    def _enviar(self):
+        lote = self.lote
+        self.lote = None
+        carga = zlib.compress(bytes(lote.buf), 9)
+        self.lotes += 1
+        self.bytes += len(carga)
+        self.bytes_codificados += len(lote.buf)
+        self.publicar(carga)
+        return carga
+
+    def estatisticas(self):
+        horas = max(self.relogio() - self.inicio, 1e-9) / 3600
+        dispositivos = max(len(self.dispositivos), 1)
+        return {
+            "amostras": self.amostras,
+            "lotes": self.lotes,
+            "bytes": self.bytes,
+            "compressao": round(self.bytes_codificados / self.bytes, 2) if self.bytes else None,
+            "bytes_disp_hora": round(self.bytes / dispositivos / horas, 1),
+        }